@@ -4,8 +4,8 @@ load_dotenv()
 
 from flask import Flask
 from extensions import db, bcrypt, login_manager, mail
+from logging_setup import configure_logging
 from flask_login import current_user
-from datetime import datetime
 from sqlalchemy import inspect, text
 from sqlalchemy.exc import NoSuchTableError
 
@@ -30,18 +30,61 @@ def create_app(test_config=None):
         os.path.join(basedir, "instance", "medical_reports"),
     )
     app.config.setdefault("MEDICAL_REPORT_ALLOWED_EXTENSIONS", {"pdf"})
+    app.config.setdefault("FORUM_PAGE_SIZE", 20)
+    app.config.setdefault("FORUM_SEARCH_PAGE_SIZE", 20)
+    app.config.setdefault("FORUM_REPLY_PAGE_SIZE", 20)
+    # Moderation queue: tests run jobs inline so outcomes are visible immediately
+    app.config.setdefault("MODERATION_ASYNC", not app.config.get("TESTING", False))
+    app.config.setdefault("MODERATION_WORKERS", 2)
+    app.config.setdefault("MODERATION_POLL_INTERVAL", 5.0)
+    app.config.setdefault("MODERATION_JOB_LEASE", 120)
+    app.config.setdefault("MODERATION_MAX_ATTEMPTS", 3)
+    app.config.setdefault("FLAGGED_REPORT_PAGE_SIZE", 20)
+    app.config.setdefault("METRICS_TOKEN", os.getenv("METRICS_TOKEN"))
+    app.config.setdefault("MEDICATION_IMPORT_MAX_ROWS", 1000)
+    app.config.setdefault("MEDICATION_IMPORT_MAX_BYTES", 2 * 1024 * 1024)
+    app.config.setdefault("MEDICATION_EXPORT_BATCH_SIZE", 500)
+    app.config.setdefault("MEDICATION_CALENDAR_MAX_DAYS", 366)
+    app.config.setdefault("APPOINTMENT_REMINDER_LEAD", 30)  # minutes
+    app.config.setdefault(
+        "MODERATOR_EMAILS",
+        [email.strip() for email in os.getenv("MODERATOR_EMAILS", "").split(",") if email.strip()],
+    )
     app.config.setdefault("MAIL_SERVER", "smtp.gmail.com")
     app.config.setdefault("MAIL_PORT", 587)
     app.config.setdefault("MAIL_USE_TLS", True)
     app.config.setdefault("MAIL_USERNAME", "anishrijal577@gmail.com")
     app.config.setdefault("MAIL_PASSWORD", "YOUR_APP_PASSWORD")
 
+    configure_logging(app)
+
     # Init extensions
     db.init_app(app)
     bcrypt.init_app(app)
     login_manager.init_app(app)
     mail.init_app(app)
 
+    from routes.flagged_writer import flagged_log_writer
+    from routes.fragment_cache import fragment_cache
+    from routes.verdict_cache import verdict_cache
+    from routes.mod_batching import gemini_batcher
+    from routes.mod_http import moderation_http
+    from routes.mod_lexicon import lexicon
+    from routes.moderation import moderation_router
+    from routes.notification_broker import notification_broker
+    from routes.notifications import notification_counts
+    from routes.reminder_scheduler import reminder_scheduler
+    flagged_log_writer.init_app(app)
+    fragment_cache.init_app(app)
+    moderation_http.init_app(app)
+    lexicon.init_app(app)
+    moderation_router.init_app(app)
+    verdict_cache.init_app(app)
+    gemini_batcher.init_app(app, "GEMINI")
+    notification_broker.init_app(app)
+    notification_counts.init_app(app)
+    reminder_scheduler.init_app(app)
+
     # Import and register blueprints
     from routes.auth import auth
     from routes.dashboard import dashboard
@@ -52,6 +95,8 @@ def create_app(test_config=None):
     from routes.forum import forum
     from routes.api_test import api_test
     from routes.unit_test import unit_test
+    from routes.metrics import metrics_bp
+    from routes.notifications import notifications_bp
 
     app.register_blueprint(auth)
     app.register_blueprint(dashboard)
@@ -62,6 +107,8 @@ def create_app(test_config=None):
     app.register_blueprint(forum)
     app.register_blueprint(api_test)
     app.register_blueprint(unit_test)
+    app.register_blueprint(metrics_bp)
+    app.register_blueprint(notifications_bp)
 
     # Import models
     from models.user import User
@@ -71,66 +118,113 @@ def create_app(test_config=None):
     from models.appointment import Appointment
     from models.forum import ForumPost, ForumReply
     from models.flagged_log import FlaggedLog
+    from models.flagged_daily_count import FlaggedDailyCount
+    from models.user_summary import UserSummary
+    from models.activity_daily_count import ActivityDailyCount
+    from models.moderation_job import ModerationJob
+    from models.moderation_verdict import ModerationVerdict
+    from models.notification_event import NotificationEvent
+    from routes.moderation import prompt_versions
+    from routes.forum_search import ensure_search_index, rebuild_search_index
+    from routes.forum import recount_post_activity
+    from routes.flagged_report import rebuild_flagged_rollup
+    from routes.activity_rollup import rebuild_activity_rollup
+    from routes.pagination import fill_missing_timestamps
+    from routes.notifications import get_notifications
 
     # Notification injector
     @app.context_processor
     def inject_notifications():
-        appointment_notifications = []
-        reply_notifications = []
-        if current_user.is_authenticated:
-            now = datetime.now()
-            today = now.date()
-            current_time = now.time()
-            user_appointments = (
-                Appointment.query.filter_by(user_id=current_user.id)
-                .order_by(Appointment.date.asc(), Appointment.time.asc())
-                .all()
-            )
-            for appt in user_appointments:
-                if appt.date > today or (appt.date == today and appt.time >= current_time):
-                    appointment_notifications.append(appt)
-
-            user_post_ids = [post.id for post in ForumPost.query.filter_by(user_id=current_user.id).all()]
-            if user_post_ids:
-                reply_notifications = (
-                    ForumReply.query.filter(
-                        ForumReply.post_id.in_(user_post_ids),
-                        ForumReply.user_id != current_user.id,
-                    )
-                    .order_by(ForumReply.created_at.desc())
-                    .all()
-                )
-
-        notification_count = len(appointment_notifications) + len(reply_notifications)
-        return {
-            "appointment_notifications": appointment_notifications,
-            "reply_notifications": reply_notifications,
-            "notification_count": notification_count,
-        }
+        return get_notifications(current_user)
 
     # Ensure folders exist
     os.makedirs(app.config["MEDICAL_REPORT_UPLOAD_FOLDER"], exist_ok=True)
 
     # Database setup
     with app.app_context():
+        # Columns added after a table was first created; create_all() won't add them
+        legacy_columns = {
+            "medical_histories": {"report_filename": "VARCHAR(255)"},
+            "forum_posts": {
+                "version": "INTEGER NOT NULL DEFAULT 0",
+                "reply_count": "INTEGER NOT NULL DEFAULT 0",
+                "last_activity_at": "DATETIME",
+                "status": "VARCHAR(20) NOT NULL DEFAULT 'published'",
+            },
+            "forum_replies": {"status": "VARCHAR(20) NOT NULL DEFAULT 'published'"},
+            "appointments": {"reminder_sent_at": "DATETIME"},
+            "user": {
+                "notifications_seen_at": "DATETIME",
+                "notifications_seen_reply_id": "INTEGER NOT NULL DEFAULT 0",
+            },
+        }
         inspector = inspect(db.engine)
-        try:
-            columns = {c["name"] for c in inspector.get_columns("medical_histories")}
-        except NoSuchTableError:
-            columns = set()
-
-        if columns and "report_filename" not in columns:
-            with db.engine.begin() as conn:
-                conn.execute(
-                    text("ALTER TABLE medical_histories ADD COLUMN report_filename VARCHAR(255)")
-                )
+        had_flag_rollup = inspector.has_table("flagged_daily_counts")
+        had_activity_rollup = inspector.has_table("activity_daily_counts")
+        for table_name, expected in legacy_columns.items():
+            try:
+                columns = {c["name"] for c in inspector.get_columns(table_name)}
+            except NoSuchTableError:
+                continue
+
+            missing = [name for name in expected if name not in columns]
+            if missing:
+                with db.engine.begin() as conn:
+                    for name in missing:
+                        conn.execute(
+                            text(f"ALTER TABLE {table_name} ADD COLUMN {name} {expected[name]}")
+                        )
 
         db.create_all()
 
+        # create_all() skips indexes on tables that already exist
+        for table in db.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(db.engine, checkfirst=True)
+
+        with db.engine.begin() as conn:
+            # Tables created before these columns were NOT NULL can still hold NULLs
+            for table_name, column in (
+                ("forum_posts", "created_at"), ("forum_replies", "created_at"), ("flagged_logs", "created_at"),
+            ):
+                fill_missing_timestamps(conn, table_name, column)
+            if ensure_search_index(conn):
+                rebuild_search_index(conn)
+            if conn.execute(text("SELECT 1 FROM forum_posts WHERE last_activity_at IS NULL LIMIT 1")).first():
+                recount_post_activity(conn)
+            if not had_flag_rollup:
+                rebuild_flagged_rollup(conn)
+            if not had_activity_rollup:
+                rebuild_activity_rollup(conn)
+
+        # Verdicts cached under an older moderation prompt no longer apply
+        verdict_cache.purge(prompt_versions())
+        db.session.commit()
+
     return app
 
 
+def start_background_workers(app):
+    """Start the in-process background threads for the process that serves requests.
+
+    Not part of create_app(): CLI commands, test apps and the reloader's
+    watcher process must not start them. Deployments behind a WSGI server
+    run ``flask forum work`` instead.
+    """
+    from routes.forum import discard_failed_job, process_moderation_job
+    from routes.moderation_queue import moderation_workers
+    from routes.reminder_scheduler import reminder_scheduler
+
+    if app.config["MODERATION_ASYNC"] and not app.testing:
+        moderation_workers.start(app, process_moderation_job, discard_failed_job)
+    if app.config["REMINDER_SCHEDULER"] and not app.testing:
+        reminder_scheduler.start(app)
+
+
 # Run app
 if __name__ == "__main__":
     app = create_app()
+    # With the reloader on, only the child process (WERKZEUG_RUN_MAIN) serves requests
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        start_background_workers(app)
     app.run(debug=True)
\ No newline at end of file
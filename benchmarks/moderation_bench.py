@@ -0,0 +1,321 @@
+# benchmarks/moderation_bench.py
+"""End-to-end moderation benchmark against local stub backends.
+
+Starts the Gemini and Professor stubs, points the app at them, and drives
+``is_safe_content_ai`` and the ``/forum/new`` route at each concurrency
+level. For every scenario it reports throughput, latency percentiles and
+how requests ended (safe, unsafe, fallback, error). Results are written as
+JSON tagged with the current commit so runs can be compared.
+
+    python -m benchmarks.moderation_bench --concurrency 1 8 32 --requests 200
+    python -m benchmarks.moderation_bench --gemini-errors 0.3 --set MODERATION_HEDGE=true
+"""
+import argparse
+import itertools
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+
+from benchmarks.stub_servers import LatencyProfile, start_stubs
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH_EMAIL = "bench@example.com"
+BENCH_PASSWORD = "bench-password"
+
+
+def git_revision():
+    """Return ``(commit, dirty)`` for the working tree, or ``(None, None)`` outside git."""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+        status = subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"],
+            cwd=REPO_ROOT, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+    return commit, bool(status)
+
+
+def percentile(samples, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not samples:
+        return None
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+
+def summarize(samples, outcomes, wall):
+    samples = sorted(samples)
+    to_ms = lambda value: None if value is None else round(value * 1000, 2)
+    return {
+        "requests": len(samples),
+        "wall_seconds": round(wall, 3),
+        "throughput_rps": round(len(samples) / wall, 2) if wall else None,
+        "latency_ms": {
+            "p50": to_ms(percentile(samples, 0.50)),
+            "p95": to_ms(percentile(samples, 0.95)),
+            "p99": to_ms(percentile(samples, 0.99)),
+            "max": to_ms(samples[-1] if samples else None),
+        },
+        "outcomes": dict(outcomes),
+    }
+
+
+def drive(concurrency, total, session):
+    """Run ``total`` calls over ``concurrency`` threads.
+
+    ``session`` is a context manager factory; each thread enters it once and
+    gets a ``call(index)`` function returning an outcome label.
+    """
+    counter = itertools.count()
+    samples = []
+    outcomes = Counter()
+    lock = threading.Lock()
+
+    def worker():
+        with session() as call:
+            while True:
+                index = next(counter)
+                if index >= total:
+                    return
+                started = time.perf_counter()
+                try:
+                    outcome = call(index)
+                except Exception as e:
+                    outcome = f"error:{type(e).__name__}"
+                elapsed = time.perf_counter() - started
+                with lock:
+                    samples.append(elapsed)
+                    outcomes[outcome] += 1
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return summarize(samples, outcomes, time.perf_counter() - started)
+
+
+def make_texts(label, count, unsafe_rate, rng):
+    texts = []
+    for index in range(count):
+        text = f"Benchmark {label} message {index}: this week was hard but talking about it helps"
+        if rng.random() < unsafe_rate:
+            text += " (unsafe)"
+        texts.append(text)
+    return texts
+
+
+def build_app(db_path, overrides):
+    from app import create_app
+    from extensions import bcrypt, db
+    from models.user import User
+
+    config = {
+        "SQLALCHEMY_DATABASE_URI": f"sqlite:///{db_path}",
+        "WTF_CSRF_ENABLED": False,
+        "MODERATION_ASYNC": False,
+    }
+    config.update(overrides)
+    app = create_app(config)
+    with app.app_context():
+        password = bcrypt.generate_password_hash(BENCH_PASSWORD).decode("utf-8")
+        db.session.add(User(username="bench", email=BENCH_EMAIL, password=password))
+        db.session.commit()
+    return app
+
+
+def moderation_session(app, texts):
+    from extensions import db
+    from routes.moderation import FALLBACK_RESULTS, is_safe_content_ai
+
+    fallbacks = {result[:2] for result in FALLBACK_RESULTS}
+
+    @contextmanager
+    def session():
+        with app.app_context():
+            def call(index):
+                verdict = is_safe_content_ai(texts[index])
+                db.session.commit()
+                if verdict[:2] in fallbacks:
+                    return "fallback"
+                return "safe" if verdict[0] else "unsafe"
+
+            try:
+                yield call
+            finally:
+                db.session.remove()
+
+    return session
+
+
+def forum_session(app, texts):
+    @contextmanager
+    def session():
+        client = app.test_client()
+        client.post("/login", data={"email": BENCH_EMAIL, "password": BENCH_PASSWORD})
+
+        def call(index):
+            response = client.post("/forum/new", data={"title": f"Benchmark {index}", "content": texts[index]})
+            return f"http_{response.status_code}"
+
+        yield call
+
+    return session
+
+
+def forum_state(app):
+    """Post statuses and flag count, to see what the POSTs actually produced."""
+    from extensions import db
+    from models.flagged_log import FlaggedLog
+    from models.forum import ForumPost
+
+    with app.app_context():
+        statuses = db.session.query(ForumPost.status, db.func.count()).group_by(ForumPost.status).all()
+        return {"posts": dict(statuses), "flagged": FlaggedLog.query.count()}
+
+
+def profile_settings(profile):
+    return {"median_ms": profile.median_ms, "sigma": profile.sigma, "error_rate": profile.error_rate}
+
+
+def run_benchmark(targets=("moderation", "forum"), concurrency=(1, 4, 16), requests=100,
+                  gemini=None, professor=None, unsafe_rate=0.1, overrides=None, seed=0):
+    """Run every target at every concurrency level and return the results dict."""
+    gemini = gemini or LatencyProfile(seed=seed)
+    professor = professor or LatencyProfile(seed=seed + 1)
+    gemini_stub, professor_stub = start_stubs(gemini, professor)
+
+    environment = {
+        "GEMINI_API_KEY": "benchmark-key",
+        "GEMINI_API_BASE": f"{gemini_stub.base_url}/v1",
+        "PROFESSOR_API_URL": f"{professor_stub.base_url}/generate/",
+    }
+    saved = {name: os.environ.get(name) for name in environment}
+    os.environ.update(environment)
+
+    commit, dirty = git_revision()
+    results = {
+        "commit": commit,
+        "dirty": dirty,
+        "started_at": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+        "python": sys.version.split()[0],
+        "settings": {
+            "requests": requests,
+            "unsafe_rate": unsafe_rate,
+            "seed": seed,
+            "overrides": overrides or {},
+            "gemini": profile_settings(gemini),
+            "professor": profile_settings(professor),
+        },
+        "scenarios": [],
+    }
+    rng = random.Random(seed)
+
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            app = build_app(os.path.join(tmp, "bench.db"), overrides or {})
+            from routes.moderation import moderation_router
+
+            for target in targets:
+                for level in concurrency:
+                    # Fresh breakers and unseen texts so scenarios do not leak into each other
+                    moderation_router.init_app(app)
+                    texts = make_texts(f"{target}-{level}", requests, unsafe_rate, rng)
+                    before = (gemini_stub.stats(), professor_stub.stats())
+                    session = moderation_session(app, texts) if target == "moderation" else forum_session(app, texts)
+
+                    scenario = {"target": target, "concurrency": level}
+                    scenario.update(drive(level, requests, session))
+                    scenario["backend_calls"] = {
+                        name: {key: stub.stats()[key] - previous[key] for key in previous}
+                        for name, stub, previous in (
+                            ("gemini", gemini_stub, before[0]),
+                            ("professor", professor_stub, before[1]),
+                        )
+                    }
+                    scenario["breakers"] = moderation_router.states()
+                    if target == "forum":
+                        scenario["forum"] = forum_state(app)
+                    results["scenarios"].append(scenario)
+    finally:
+        gemini_stub.stop()
+        professor_stub.stop()
+        for name, value in saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+    return results
+
+
+def parse_overrides(pairs):
+    overrides = {}
+    for pair in pairs:
+        key, _, raw = pair.partition("=")
+        try:
+            overrides[key] = json.loads(raw)
+        except ValueError:
+            overrides[key] = raw
+    return overrides
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--targets", nargs="+", choices=["moderation", "forum"], default=["moderation", "forum"])
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 4, 16])
+    parser.add_argument("--requests", type=int, default=100, help="requests per scenario")
+    parser.add_argument("--gemini-ms", type=float, default=200.0, help="median Gemini latency")
+    parser.add_argument("--gemini-sigma", type=float, default=0.5, help="log-normal spread of Gemini latency")
+    parser.add_argument("--gemini-errors", type=float, default=0.0, help="share of Gemini requests answered 503")
+    parser.add_argument("--professor-ms", type=float, default=300.0)
+    parser.add_argument("--professor-sigma", type=float, default=0.5)
+    parser.add_argument("--professor-errors", type=float, default=0.0)
+    parser.add_argument("--unsafe-rate", type=float, default=0.1, help="share of texts the stubs flag")
+    parser.add_argument("--set", dest="overrides", action="append", default=[], metavar="KEY=VALUE",
+                        help="app config override, VALUE parsed as JSON when possible")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="result file (default benchmarks/results/<time>-<commit>.json)")
+    args = parser.parse_args(argv)
+
+    results = run_benchmark(
+        targets=args.targets,
+        concurrency=args.concurrency,
+        requests=args.requests,
+        gemini=LatencyProfile(args.gemini_ms, args.gemini_sigma, args.gemini_errors, seed=args.seed),
+        professor=LatencyProfile(args.professor_ms, args.professor_sigma, args.professor_errors, seed=args.seed + 1),
+        unsafe_rate=args.unsafe_rate,
+        overrides=parse_overrides(args.overrides),
+        seed=args.seed,
+    )
+
+    out = args.out
+    if not out:
+        stamp = datetime.utcnow().strftime("%Y%m%dT%H%M%S")
+        out = os.path.join(REPO_ROOT, "benchmarks", "results", f"{stamp}-{(results['commit'] or 'nogit')[:8]}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+
+    print(f"{'target':<12}{'conc':>6}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}  outcomes")
+    for scenario in results["scenarios"]:
+        latency = scenario["latency_ms"]
+        print(
+            f"{scenario['target']:<12}{scenario['concurrency']:>6}{scenario['throughput_rps']:>10}"
+            f"{latency['p50']:>10}{latency['p95']:>10}{latency['p99']:>10}  {scenario['outcomes']}"
+        )
+    print(f"Results written to {out}")
+
+
+if __name__ == "__main__":
+    main()
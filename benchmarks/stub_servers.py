@@ -0,0 +1,147 @@
+# benchmarks/stub_servers.py
+"""Local stand-ins for the Gemini and Professor moderation APIs.
+
+Each server answers like the real service after sleeping for a latency
+drawn from a log-normal distribution, and fails a configurable share of
+requests with a 503. Texts containing the word "unsafe" are flagged so a
+run can mix verdicts.
+"""
+import json
+import math
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_BATCH_ITEM = re.compile(r"^TEXT (\d+): (.*)$", re.MULTILINE)
+
+
+class LatencyProfile:
+    """Log-normal latency with the given median and spread, plus an error rate."""
+
+    def __init__(self, median_ms=200.0, sigma=0.5, error_rate=0.0, seed=None):
+        self.median_ms = median_ms
+        self.sigma = sigma
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sample(self):
+        """Return ``(delay_seconds, should_fail)`` for one request."""
+        with self._lock:
+            delay = self.median_ms * math.exp(self._random.gauss(0, self.sigma)) if self.median_ms > 0 else 0.0
+            fail = self._random.random() < self.error_rate
+        return delay / 1000.0, fail
+
+
+class StubServer:
+    """Run a stub API on a free localhost port in a background thread."""
+
+    def __init__(self, handler, profile):
+        self.profile = profile
+        self.requests = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+
+        stub = self
+
+        class Handler(handler):
+            server_stub = stub
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def count(self, failed):
+        with self._lock:
+            self.requests += 1
+            self.errors += int(failed)
+
+    def stats(self):
+        with self._lock:
+            return {"requests": self.requests, "injected_errors": self.errors}
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real services
+    server_stub = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length) or b"{}")
+
+        delay, failed = self.server_stub.profile.sample()
+        time.sleep(delay)
+        self.server_stub.count(failed)
+
+        if failed:
+            self._reply(503, {"error": "stub outage"})
+        else:
+            self._reply(200, self.answer(body))
+
+    def _reply(self, status, payload):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def answer(self, body):
+        raise NotImplementedError
+
+
+def _verdict(text):
+    unsafe = "unsafe" in text.lower()
+    return {
+        "safe": not unsafe,
+        "reason": "stub flagged it" if unsafe else "stub allowed it",
+        "categories": ["threat"] if unsafe else [],
+    }
+
+
+class GeminiHandler(_StubHandler):
+    """``POST .../models/<model>:generateContent`` with single or batched prompts."""
+
+    def answer(self, body):
+        prompt = body["contents"][0]["parts"][0]["text"]
+        items = _BATCH_ITEM.findall(prompt)
+        if items:
+            verdicts = [dict(_verdict(text), id=int(index)) for index, text in items]
+            text = json.dumps(verdicts)
+        else:
+            text = json.dumps(_verdict(prompt.rsplit("TEXT:", 1)[-1]))
+        return {"candidates": [{"content": {"parts": [{"text": f"```json\n{text}\n```"}]}}]}
+
+
+class ProfessorHandler(_StubHandler):
+    """``POST /generate/`` returning the campus API's safety label."""
+
+    def answer(self, body):
+        verdict = _verdict(body.get("prompt", ""))
+        return {"safety": "safe" if verdict["safe"] else "unsafe", "categories": verdict["categories"]}
+
+
+def start_stubs(gemini_profile, professor_profile):
+    """Start both stubs and return them as ``(gemini, professor)``."""
+    return (
+        StubServer(GeminiHandler, gemini_profile).start(),
+        StubServer(ProfessorHandler, professor_profile).start(),
+    )
@@ -0,0 +1,123 @@
+# logging_setup.py
+import atexit
+import copy
+import itertools
+import json
+import logging
+import queue
+import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+# Attributes every LogRecord has; anything else was passed through ``extra``
+_STANDARD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+_listener = None
+_handler = None
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, with string fields cut to ``max_length`` characters."""
+
+    def __init__(self, max_length=2000):
+        super().__init__()
+        self.max_length = max_length
+
+    def _truncate(self, value):
+        if value is None or isinstance(value, (bool, int, float)):
+            return value
+        text = value if isinstance(value, str) else json.dumps(value, default=str)
+        if len(text) <= self.max_length:
+            return value if isinstance(value, str) else json.loads(text)
+        return f"{text[:self.max_length]}...(+{len(text) - self.max_length} chars)"
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "msg": self._truncate(record.getMessage()),
+        }
+        for key, value in vars(record).items():
+            if key not in _STANDARD_ATTRS and not key.startswith("_"):
+                entry[key] = self._truncate(value)
+        if record.exc_text:
+            entry["exc"] = self._truncate(record.exc_text)
+        return json.dumps(entry, default=str)
+
+
+class DebugSampler(logging.Filter):
+    """Pass every record above DEBUG but only one in ``every`` DEBUG records."""
+
+    def __init__(self, rate):
+        super().__init__()
+        self.every = max(1, round(1 / rate)) if rate > 0 else 0
+        self._seen = itertools.count()
+
+    def filter(self, record):
+        if record.levelno > logging.DEBUG:
+            return True
+        if not self.every:
+            return False
+        return next(self._seen) % self.every == 0
+
+
+class _PreparedQueueHandler(QueueHandler):
+    """Render the message and traceback on the calling thread but leave JSON
+    formatting, truncation and I/O to the listener thread."""
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def configure_logging(app):
+    """Route all logging through a queue drained by a background listener.
+
+    Request threads only enqueue records; a single listener thread formats
+    them (JSON by default) and writes them to stderr. ``LOG_LEVELS`` sets
+    per-logger levels, ``LOG_DEBUG_SAMPLE_RATE`` thins DEBUG records and
+    ``LOG_MAX_FIELD_LENGTH`` caps the size of any logged value.
+    """
+    global _listener, _handler
+
+    app.config.setdefault("LOG_LEVEL", "INFO")
+    app.config.setdefault("LOG_LEVELS", {"werkzeug": "WARNING", "urllib3": "WARNING"})
+    app.config.setdefault("LOG_JSON", True)
+    app.config.setdefault("LOG_DEBUG_SAMPLE_RATE", 0.1)
+    app.config.setdefault("LOG_MAX_FIELD_LENGTH", 2000)
+
+    root = logging.getLogger()
+    if _listener is not None:
+        # create_app can run many times in one process (tests); replace the old pipeline
+        _listener.stop()
+        root.removeHandler(_handler)
+
+    output = logging.StreamHandler(sys.stderr)
+    if app.config["LOG_JSON"]:
+        output.setFormatter(JsonFormatter(app.config["LOG_MAX_FIELD_LENGTH"]))
+    else:
+        output.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+
+    records = queue.SimpleQueue()
+    _handler = _PreparedQueueHandler(records)
+    _handler.addFilter(DebugSampler(app.config["LOG_DEBUG_SAMPLE_RATE"]))
+    _listener = QueueListener(records, output, respect_handler_level=True)
+    _listener.start()
+
+    root.addHandler(_handler)
+    root.setLevel(app.config["LOG_LEVEL"])
+    for name, level in app.config["LOG_LEVELS"].items():
+        logging.getLogger(name).setLevel(level)
+
+
+@atexit.register
+def _flush_logs():
+    if _listener is not None:
+        _listener.stop()
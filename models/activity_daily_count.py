@@ -0,0 +1,18 @@
+# models/activity_daily_count.py
+from extensions import db
+
+class ActivityDailyCount(db.Model):
+    """Per-user, per-day activity rollup, kept current by routes/activity_rollup.py.
+
+    ``medication_delta`` is a difference array: +1 on the day a medication
+    starts and -1 on the day after it ends, so the running sum over days
+    is the number of medications active on each day.
+    """
+    __tablename__ = 'activity_daily_counts'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    posts = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    replies = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    appointments = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    medication_delta = db.Column(db.Integer, nullable=False, default=0, server_default='0')
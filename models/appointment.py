@@ -3,6 +3,11 @@ from extensions import db
 
 class Appointment(db.Model):
     __tablename__ = 'appointments'
+    __table_args__ = (
+        db.Index('ix_appointments_user_id_date_time', 'user_id', 'date', 'time'),
+        # Due-reminder sweep (routes/appointments.py publish_due_appointments)
+        db.Index('ix_appointments_date_time', 'date', 'time'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -11,6 +16,8 @@ class Appointment(db.Model):
     date = db.Column(db.Date, nullable=False)
     time = db.Column(db.Time, nullable=False)
     description = db.Column(db.Text)
+    # When the appointment-due event went out; cleared when it is rescheduled
+    reminder_sent_at = db.Column(db.DateTime)
 
     # backref lets you do current_user.appointments
     user = db.relationship('User', backref=db.backref('appointments', lazy=True))
@@ -0,0 +1,16 @@
+# models/flagged_daily_count.py
+from extensions import db
+
+class FlaggedDailyCount(db.Model):
+    """Per-day rollup of flagged_logs, kept current by routes/flagged_report.py."""
+    __tablename__ = 'flagged_daily_counts'
+    __table_args__ = (
+        db.Index('ix_flagged_daily_counts_user_day', 'user_id', 'day'),
+    )
+
+    day = db.Column(db.Date, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    # 'unspecified' when the log entry has no category
+    category = db.Column(db.String(100), primary_key=True)
+    source_type = db.Column(db.String(20), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
@@ -3,6 +3,11 @@ from extensions import db
 
 class FlaggedLog(db.Model):
     __tablename__ = 'flagged_logs'
+    __table_args__ = (
+        # Keyset pages of one user's report, and of the moderator-wide list
+        db.Index('ix_flagged_logs_user_id_created_at_id', 'user_id', 'created_at', 'id'),
+        db.Index('ix_flagged_logs_created_at_id', 'created_at', 'id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -10,6 +15,6 @@ class FlaggedLog(db.Model):
     reason = db.Column(db.String(255), nullable=False)
     category = db.Column(db.String(100))
     source_type = db.Column(db.String(20), nullable=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
 
-    user = db.relationship('User', backref=db.backref('flagged_logs', lazy=True))
\ No newline at end of file
+    user = db.relationship('User', backref=db.backref('flagged_logs', lazy=True))
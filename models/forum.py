@@ -4,23 +4,45 @@ from datetime import datetime
 
 class ForumPost(db.Model):
     __tablename__ = 'forum_posts'
+    __table_args__ = (
+        db.Index('ix_forum_posts_created_at_id', 'created_at', 'id'),
+        db.Index('ix_forum_posts_last_activity_at_id', 'last_activity_at', 'id'),
+        db.Index('ix_forum_posts_user_id_created_at', 'user_id', 'created_at'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     title = db.Column(db.String(200), nullable=False)
     content = db.Column(db.Text, nullable=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    # Bumped whenever the post or one of its replies changes; keys the rendered fragment cache
+    version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # Denormalized from forum_replies by the forum routes; `flask forum recount` repairs drift
+    reply_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    last_activity_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    # "pending" until the moderation queue publishes it
+    status = db.Column(db.String(20), nullable=False, default='published', server_default='published')
 
     user = db.relationship('User', backref=db.backref('forum_posts', lazy=True))
-    replies = db.relationship('ForumReply', backref='post', cascade='all, delete-orphan')
+    replies = db.relationship(
+        'ForumReply',
+        backref='post',
+        cascade='all, delete-orphan',
+        order_by='ForumReply.created_at',
+    )
 
 class ForumReply(db.Model):
     __tablename__ = 'forum_replies'
+    __table_args__ = (
+        db.Index('ix_forum_replies_post_id_created_at', 'post_id', 'created_at', 'id'),
+        db.Index('ix_forum_replies_user_id_created_at', 'user_id', 'created_at'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     post_id = db.Column(db.Integer, db.ForeignKey('forum_posts.id'), nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     content = db.Column(db.Text, nullable=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    status = db.Column(db.String(20), nullable=False, default='published', server_default='published')
 
     user = db.relationship('User', backref=db.backref('forum_replies', lazy=True))
@@ -1,8 +1,14 @@
 from extensions import db
 from datetime import datetime, date
+from sqlalchemy import exists
+from sqlalchemy.ext.hybrid import hybrid_property
+from models.medication import Medication
 
 class MedicalHistory(db.Model):
     __tablename__ = 'medical_histories'
+    __table_args__ = (
+        db.Index('ix_medical_histories_profile_id', 'profile_id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     profile_id = db.Column(db.Integer, db.ForeignKey('profiles.id'), nullable=False)
@@ -16,11 +22,15 @@ class MedicalHistory(db.Model):
     # ✅ Relationship to medications
     medications = db.relationship('Medication', backref='medical_history', cascade='all, delete-orphan')
 
-    @property
+    @hybrid_property
     def has_active_medications(self):
         """Return True if at least one related medication is currently active."""
         return any(med.is_active for med in self.medications)
 
+    @has_active_medications.expression
+    def has_active_medications(cls):
+        return exists().where(Medication.medical_history_id == cls.id, Medication.is_active)
+
     def __repr__(self):
         return f"<MedicalHistory {self.disease}>"
 
@@ -1,9 +1,14 @@
 # models/medication.py
 from extensions import db
 from datetime import date
+from sqlalchemy import and_, or_
+from sqlalchemy.ext.hybrid import hybrid_property
 
 class Medication(db.Model):
     __tablename__ = 'medications'
+    __table_args__ = (
+        db.Index('ix_medications_history_start_end', 'medical_history_id', 'start_date', 'end_date'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     medical_history_id = db.Column(db.Integer, db.ForeignKey('medical_histories.id'), nullable=False)
@@ -19,7 +24,16 @@ class Medication(db.Model):
     def __repr__(self):
         return f"<Medication {self.name}>"
 
-    @property
+    @classmethod
+    def active_on(cls, day):
+        """SQL condition matching medications that are active on ``day``."""
+        return and_(
+            cls.start_date.is_not(None),
+            cls.start_date <= day,
+            or_(cls.end_date.is_(None), cls.end_date >= day),
+        )
+
+    @hybrid_property
     def is_active(self) -> bool:
         """Active if today is within [start_date, end_date] (inclusive).
         If end_date is None, active if today >= start_date.
@@ -32,6 +46,10 @@ class Medication(db.Model):
             return self.start_date <= today
         return False
 
+    @is_active.expression
+    def is_active(cls):
+        return cls.active_on(date.today())
+
     @property
     def status_label(self) -> str:
         return "Active" if self.is_active else "Inactive"
@@ -0,0 +1,39 @@
+# models/moderation_job.py
+from datetime import datetime
+from extensions import db
+
+class ModerationJob(db.Model):
+    """A post or reply submission waiting for (or done with) AI moderation.
+
+    ``action`` is ``create`` for a new pending item or ``edit`` for a proposed
+    change to a published one; edits carry the proposed text and are only
+    applied to the item once moderation clears them.
+    """
+    __tablename__ = 'moderation_jobs'
+    __table_args__ = (
+        db.Index('ix_moderation_jobs_status_id', 'status', 'id'),
+        db.Index('ix_moderation_jobs_user_id_status', 'user_id', 'status'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(20), nullable=False)          # "post" or "reply"
+    action = db.Column(db.String(20), nullable=False)        # "create" or "edit"
+    target_id = db.Column(db.Integer, nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    title = db.Column(db.String(200))
+    content = db.Column(db.Text, nullable=False)
+    # queued -> processing -> done | failed; superseded when a newer edit replaces it
+    status = db.Column(db.String(20), nullable=False, default='queued')
+    outcome = db.Column(db.String(20))                       # "published" or "flagged"
+    detail = db.Column(db.String(255))
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    claimed_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+
+    @property
+    def text(self):
+        """The text sent to moderation, formatted the way the forum always has."""
+        if self.kind == 'post':
+            return f"{self.title}\n{self.content}"
+        return self.content
@@ -0,0 +1,19 @@
+# models/moderation_verdict.py
+from datetime import datetime
+from extensions import db
+
+class ModerationVerdict(db.Model):
+    """Persistent tier of the moderation verdict cache (see routes/verdict_cache.py)."""
+    __tablename__ = 'moderation_verdicts'
+    __table_args__ = (
+        db.Index('ix_moderation_verdicts_backend_prompt', 'backend', 'prompt_version'),
+    )
+
+    # sha256 of backend, prompt version and normalized text
+    key = db.Column(db.String(64), primary_key=True)
+    backend = db.Column(db.String(20), nullable=False)
+    prompt_version = db.Column(db.String(64), nullable=False)
+    is_safe = db.Column(db.Boolean, nullable=False)
+    reason = db.Column(db.Text)
+    category = db.Column(db.String(100))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
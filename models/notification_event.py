@@ -0,0 +1,23 @@
+# models/notification_event.py
+from datetime import datetime
+from extensions import db
+
+class NotificationEvent(db.Model):
+    """Outbox of notification events (see routes/notification_broker.py).
+
+    Rows are written in the same transaction as the change they announce,
+    and every process's streams read them by id, so ``Last-Event-ID`` is
+    simply the last row a browser saw.
+    """
+    __tablename__ = 'notification_events'
+    __table_args__ = (
+        db.Index('ix_notification_events_user_id_id', 'user_id', 'id'),
+        # Ids must never be reused after old rows are pruned
+        {'sqlite_autoincrement': True},
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    kind = db.Column(db.String(40), nullable=False)
+    data = db.Column(db.Text, nullable=False)  # JSON
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
@@ -11,3 +11,7 @@ class User(db.Model, UserMixin):
     username = db.Column(db.String(50), nullable=False, unique=True)
     email = db.Column(db.String(120), nullable=False, unique=True)
     password = db.Column(db.String(200), nullable=False)
+
+    # Newest reply notification the user has marked read, as (created_at, id)
+    notifications_seen_at = db.Column(db.DateTime)
+    notifications_seen_reply_id = db.Column(db.Integer, nullable=False, default=0, server_default='0')
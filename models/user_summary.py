@@ -0,0 +1,27 @@
+# models/user_summary.py
+from extensions import db
+
+class UserSummary(db.Model):
+    """Per-user dashboard totals, kept current by routes/user_summary.py.
+
+    The medication and appointment columns depend on the current day and
+    are only valid for ``as_of``; the forum columns never go stale.
+    """
+    __tablename__ = 'user_summaries'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    as_of = db.Column(db.Date)
+
+    medication_total = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    medication_active = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+    appointment_upcoming = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # Distinct days with an appointment in the week starting at as_of
+    appointment_days_next_week = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    next_appointment_date = db.Column(db.Date)
+    next_appointment_time = db.Column(db.Time)
+
+    post_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    reply_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    last_post_at = db.Column(db.DateTime)
+    last_reply_at = db.Column(db.DateTime)
@@ -0,0 +1,117 @@
+# routes/activity_rollup.py
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import text
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from extensions import db
+from models.activity_daily_count import ActivityDailyCount
+
+ACTIVITY_COLUMNS = ("posts", "replies", "appointments", "medication_delta")
+CHART_RANGES = (7, 30, 90)
+
+
+def utc_today():
+    """The rollup's clock: forum rows are keyed by the UTC day of their
+    ``created_at``, so the chart window ends on the UTC day as well.
+
+    Appointment and medication keys are the calendar dates users entered
+    and carry no time of day, so they are used as they are.
+    """
+    return datetime.utcnow().date()
+
+
+def medication_changes(user_id, start_date, end_date, sign=1):
+    """Difference-array entries for one medication's active span (``sign=-1`` removes them).
+
+    Mirrors ``Medication.is_active``: no start date means never active.
+    """
+    if start_date is None or (end_date is not None and end_date < start_date):
+        return []
+    changes = [(user_id, start_date, "medication_delta", sign)]
+    if end_date is not None:
+        changes.append((user_id, end_date + timedelta(days=1), "medication_delta", -sign))
+    return changes
+
+
+def bump_activity(changes):
+    """Apply ``(user_id, day, column, delta)`` changes to the rollup in the caller's transaction."""
+    rows = defaultdict(lambda: dict.fromkeys(ACTIVITY_COLUMNS, 0))
+    for user_id, day, column, delta in changes:
+        rows[user_id, day][column] += delta
+    if not rows:
+        return
+    stmt = sqlite_insert(ActivityDailyCount).values([
+        {"user_id": user_id, "day": day, **counts}
+        for (user_id, day), counts in rows.items()
+    ])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["user_id", "day"],
+        set_={
+            column: getattr(ActivityDailyCount, column) + stmt.excluded[column]
+            for column in ACTIVITY_COLUMNS
+        },
+    )
+    db.session.execute(stmt)
+
+
+def rebuild_activity_rollup(conn):
+    """Recompute the whole activity rollup from posts, replies, appointments and medications."""
+    conn.execute(text("DELETE FROM activity_daily_counts"))
+    conn.execute(text(
+        "INSERT INTO activity_daily_counts (user_id, day, posts, replies, appointments, medication_delta) "
+        "SELECT user_id, day, SUM(posts), SUM(replies), SUM(appointments), SUM(medication_delta) FROM ("
+        "  SELECT user_id, date(created_at) AS day, 1 AS posts, 0 AS replies, 0 AS appointments, 0 AS medication_delta "
+        "  FROM forum_posts WHERE status = 'published' AND created_at IS NOT NULL "
+        "  UNION ALL SELECT user_id, date(created_at), 0, 1, 0, 0 "
+        "  FROM forum_replies WHERE status = 'published' AND created_at IS NOT NULL "
+        "  UNION ALL SELECT user_id, date, 0, 0, 1, 0 FROM appointments "
+        "  UNION ALL SELECT profiles.user_id, medications.start_date, 0, 0, 0, 1 "
+        "  FROM medications JOIN medical_histories ON medical_histories.id = medications.medical_history_id "
+        "  JOIN profiles ON profiles.id = medical_histories.profile_id "
+        "  WHERE medications.start_date IS NOT NULL "
+        "  AND (medications.end_date IS NULL OR medications.end_date >= medications.start_date) "
+        "  UNION ALL SELECT profiles.user_id, date(medications.end_date, '+1 day'), 0, 0, 0, -1 "
+        "  FROM medications JOIN medical_histories ON medical_histories.id = medications.medical_history_id "
+        "  JOIN profiles ON profiles.id = medical_histories.profile_id "
+        "  WHERE medications.start_date IS NOT NULL AND medications.end_date >= medications.start_date"
+        ") GROUP BY user_id, day"
+    ))
+
+
+def activity_series(user_id, days, today=None):
+    """Daily series for the ``days`` days ending ``today`` (the UTC day by default), read only from the rollup.
+
+    SQLite builds the calendar, fills the gaps and runs the window
+    aggregates: the active medication count is a running sum over the
+    difference array, offset by every delta before the range, and
+    ``active_days`` counts days with a post or reply in the trailing week.
+    The cost depends on the range, not on the size of the user's history.
+    """
+    today = today or utc_today()
+    start = today - timedelta(days=days - 1)
+    rows = db.session.execute(text(
+        "WITH RECURSIVE calendar(day) AS ("
+        "  SELECT :start UNION ALL SELECT date(day, '+1 day') FROM calendar WHERE day < :end"
+        "), daily AS ("
+        "  SELECT calendar.day AS day, "
+        "    COALESCE(activity.posts, 0) AS posts, "
+        "    COALESCE(activity.replies, 0) AS replies, "
+        "    COALESCE(activity.appointments, 0) AS appointments, "
+        "    COALESCE(activity.medication_delta, 0) AS medication_delta "
+        "  FROM calendar LEFT JOIN activity_daily_counts AS activity "
+        "    ON activity.user_id = :user_id AND activity.day = calendar.day"
+        ") "
+        "SELECT day, posts, replies, appointments, "
+        "  (SELECT COALESCE(SUM(medication_delta), 0) FROM activity_daily_counts "
+        "   WHERE user_id = :user_id AND day < :start) "
+        "  + SUM(medication_delta) OVER (ORDER BY day) AS medications, "
+        "  SUM(posts + replies > 0) OVER (ORDER BY day ROWS 6 PRECEDING) AS active_days "
+        "FROM daily ORDER BY day"
+    ), {"user_id": user_id, "start": start.isoformat(), "end": today.isoformat()}).all()
+
+    series = {"days": [date.fromisoformat(row.day) for row in rows]}
+    for name in ("posts", "replies", "appointments", "medications", "active_days"):
+        series[name] = [getattr(row, name) for row in rows]
+    return series
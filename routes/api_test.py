@@ -1,6 +1,7 @@
 import os
-import requests
 from flask import Blueprint, jsonify
+from routes.mod_gemini import GEMINI_API_BASE, GEMINI_MODEL
+from routes.mod_http import moderation_http
 
 api_test = Blueprint("api_test", __name__)
 
@@ -11,9 +12,9 @@ def test_gemini():
     if not GEMINI_KEY:
         return jsonify({"error": "Gemini API key not set."}), 400
 
-    # Use the supported model from your list
-    model = "models/gemini-2.5-flash"
-    url = f"https://generativelanguage.googleapis.com/v1/{model}:generateContent?key={GEMINI_KEY}"
+    # Use the same model as moderation
+    base = os.getenv("GEMINI_API_BASE", GEMINI_API_BASE)
+    url = f"{base}/{GEMINI_MODEL}:generateContent?key={GEMINI_KEY}"
 
     data = {
         "contents": [{
@@ -22,7 +23,7 @@ def test_gemini():
     }
 
     try:
-        response = requests.post(url, json=data)
+        response = moderation_http.post("gemini", url, json=data)
         return jsonify(response.json())
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -1,12 +1,75 @@
 # routes/appointments.py
-from flask import Blueprint, render_template, request, redirect, url_for, flash
+from flask import Blueprint, current_app, render_template, request, redirect, url_for, flash
 from flask_login import login_required, current_user
+from sqlalchemy import tuple_, update as sql_update
 from extensions import db
 from models.appointment import Appointment
-from datetime import datetime
+from routes.notification_broker import notification_broker, publish_on_commit
+from routes.activity_rollup import bump_activity
+from routes.notifications import notification_counts
+from routes.user_summary import refresh_summary
+from datetime import datetime, timedelta
 
 appointments_bp = Blueprint('appointments', __name__)
 
+
+def publish_appointment(appt, action):
+    """Push an appointment change to the owner's notification streams once committed.
+
+    This is a change event, sent when the appointment is created, edited or
+    deleted; ``publish_due_appointments`` sends the one for it coming due.
+    """
+    publish_on_commit(appt.user_id, 'appointment-changed', {
+        "action": action,
+        "id": appt.id,
+        "title": appt.title,
+        "date": appt.date.isoformat(),
+        "time": appt.time.strftime("%H:%M"),
+    })
+
+
+def publish_due_appointments(now=None):
+    """Send ``appointment-due`` for appointments starting within ``APPOINTMENT_REMINDER_LEAD`` minutes.
+
+    Each appointment is claimed by setting ``reminder_sent_at`` in a single
+    UPDATE ... RETURNING, so it is announced once even when several
+    processes sweep at the same time. Commits; returns how many were sent.
+    """
+    now = now or datetime.now()
+    due_by = now + timedelta(minutes=current_app.config["APPOINTMENT_REMINDER_LEAD"])
+    starts_at = tuple_(Appointment.date, Appointment.time)
+    due = db.session.execute(
+        sql_update(Appointment)
+        .where(
+            Appointment.reminder_sent_at.is_(None),
+            Appointment.date.between(now.date(), due_by.date()),
+            starts_at >= tuple_(now.date(), now.time()),
+            starts_at <= tuple_(due_by.date(), due_by.time()),
+        )
+        .values(reminder_sent_at=datetime.utcnow())
+        .returning(Appointment.id, Appointment.user_id, Appointment.title, Appointment.date, Appointment.time)
+        .execution_options(synchronize_session=False)
+    ).all()
+    notification_broker.publish_many([
+        (row.user_id, 'appointment-due', {
+            "id": row.id,
+            "title": row.title,
+            "date": row.date.isoformat(),
+            "time": row.time.strftime("%H:%M"),
+        })
+        for row in due
+    ])
+    db.session.commit()
+    return len(due)
+
+
+@appointments_bp.cli.command('send-due')
+def send_due_command():
+    """Send appointment-due events once; for cron when the reminder scheduler is off."""
+    sent = publish_due_appointments()
+    print(f'Sent {sent} appointment-due event(s).')
+
+
 @appointments_bp.route('/appointments', methods=['GET'])
 @login_required
 def index():
@@ -43,7 +106,12 @@ def create():
         description=description
     )
     db.session.add(appt)
+    db.session.flush()
+    publish_appointment(appt, 'created')
+    bump_activity([(current_user.id, appt.date, 'appointments', 1)])
+    refresh_summary(current_user.id, 'appointments')
     db.session.commit()
+    notification_counts.invalidate(current_user.id)
     flash('Appointment created successfully!', 'success')
     return redirect(url_for('appointments.index'))
 
@@ -55,8 +123,12 @@ def delete(appointment_id):
         flash('Unauthorized action.', 'danger')
         return redirect(url_for('appointments.index'))
 
+    publish_appointment(appt, 'deleted')
+    bump_activity([(current_user.id, appt.date, 'appointments', -1)])
     db.session.delete(appt)
+    refresh_summary(current_user.id, 'appointments')
     db.session.commit()
+    notification_counts.invalidate(current_user.id)
     flash('Appointment deleted.', 'info')
     return redirect(url_for('appointments.index'))
 
@@ -86,11 +158,20 @@ def update(appointment_id):
         flash('Invalid date/time format.', 'danger')
         return redirect(url_for('appointments.index'))
 
+    bump_activity([
+        (current_user.id, appt.date, 'appointments', -1),
+        (current_user.id, appt_date, 'appointments', 1),
+    ])
+    if (appt.date, appt.time) != (appt_date, appt_time):
+        appt.reminder_sent_at = None
     appt.title = title
     appt.date = appt_date
     appt.time = appt_time
     appt.description = description
 
+    publish_appointment(appt, 'updated')
+    refresh_summary(current_user.id, 'appointments')
     db.session.commit()
+    notification_counts.invalidate(current_user.id)
     flash('Appointment updated successfully!', 'success')
     return redirect(url_for('appointments.index'))
\ No newline at end of file
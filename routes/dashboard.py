@@ -1,12 +1,21 @@
 # routes/dashboard.py
 from datetime import datetime, timedelta
-from flask import Blueprint, render_template, redirect, url_for
+from flask import Blueprint, render_template, redirect, url_for, request, abort, current_app, jsonify
 from flask_login import login_required, current_user
+from extensions import db
+from sqlalchemy.orm import joinedload
 
 from models.appointment import Appointment
 from models.forum import ForumPost, ForumReply
-from models.profile import Profile
-from models.flagged_log import FlaggedLog
+from routes.activity_rollup import CHART_RANGES, activity_series, rebuild_activity_rollup
+from routes.flagged_report import (
+    flagged_page,
+    flagged_summary,
+    is_moderator,
+    known_categories,
+    parse_filters,
+)
+from routes.user_summary import get_summary, rebuild_user_summaries
 
 
 dashboard = Blueprint('dashboard', __name__)
@@ -27,53 +36,43 @@ def legacy_dashboard():
 @login_required
 def home():
     today = datetime.now().date()
-    week_ahead = today + timedelta(days=7)
-
-    profile = Profile.query.filter_by(user_id=current_user.id).first()
-    medication_count = 0
-    active_medications = []
-
-    if profile:
-        medication_count = sum(len(history.medications) for history in profile.medical_histories)
-        for history in profile.medical_histories:
-            active_medications.extend([med for med in history.medications if med.is_active])
+    summary = get_summary(current_user.id)
 
     medication_reminder_stats = {
-        "active": len(active_medications),
-        "total": medication_count,
+        "active": summary.medication_active,
+        "total": summary.medication_total,
     }
 
-    upcoming_appointments = (
-        Appointment.query.filter(
-            Appointment.user_id == current_user.id,
-            Appointment.date >= today,
+    # The summary counts tell us when these short lists would come back empty
+    next_five_appointments = []
+    if summary.appointment_upcoming:
+        next_five_appointments = (
+            Appointment.query.filter(
+                Appointment.user_id == current_user.id,
+                Appointment.date >= today,
+            )
+            .order_by(Appointment.date.asc(), Appointment.time.asc())
+            .limit(5)
+            .all()
+        )
+
+    recent_posts = []
+    if summary.post_count:
+        recent_posts = (
+            ForumPost.query.filter_by(user_id=current_user.id, status='published')
+            .order_by(ForumPost.created_at.desc())
+            .limit(5)
+            .all()
+        )
+    recent_replies = []
+    if summary.reply_count:
+        recent_replies = (
+            ForumReply.query.filter_by(user_id=current_user.id, status='published')
+            .options(joinedload(ForumReply.post))
+            .order_by(ForumReply.created_at.desc())
+            .limit(5)
+            .all()
         )
-        .order_by(Appointment.date.asc(), Appointment.time.asc())
-        .all()
-    )
-    appointment_count = len(upcoming_appointments)
-    next_five_appointments = upcoming_appointments[:5]
-    appointment_dates_next_week = sorted({
-        appt.date
-        for appt in upcoming_appointments
-        if appt.date <= week_ahead
-    })
-
-    forum_post_count = ForumPost.query.filter_by(user_id=current_user.id).count()
-    forum_reply_count = ForumReply.query.filter_by(user_id=current_user.id).count()
-
-    recent_posts = (
-        ForumPost.query.filter_by(user_id=current_user.id)
-        .order_by(ForumPost.created_at.desc())
-        .limit(5)
-        .all()
-    )
-    recent_replies = (
-        ForumReply.query.filter_by(user_id=current_user.id)
-        .order_by(ForumReply.created_at.desc())
-        .limit(5)
-        .all()
-    )
 
     combined_activity = [
         {
@@ -92,43 +91,104 @@ def home():
     ]
     recent_activity = sorted(combined_activity, key=lambda item: item["timestamp"], reverse=True)[:5]
 
-    chart_labels = [
-        (today - timedelta(days=6 - i)).strftime("%a")
-        for i in range(7)
-    ]
-    chart_data = [((i + len(active_medications)) % 5) + 1 for i in range(7)]
-
-    active_days_this_week = len({
-        item["timestamp"].date()
-        for item in combined_activity
-        if item.get("timestamp") and item["timestamp"].date() >= today - timedelta(days=6)
-    })
+    week = activity_series(current_user.id, 7)
+    active_days_this_week = week["active_days"][-1]
     engagement_message = None
-    if combined_activity:
+    if summary.post_count or summary.reply_count:
         engagement_message = f"You have been active {active_days_this_week} day{'s' if active_days_this_week != 1 else ''} this week."
 
     return render_template(
         'dashboard.html',
         user=current_user,
-        medication_count=medication_count,
+        medication_count=summary.medication_total,
         medication_reminder_stats=medication_reminder_stats,
-        appointment_count=appointment_count,
+        appointment_count=summary.appointment_upcoming,
         next_five_appointments=next_five_appointments,
-        appointment_dates_next_week=appointment_dates_next_week,
-        forum_post_count=forum_post_count,
-        forum_reply_count=forum_reply_count,
+        appointment_days_next_week=summary.appointment_days_next_week,
+        forum_post_count=summary.post_count,
+        forum_reply_count=summary.reply_count,
         recent_activity=recent_activity,
-        chart_labels=chart_labels,
-        chart_data=chart_data,
+        chart=chart_payload(week),
+        chart_ranges=CHART_RANGES,
         engagement_message=engagement_message,
+        is_moderator=is_moderator(current_user),
     )
 
+def chart_payload(series):
+    """Chart.js-ready labels and datasets for an ``activity_series`` result."""
+    label_format = "%a" if len(series["days"]) <= 7 else "%b %d"
+    return {
+        "days": len(series["days"]),
+        "labels": [day.strftime(label_format) for day in series["days"]],
+        "medications": series["medications"],
+        "forum": [posts + replies for posts, replies in zip(series["posts"], series["replies"])],
+        "appointments": series["appointments"],
+    }
+
+
+@dashboard.route('/dashboard/activity')
+@login_required
+def activity_chart():
+    days = request.args.get('days', 7, type=int)
+    if days not in CHART_RANGES:
+        abort(400)
+    return jsonify(chart_payload(activity_series(current_user.id, days)))
+
+
 @dashboard.route('/dashboard/flagged-report')
 @login_required
 def flagged_report():
-    flagged_items = (
-        FlaggedLog.query.filter_by(user_id=current_user.id)
-        .order_by(FlaggedLog.created_at.desc())
-        .all()
+    filters = parse_filters(request.args)
+    logs, next_cursor = flagged_page(
+        filters,
+        user_id=current_user.id,
+        cursor=request.args.get('cursor'),
+        limit=current_app.config["FLAGGED_REPORT_PAGE_SIZE"],
+    )
+    return render_template(
+        'flagged_report.html',
+        logs=logs,
+        next_cursor=next_cursor,
+        filters=filters,
+        summary=flagged_summary(filters, user_id=current_user.id),
+        categories=known_categories(current_user.id),
     )
-    return render_template('flagged_report.html', logs=flagged_items)
\ No newline at end of file
+
+
+@dashboard.route('/dashboard/moderation/flagged')
+@login_required
+def moderation_flagged():
+    if not is_moderator(current_user):
+        abort(403)
+
+    filters = parse_filters(request.args)
+    if not request.args.get('start') and not request.args.get('end'):
+        filters["start"] = datetime.utcnow().date() - timedelta(days=29)
+    logs, next_cursor = flagged_page(
+        filters,
+        cursor=request.args.get('cursor'),
+        limit=current_app.config["FLAGGED_REPORT_PAGE_SIZE"],
+    )
+    return render_template(
+        'moderation_flagged.html',
+        logs=logs,
+        next_cursor=next_cursor,
+        filters=filters,
+        summary=flagged_summary(filters, top_users=10),
+        categories=known_categories(),
+    )
+
+@dashboard.cli.command('rebuild-summaries')
+def rebuild_summaries_command():
+    """Recompute every user's dashboard summary from the source tables."""
+    with db.engine.begin() as connection:
+        rebuild_user_summaries(connection)
+    print('Dashboard summaries rebuilt.')
+
+
+@dashboard.cli.command('rebuild-activity')
+def rebuild_activity_command():
+    """Recompute the daily activity rollup behind the dashboard chart."""
+    with db.engine.begin() as connection:
+        rebuild_activity_rollup(connection)
+    print('Activity rollup rebuilt.')
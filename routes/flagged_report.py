@@ -0,0 +1,144 @@
+# routes/flagged_report.py
+from collections import Counter
+from datetime import date, datetime, time, timedelta
+
+from flask import current_app
+from sqlalchemy import func, or_, text
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import joinedload
+
+from extensions import db
+from models.flagged_daily_count import FlaggedDailyCount
+from models.flagged_log import FlaggedLog
+from models.user import User
+from routes.pagination import keyset_page
+
+UNSPECIFIED = "unspecified"
+SOURCE_TYPES = ("post", "reply")
+
+
+def is_moderator(user):
+    emails = {email.lower() for email in current_app.config["MODERATOR_EMAILS"]}
+    return bool(getattr(user, "is_authenticated", False) and user.email.lower() in emails)
+
+
+def bump_daily_counts(rows):
+    """Add new flagged-log rows (dicts) to the daily rollup in the caller's transaction."""
+    groups = Counter(
+        (row["created_at"].date(), row["user_id"], row.get("category") or UNSPECIFIED, row["source_type"])
+        for row in rows
+    )
+    if not groups:
+        return
+    stmt = sqlite_insert(FlaggedDailyCount).values([
+        {"day": day, "user_id": user_id, "category": category, "source_type": source_type, "count": count}
+        for (day, user_id, category, source_type), count in groups.items()
+    ])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["day", "user_id", "category", "source_type"],
+        set_={"count": FlaggedDailyCount.count + stmt.excluded["count"]},
+    )
+    db.session.execute(stmt)
+
+
+def rebuild_flagged_rollup(conn):
+    """Recompute the whole daily rollup from flagged_logs."""
+    conn.execute(text("DELETE FROM flagged_daily_counts"))
+    conn.execute(text(
+        "INSERT INTO flagged_daily_counts (day, user_id, category, source_type, count) "
+        "SELECT date(created_at), user_id, COALESCE(NULLIF(category, ''), :unspecified), source_type, COUNT(*) "
+        "FROM flagged_logs WHERE created_at IS NOT NULL "
+        "GROUP BY 1, 2, 3, 4"
+    ), {"unspecified": UNSPECIFIED})
+
+
+def _parse_date(value):
+    try:
+        return date.fromisoformat(value) if value else None
+    except ValueError:
+        return None
+
+
+def parse_filters(args):
+    """Read the report filters (category, source_type, start, end) from request args."""
+    source_type = args.get("source_type") or None
+    return {
+        "category": (args.get("category") or "").strip() or None,
+        "source_type": source_type if source_type in SOURCE_TYPES else None,
+        "start": _parse_date(args.get("start")),
+        "end": _parse_date(args.get("end")),
+    }
+
+
+def flagged_page(filters, user_id=None, cursor=None, limit=20):
+    """One keyset page of flagged logs, newest first; returns ``(logs, next_cursor)``."""
+    query = FlaggedLog.query.options(joinedload(FlaggedLog.user))
+    if user_id is not None:
+        query = query.filter(FlaggedLog.user_id == user_id)
+    if filters["category"] == UNSPECIFIED:
+        query = query.filter(or_(FlaggedLog.category.is_(None), FlaggedLog.category == ""))
+    elif filters["category"]:
+        query = query.filter(FlaggedLog.category == filters["category"])
+    if filters["source_type"]:
+        query = query.filter(FlaggedLog.source_type == filters["source_type"])
+    if filters["start"]:
+        query = query.filter(FlaggedLog.created_at >= datetime.combine(filters["start"], time.min))
+    if filters["end"]:
+        query = query.filter(FlaggedLog.created_at < datetime.combine(filters["end"] + timedelta(days=1), time.min))
+    return keyset_page(query, FlaggedLog.created_at, FlaggedLog.id, cursor=cursor, limit=limit)
+
+
+def flagged_summary(filters, user_id=None, top_users=0):
+    """Totals from the daily rollup, never from flagged_logs itself.
+
+    Returns the overall total plus counts by category, source type and day,
+    and (with ``top_users``) the users with the most flagged items.
+    """
+    conditions = []
+    if user_id is not None:
+        conditions.append(FlaggedDailyCount.user_id == user_id)
+    if filters["category"]:
+        conditions.append(FlaggedDailyCount.category == filters["category"])
+    if filters["source_type"]:
+        conditions.append(FlaggedDailyCount.source_type == filters["source_type"])
+    if filters["start"]:
+        conditions.append(FlaggedDailyCount.day >= filters["start"])
+    if filters["end"]:
+        conditions.append(FlaggedDailyCount.day <= filters["end"])
+
+    total = func.sum(FlaggedDailyCount.count)
+
+    def grouped(column):
+        return (
+            db.session.query(column, total)
+            .filter(*conditions)
+            .group_by(column)
+            .order_by(total.desc(), column)
+            .all()
+        )
+
+    summary = {
+        "by_category": grouped(FlaggedDailyCount.category),
+        "by_source": grouped(FlaggedDailyCount.source_type),
+        "by_day": sorted(grouped(FlaggedDailyCount.day)),
+        "top_users": [],
+    }
+    summary["total"] = sum(count for _, count in summary["by_category"])
+    if top_users:
+        summary["top_users"] = (
+            db.session.query(User.username, total)
+            .join(User, User.id == FlaggedDailyCount.user_id)
+            .filter(*conditions)
+            .group_by(User.id)
+            .order_by(total.desc())
+            .limit(top_users)
+            .all()
+        )
+    return summary
+
+
+def known_categories(user_id=None):
+    query = db.session.query(FlaggedDailyCount.category).distinct()
+    if user_id is not None:
+        query = query.filter(FlaggedDailyCount.user_id == user_id)
+    return sorted(category for (category,) in query)
@@ -0,0 +1,157 @@
+# routes/flagged_writer.py
+import atexit
+import logging
+import threading
+from datetime import datetime
+
+from extensions import db
+from models.flagged_log import FlaggedLog
+from routes.flagged_report import bump_daily_counts
+
+logger = logging.getLogger(__name__)
+
+
+class FlaggedLogWriter:
+    """Group-commit writer for ``FlaggedLog`` rows.
+
+    In buffered mode ``add`` only appends to an in-memory list; a background
+    thread writes the whole list as one multi-row INSERT every
+    ``FLAGGED_LOG_FLUSH_INTERVAL`` seconds, or as soon as
+    ``FLAGGED_LOG_BATCH_SIZE`` rows are waiting, and once more at shutdown.
+    The daily rollup is updated in the same transaction as the rows.
+
+    A batch that fails is put back and retried on the next flush; after
+    ``FLAGGED_LOG_MAX_ATTEMPTS`` failures in a row its rows are written one
+    by one, so a single bad row cannot block the rest, and rows that still
+    fail are dropped to the error log. At most ``FLAGGED_LOG_MAX_BUFFER``
+    rows wait in memory; beyond that the oldest are dropped to the log.
+    In synchronous mode (the default under TESTING) the row is added to the
+    caller's session and committed with the caller's transaction.
+    """
+
+    def __init__(self):
+        self.buffered = False
+        self.flush_interval = 1.0
+        self.batch_size = 100
+        self.max_attempts = 3
+        self.max_buffer = 10000
+        self._failures = 0
+        self._app = None
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def init_app(self, app):
+        app.config.setdefault("FLAGGED_LOG_BUFFERED", not app.config.get("TESTING", False))
+        app.config.setdefault("FLAGGED_LOG_FLUSH_INTERVAL", 1.0)
+        app.config.setdefault("FLAGGED_LOG_BATCH_SIZE", 100)
+        app.config.setdefault("FLAGGED_LOG_MAX_ATTEMPTS", 3)
+        app.config.setdefault("FLAGGED_LOG_MAX_BUFFER", 10000)
+        # Rows buffered for a previous app belong to that app's database
+        self.flush()
+        self._app = app
+        self.buffered = app.config["FLAGGED_LOG_BUFFERED"]
+        self.flush_interval = app.config["FLAGGED_LOG_FLUSH_INTERVAL"]
+        self.batch_size = app.config["FLAGGED_LOG_BATCH_SIZE"]
+        self.max_attempts = app.config["FLAGGED_LOG_MAX_ATTEMPTS"]
+        self.max_buffer = app.config["FLAGGED_LOG_MAX_BUFFER"]
+
+    def add(self, user_id, text, reason, category, source_type):
+        row = {
+            "user_id": user_id,
+            "text": text,
+            "reason": reason,
+            "category": category,
+            "source_type": source_type,
+            "created_at": datetime.utcnow(),
+        }
+        if not self.buffered:
+            db.session.add(FlaggedLog(**row))
+            bump_daily_counts([row])
+            return
+
+        with self._lock:
+            self._buffer.append(row)
+            self._trim()
+            full = len(self._buffer) >= self.batch_size
+        self._ensure_started()
+        if full:
+            self._wakeup.set()
+
+    def pending(self):
+        with self._lock:
+            return len(self._buffer)
+
+    def flush(self):
+        """Write every buffered row in one transaction; returns the number written."""
+        with self._lock:
+            rows, self._buffer = self._buffer, []
+        if not rows:
+            return 0
+
+        with self._app.app_context():
+            try:
+                if self._failures >= self.max_attempts:
+                    return self._write_one_by_one(rows)
+                self._write(rows)
+            except Exception:
+                self._failures += 1
+                logger.exception(
+                    "Could not write %d flagged log entries (attempt %d of %d)",
+                    len(rows), self._failures, self.max_attempts,
+                )
+                with self._lock:
+                    self._buffer[:0] = rows
+                    self._trim()
+                return 0
+            finally:
+                db.session.remove()
+        self._failures = 0
+        return len(rows)
+
+    def _write(self, rows):
+        try:
+            db.session.execute(db.insert(FlaggedLog), rows)
+            bump_daily_counts(rows)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+    def _write_one_by_one(self, rows):
+        written = 0
+        for row in rows:
+            try:
+                self._write([row])
+                written += 1
+            except Exception:
+                logger.exception("Dropping flagged log entry that could not be written: %r", row)
+        self._failures = 0
+        return written
+
+    def _trim(self):
+        # Caller holds the lock
+        overflow = len(self._buffer) - self.max_buffer
+        if overflow > 0:
+            dropped = self._buffer[:overflow]
+            del self._buffer[:overflow]
+            logger.error("Flagged log buffer full; dropping %d oldest entries: %r", overflow, dropped)
+
+    def _ensure_started(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="flagged-log-writer", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+
+flagged_log_writer = FlaggedLogWriter()
+atexit.register(flagged_log_writer.flush)
@@ -1,36 +1,334 @@
 # routes/forum.py
-from flask import Blueprint, render_template, request, redirect, url_for, flash
+import re
+import time
+from collections import defaultdict
+import click
+from datetime import datetime, timedelta
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, current_app, get_template_attribute
 from flask_login import login_required, current_user
+from markupsafe import Markup
+from sqlalchemy import func, select, text, update
 from extensions import db
 from models.forum import ForumPost, ForumReply
-from models.flagged_log import FlaggedLog
-from routes.moderation import is_safe_content_ai
+from models.moderation_job import ModerationJob
+from models.user import User
+from routes.activity_rollup import bump_activity
+from routes.flagged_report import rebuild_flagged_rollup
+from routes.flagged_writer import flagged_log_writer
+from routes.fragment_cache import fragment_cache
+from routes.verdict_cache import verdict_cache
+from routes.moderation import is_safe_content_ai, prompt_versions
+from routes.mod_lexicon import lexicon
+from routes.moderation_queue import dispatch_job, enqueue_job, moderation_workers
+from routes.notification_broker import publish_on_commit
+from routes.notifications import notification_counts
+from routes.pagination import keyset_page
+from routes.user_summary import refresh_summary
+from routes.forum_search import (
+    index_post,
+    index_reply,
+    rebuild_search_index,
+    remove_post,
+    remove_reply,
+    search_forum,
+)
 
 def derive_category(detail: str, text: str) -> str:
-    detail_lower = (detail or "").lower()
-    text_lower = (text or "").lower()
-    category_keywords = {
-        "suicide": ["suicide", "self-harm", "self harm"],
-        "violence": ["violence", "harm", "attack", "kill"],
-        "abuse": ["abuse", "harassment", "bullying"],
-        "threat": ["threat", "danger"],
-    }
-
-    for category, keywords in category_keywords.items():
-        if any(keyword in detail_lower or keyword in text_lower for keyword in keywords):
-            return category
-    return "unspecified"
+    return lexicon.category_for(detail, text) or "unspecified"
 
 
 def log_flagged_content(user_id: int, text: str, reason: str, category: str, source_type: str):
-    log_entry = FlaggedLog(
+    """Record blocked content and commit the caller's transaction.
+
+    The entry itself goes through the group-commit writer, so in buffered
+    mode it reaches the database with the writer's next flush.
+    """
+    flagged_log_writer.add(
         user_id=user_id,
         text=text,
         reason=reason or "Content blocked by moderation.",
         category=category,
         source_type=source_type,
     )
-    db.session.add(log_entry)
+    db.session.commit()
+
+# Placeholders left in cached post cards where the edit/delete buttons go
+_ACTION_MARKER = re.compile(r"<!--(post|reply)-actions:(\d+):(\d+)-->")
+
+
+# How long the forum page keeps telling an author about submissions moderation gave up on
+FAILED_JOB_NOTICE_DAYS = 7
+
+# Feed orderings: each one is a (timestamp, id) keyset backed by an index
+FORUM_SORTS = {
+    "recent": ForumPost.created_at,
+    "activity": ForumPost.last_activity_at,
+}
+
+
+def load_forum_page(cursor=None, sort="recent"):
+    """Return one page of posts and the cursor of the page after it."""
+    return keyset_page(
+        ForumPost.query.filter(ForumPost.status == 'published'),
+        FORUM_SORTS.get(sort, ForumPost.created_at),
+        ForumPost.id,
+        cursor=cursor,
+        limit=current_app.config["FORUM_PAGE_SIZE"],
+    )
+
+
+def load_reply_page(post_id, cursor=None):
+    """Return one oldest-first page of a post's published replies and the next cursor.
+
+    The page's authors are loaded with one query so ``reply.user`` never
+    triggers a per-reply lookup.
+    """
+    replies, next_cursor = keyset_page(
+        ForumReply.query.filter(ForumReply.post_id == post_id, ForumReply.status == 'published'),
+        ForumReply.created_at,
+        ForumReply.id,
+        cursor=cursor,
+        limit=current_app.config["FORUM_REPLY_PAGE_SIZE"],
+        descending=False,
+    )
+    author_ids = {reply.user_id for reply in replies}
+    if author_ids:
+        User.query.filter(User.id.in_(author_ids)).all()
+    return replies, next_cursor
+
+
+def render_post_cards(posts):
+    """Return ``{post_id: html}`` for ``posts``, rendering only fragment cache misses.
+
+    Replies and authors for the misses are loaded with one query each, so a
+    page costs at most two queries on top of the page query itself.
+    """
+    cards = {}
+    misses = []
+    for post in posts:
+        html = fragment_cache.get(post.id, post.version)
+        if html is None:
+            misses.append(post)
+        else:
+            cards[post.id] = html
+
+    if misses:
+        replies_by_post = defaultdict(list)
+        replies = (
+            ForumReply.query.filter(
+                ForumReply.post_id.in_([post.id for post in misses]),
+                ForumReply.status == 'published',
+            )
+            .order_by(ForumReply.created_at.asc(), ForumReply.id.asc())
+            .all()
+        )
+        for reply in replies:
+            replies_by_post[reply.post_id].append(reply)
+
+        # Loading the authors up front lets post.user / reply.user resolve from the identity map
+        author_ids = {post.user_id for post in misses} | {reply.user_id for reply in replies}
+        User.query.filter(User.id.in_(author_ids)).all()
+
+        for post in misses:
+            html = render_template(
+                'partials/forum_post_card.html',
+                post=post,
+                replies=replies_by_post[post.id],
+            )
+            fragment_cache.set(post.id, post.version, html)
+            cards[post.id] = html
+
+    return {post_id: personalize_card(html) for post_id, html in cards.items()}
+
+
+def personalize_card(html):
+    """Fill a cached card's action placeholders with the current user's buttons."""
+    macros = {
+        "post": get_template_attribute('partials/forum_actions.html', 'post_actions'),
+        "reply": get_template_attribute('partials/forum_actions.html', 'reply_actions'),
+    }
+
+    def fill(match):
+        kind, item_id, author_id = match.group(1), int(match.group(2)), int(match.group(3))
+        if not current_user.is_authenticated or author_id != current_user.id:
+            return ""
+        return str(macros[kind](item_id))
+
+    return Markup(_ACTION_MARKER.sub(fill, html))
+
+
+def touch_post(post_id, values=None):
+    """Bump a post's version in the current transaction so its cached card is re-rendered.
+
+    ``values`` are extra column updates applied in the same UPDATE statement.
+    """
+    changes = {ForumPost.version: ForumPost.version + 1}
+    changes.update(values or {})
+    ForumPost.query.filter_by(id=post_id).update(changes, synchronize_session=False)
+    fragment_cache.invalidate(post_id)
+
+
+def recount_post_activity(connection):
+    """Recompute reply_count and last_activity_at for every post in one statement."""
+    connection.execute(text(
+        "UPDATE forum_posts SET "
+        "reply_count = (SELECT COUNT(*) FROM forum_replies "
+        "WHERE forum_replies.post_id = forum_posts.id AND forum_replies.status = 'published'), "
+        "last_activity_at = COALESCE("
+        "(SELECT MAX(created_at) FROM forum_replies "
+        "WHERE forum_replies.post_id = forum_posts.id AND forum_replies.status = 'published'), "
+        "created_at), "
+        "version = version + 1"
+    ))
+
+def _publish(job):
+    """Apply a cleared job to its post or reply in the current transaction."""
+    now = datetime.utcnow()
+    if job.kind == 'post':
+        post = db.session.get(ForumPost, job.target_id)
+        if job.action == 'edit':
+            post.title = job.title
+            post.content = job.content
+        else:
+            # Published posts enter the feed at the time they became visible
+            post.status = 'published'
+            post.created_at = now
+            post.last_activity_at = now
+            bump_activity([(post.user_id, now.date(), 'posts', 1)])
+            refresh_summary(post.user_id, 'forum')
+        # An edit to a post still waiting on its own review stays out of search
+        if post.status == 'published':
+            index_post(post)
+        touch_post(post.id)
+        return
+
+    reply = db.session.get(ForumReply, job.target_id)
+    if job.action == 'edit':
+        reply.content = job.content
+        touch_post(reply.post_id)
+    else:
+        reply.status = 'published'
+        reply.created_at = now
+        touch_post(reply.post_id, {
+            ForumPost.reply_count: ForumPost.reply_count + 1,
+            ForumPost.last_activity_at: now,
+        })
+        owner_id = reply.post.user_id
+        notification_counts.invalidate(owner_id)
+        if reply.user_id != owner_id:
+            publish_on_commit(owner_id, 'reply', {
+                "id": reply.id,
+                "post_id": reply.post_id,
+                "username": reply.user.username,
+                "content": reply.content[:200],
+                "created_at": now.isoformat(),
+            })
+        bump_activity([(reply.user_id, now.date(), 'replies', 1)])
+        refresh_summary(reply.user_id, 'forum')
+    if reply.status == 'published':
+        index_reply(reply)
+
+
+def _reject(job, detail, category):
+    """Drop a blocked submission and record it in the flagged log (commits)."""
+    if job.action == 'create':
+        if job.kind == 'post':
+            db.session.delete(db.session.get(ForumPost, job.target_id))
+            remove_post(job.target_id)
+        else:
+            db.session.delete(db.session.get(ForumReply, job.target_id))
+            remove_reply(job.target_id)
+        refresh_summary(job.user_id, 'forum')
+    log_flagged_content(job.user_id, job.text, detail, category, job.kind)
+
+
+def _load_target(job):
+    """The job's post or reply, or None if it is gone. A reply whose thread went away is dropped."""
+    model = ForumPost if job.kind == 'post' else ForumReply
+    target = db.session.get(model, job.target_id)
+    if target is not None and job.kind == 'reply' and target.post is None:
+        db.session.delete(target)
+        target = None
+    return target
+
+
+def _finish_job(job_id):
+    """Mark a job done unless it was already handled; returns True if this call finished it."""
+    finished = db.session.execute(
+        update(ModerationJob)
+        .where(ModerationJob.id == job_id, ModerationJob.status.in_(('queued', 'processing')))
+        .values(status='done', finished_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    return finished.rowcount == 1
+
+
+def process_moderation_job(job_id):
+    """Moderate one queued submission, then publish it or turn it into a FlaggedLog entry.
+
+    Returns ``(is_safe, detail)``, or None if the job was already handled or
+    its post/reply has been deleted in the meantime. The backend call runs
+    outside any transaction; the job and its target are loaded again and
+    re-checked afterwards, so the database stays writable while moderation
+    is slow.
+    """
+    job = db.session.get(ModerationJob, job_id)
+    if job is None or job.status not in ('queued', 'processing'):
+        db.session.commit()
+        return None
+    submitted = job.text
+    if _load_target(job) is None:
+        _finish_job(job_id)
+        db.session.commit()
+        return None
+    db.session.commit()
+
+    moderation_result = is_safe_content_ai(submitted)
+    is_safe = moderation_result[0]
+    detail = moderation_result[1] if len(moderation_result) > 1 else "Content blocked by moderation."
+    category = moderation_result[2] if len(moderation_result) > 2 else derive_category(detail, submitted)
+
+    # Another worker may have finished the job, or the item may be gone, by now
+    if not _finish_job(job_id):
+        db.session.commit()
+        return None
+    job = db.session.get(ModerationJob, job_id)
+    if _load_target(job) is None:
+        db.session.commit()
+        return None
+
+    job.detail = (detail or "")[:255]
+    if is_safe:
+        job.outcome = 'published'
+        _publish(job)
+        db.session.commit()
+    else:
+        job.outcome = 'flagged'
+        _reject(job, detail, category)
+    return is_safe, detail
+
+def discard_failed_job(job_id):
+    """Clean up after a job moderation gave up on (commits).
+
+    A pending post or reply it would have published is deleted, since
+    nobody could ever see it, and the author is notified. A failed edit
+    leaves the published item as it was.
+    """
+    job = db.session.get(ModerationJob, job_id)
+    if job is None or job.status != 'failed':
+        return
+    if job.action == 'create':
+        model = ForumPost if job.kind == 'post' else ForumReply
+        target = db.session.get(model, job.target_id)
+        if target is not None and target.status == 'pending':
+            db.session.delete(target)
+            refresh_summary(job.user_id, 'forum')
+    publish_on_commit(job.user_id, 'moderation-failed', {
+        "id": job.id,
+        "kind": job.kind,
+        "action": job.action,
+        "title": job.title,
+    })
     db.session.commit()
 
 forum = Blueprint('forum', __name__)
@@ -38,8 +336,129 @@ forum = Blueprint('forum', __name__)
 @forum.route('/forum')
 @login_required
 def forum_home():
-    posts = ForumPost.query.order_by(ForumPost.created_at.desc()).all()
-    return render_template('forum.html', posts=posts)
+    sort = request.args.get('sort', 'recent')
+    posts, next_cursor = load_forum_page(request.args.get('cursor'), sort)
+    cards = render_post_cards(posts)
+    pending_jobs = (
+        ModerationJob.query.filter(
+            ModerationJob.user_id == current_user.id,
+            ModerationJob.status.in_(['queued', 'processing']),
+        )
+        .order_by(ModerationJob.id.desc())
+        .all()
+    )
+    failed_jobs = (
+        ModerationJob.query.filter(
+            ModerationJob.user_id == current_user.id,
+            ModerationJob.status == 'failed',
+            ModerationJob.finished_at >= datetime.utcnow() - timedelta(days=FAILED_JOB_NOTICE_DAYS),
+        )
+        .order_by(ModerationJob.id.desc())
+        .all()
+    )
+    return render_template(
+        'forum.html',
+        posts=posts,
+        cards=cards,
+        next_cursor=next_cursor,
+        sort=sort,
+        pending_jobs=pending_jobs,
+        failed_jobs=failed_jobs,
+    )
+
+@forum.route('/forum/more')
+@login_required
+def forum_more():
+    posts, next_cursor = load_forum_page(request.args.get('cursor'), request.args.get('sort', 'recent'))
+    cards = render_post_cards(posts)
+    html = render_template('partials/forum_posts.html', posts=posts, cards=cards)
+    return jsonify({"html": html, "next_cursor": next_cursor})
+
+@forum.route('/forum/<int:post_id>')
+@login_required
+def thread_detail(post_id):
+    post = ForumPost.query.filter_by(id=post_id, status='published').first_or_404()
+    replies, next_cursor = load_reply_page(post.id)
+    return render_template('thread_detail.html', post=post, replies=replies, next_cursor=next_cursor)
+
+@forum.route('/forum/<int:post_id>/replies')
+@login_required
+def thread_replies(post_id):
+    ForumPost.query.filter_by(id=post_id, status='published').first_or_404()
+    replies, next_cursor = load_reply_page(post_id, request.args.get('cursor'))
+    html = render_template('partials/forum_replies.html', replies=replies)
+    return jsonify({"html": html, "next_cursor": next_cursor})
+
+@forum.route('/forum/cache-stats')
+@login_required
+def cache_stats():
+    return jsonify(fragment_cache.stats())
+
+@forum.route('/forum/search')
+@login_required
+def search():
+    query = (request.args.get('q') or '').strip()
+    page = request.args.get('page', 1, type=int)
+    hits, has_next = search_forum(query, page, current_app.config["FORUM_SEARCH_PAGE_SIZE"])
+
+    titles = {}
+    post_ids = {hit["post_id"] for hit in hits}
+    if post_ids:
+        rows = db.session.query(ForumPost.id, ForumPost.title).filter(ForumPost.id.in_(post_ids))
+        titles = dict(rows.all())
+    for hit in hits:
+        hit["post_title"] = titles.get(hit["post_id"], "")
+
+    return render_template('forum_search.html', query=query, hits=hits, page=page, has_next=has_next)
+
+@forum.cli.command('rebuild-search')
+def rebuild_search_command():
+    """Rebuild the forum full-text search index from existing posts and replies."""
+    with db.engine.begin() as connection:
+        rebuild_search_index(connection)
+    print('Forum search index rebuilt.')
+
+@forum.cli.command('recount')
+def recount_command():
+    """Repair the denormalized reply counts and last activity times of all posts."""
+    with db.engine.begin() as connection:
+        recount_post_activity(connection)
+    fragment_cache.clear()
+    print('Forum reply counts and activity times recomputed.')
+
+@forum.cli.command('purge-verdicts')
+@click.option('--all', 'purge_all', is_flag=True, help='Drop every cached verdict, not just outdated ones.')
+def purge_verdicts_command(purge_all):
+    """Drop cached moderation verdicts made with an outdated (or any) prompt."""
+    deleted = verdict_cache.purge(None if purge_all else prompt_versions())
+    db.session.commit()
+    print(f'Purged {deleted} cached moderation verdict(s).')
+
+@forum.cli.command('work')
+def work_command():
+    """Run the moderation workers in the foreground until interrupted.
+
+    Web processes only queue jobs when MODERATION_ASYNC is on; run this next
+    to them (``python app.py`` starts the workers in its serving process).
+    """
+    app = current_app._get_current_object()
+    moderation_workers.start(app, process_moderation_job, discard_failed_job)
+    print(f"Moderation workers running ({app.config['MODERATION_WORKERS']}). Press Ctrl+C to stop.")
+    try:
+        while moderation_workers.running:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        moderation_workers.stop()
+    print('Moderation workers stopped.')
+
+@forum.cli.command('rebuild-flag-rollup')
+def rebuild_flag_rollup_command():
+    """Recompute the daily flagged-content rollup from the flagged log."""
+    with db.engine.begin() as connection:
+        rebuild_flagged_rollup(connection)
+    print('Flagged content rollup rebuilt.')
 
 @forum.route('/forum/new', methods=['POST'])
 @login_required
@@ -51,34 +470,28 @@ def new_post():
         flash('Please fill out all fields.', 'warning')
         return redirect(url_for('forum.forum_home'))
 
-    # Run moderation
-    moderation_result = is_safe_content_ai(f"{title}\n{content}")
-    is_safe = moderation_result[0]
-    detail = moderation_result[1] if len(moderation_result) > 1 else "Content blocked by moderation."
-    category = moderation_result[2] if len(moderation_result) > 2 else derive_category(detail, f"{title}\n{content}")
-
-    # If unsafe → block and stop
-    if not is_safe:
-        log_flagged_content(
-            current_user.id,
-            f"{title}\n{content}",
-            detail,
-            category,
-            "post",
-        )
-        flash(f'⚠️ Post blocked: {detail}', 'danger')
-        return redirect(url_for('forum.forum_home'))
-
-    # SAFE → Save the post
+    # Save as pending; the moderation queue publishes or blocks it
+    now = datetime.utcnow()
     post = ForumPost(
         user_id=current_user.id,
         title=title,
-        content=content
+        content=content,
+        created_at=now,
+        last_activity_at=now,
+        status='pending',
     )
     db.session.add(post)
+    db.session.flush()
+    job = enqueue_job('post', 'create', post.id, current_user.id, content, title=title)
     db.session.commit()
 
-    flash('✅ Post added successfully!', 'success')
+    outcome = dispatch_job(job.id, process_moderation_job)
+    if outcome is None:
+        flash('📝 Post submitted. It will appear once moderation has reviewed it.', 'info')
+    elif outcome[0]:
+        flash('✅ Post added successfully!', 'success')
+    else:
+        flash(f'⚠️ Post blocked: {outcome[1]}', 'danger')
     return redirect(url_for('forum.forum_home'))
 
 @forum.route('/forum/edit/<int:post_id>', methods=['GET', 'POST'])
@@ -97,25 +510,18 @@ def edit_post(post_id):
             flash('Please fill out all fields.', 'warning')
             return redirect(url_for('forum.edit_post', post_id=post_id))
 
-        moderation_result = is_safe_content_ai(f"{title}\n{content}")
-        is_safe = moderation_result[0]
-        detail = moderation_result[1] if len(moderation_result) > 1 else "Content blocked by moderation."
-        category = moderation_result[2] if len(moderation_result) > 2 else derive_category(detail, f"{title}\n{content}")
-        if not is_safe:
-            log_flagged_content(
-                current_user.id,
-                f"{title}\n{content}",
-                detail,
-                category,
-                "post",
-            )
-            flash(f'⚠️ Update blocked: {detail}', 'danger')
-            return redirect(url_for('forum.edit_post', post_id=post_id))
-
-        post.title = title
-        post.content = content
+        # The post keeps its current text until moderation clears the edit
+        job = enqueue_job('post', 'edit', post.id, current_user.id, content, title=title)
         db.session.commit()
-        flash('✅ Post updated successfully!', 'success')
+
+        outcome = dispatch_job(job.id, process_moderation_job)
+        if outcome is None:
+            flash('📝 Changes submitted. They will appear once moderation has reviewed them.', 'info')
+        elif not outcome[0]:
+            flash(f'⚠️ Update blocked: {outcome[1]}', 'danger')
+            return redirect(url_for('forum.edit_post', post_id=post_id))
+        else:
+            flash('✅ Post updated successfully!', 'success')
         return redirect(url_for('forum.forum_home'))
 
     return render_template('edit_post.html', post=post)
@@ -123,36 +529,38 @@ def edit_post(post_id):
 @forum.route('/forum/<int:post_id>/reply', methods=['POST'])
 @login_required
 def reply_post(post_id):
+    # Replies sent from the thread page return there instead of the feed
+    if request.form.get('return_to') == 'thread':
+        back = url_for('forum.thread_detail', post_id=post_id)
+    else:
+        back = url_for('forum.forum_home')
+
+    ForumPost.query.filter_by(id=post_id, status='published').first_or_404()
     content = request.form.get('content')
     if not content:
         flash('Reply cannot be empty.', 'warning')
-        return redirect(url_for('forum.forum_home'))
-
-    moderation_result = is_safe_content_ai(content)
-    is_safe = moderation_result[0]
-    detail = moderation_result[1] if len(moderation_result) > 1 else "Content blocked by moderation."
-    category = moderation_result[2] if len(moderation_result) > 2 else derive_category(detail, content)
-    if not is_safe:
-        log_flagged_content(
-            current_user.id,
-            content,
-            detail,
-            category,
-            "reply",
-        )
-        flash(f'⚠️ Reply blocked: {detail}', 'danger')
-        return redirect(url_for('forum.forum_home'))
+        return redirect(back)
 
     reply = ForumReply(
         post_id=post_id, 
         user_id=current_user.id, 
-        content=content
+        content=content,
+        created_at=datetime.utcnow(),
+        status='pending',
     )
     db.session.add(reply)
+    db.session.flush()
+    job = enqueue_job('reply', 'create', reply.id, current_user.id, content)
     db.session.commit()
 
-    flash('💬 Reply added successfully.', 'success')
-    return redirect(url_for('forum.forum_home'))
+    outcome = dispatch_job(job.id, process_moderation_job)
+    if outcome is None:
+        flash('📝 Reply submitted. It will appear once moderation has reviewed it.', 'info')
+    elif outcome[0]:
+        flash('💬 Reply added successfully.', 'success')
+    else:
+        flash(f'⚠️ Reply blocked: {outcome[1]}', 'danger')
+    return redirect(back)
 
 
 
@@ -170,24 +578,17 @@ def edit_reply(reply_id):
             flash('Reply cannot be empty.', 'warning')
             return redirect(url_for('forum.edit_reply', reply_id=reply_id))
 
-        moderation_result = is_safe_content_ai(content)
-        is_safe = moderation_result[0]
-        detail = moderation_result[1] if len(moderation_result) > 1 else "Content blocked by moderation."
-        category = moderation_result[2] if len(moderation_result) > 2 else derive_category(detail, content)
-        if not is_safe:
-            log_flagged_content(
-                current_user.id,
-                content,
-                detail,
-                category,
-                "reply",
-            )
-            flash(f'⚠️ Update blocked: {detail}', 'danger')
-            return redirect(url_for('forum.edit_reply', reply_id=reply_id))
-
-        reply.content = content
+        job = enqueue_job('reply', 'edit', reply.id, current_user.id, content)
         db.session.commit()
-        flash('✅ Reply updated successfully!', 'success')
+
+        outcome = dispatch_job(job.id, process_moderation_job)
+        if outcome is None:
+            flash('📝 Changes submitted. They will appear once moderation has reviewed them.', 'info')
+        elif not outcome[0]:
+            flash(f'⚠️ Update blocked: {outcome[1]}', 'danger')
+            return redirect(url_for('forum.edit_reply', reply_id=reply_id))
+        else:
+            flash('✅ Reply updated successfully!', 'success')
         return redirect(url_for('forum.forum_home'))
 
     return render_template('edit_reply.html', reply=reply)
@@ -201,9 +602,29 @@ def delete_post(post_id):
         flash('You are not authorized to delete this post.', 'danger')
         return redirect(url_for('forum.forum_home'))
 
+    replies = (
+        db.session.query(ForumReply.id, ForumReply.user_id, ForumReply.created_at, ForumReply.status)
+        .filter_by(post_id=post.id)
+        .all()
+    )
+    remove_post(post.id, [reply.id for reply in replies])
+    # Deleting the thread also takes other people's replies with it
+    activity = [
+        (reply.user_id, reply.created_at.date(), 'replies', -1)
+        for reply in replies
+        if reply.status == 'published'
+    ]
+    if post.status == 'published':
+        activity.append((post.user_id, post.created_at.date(), 'posts', -1))
+    bump_activity(activity)
     ForumReply.query.filter_by(post_id=post.id).delete()
+    owner_id = post.user_id
     db.session.delete(post)
+    for user_id in {owner_id} | {reply.user_id for reply in replies}:
+        refresh_summary(user_id, 'forum')
     db.session.commit()
+    fragment_cache.invalidate(post_id)
+    notification_counts.invalidate(owner_id)
     flash('🗑️ Post and its replies deleted successfully.', 'success')
     return redirect(url_for('forum.forum_home'))
 
@@ -216,7 +637,25 @@ def delete_reply(reply_id):
         flash('You are not authorized to delete this reply.', 'danger')
         return redirect(url_for('forum.forum_home'))
 
+    if reply.status == 'published':
+        remove_reply(reply.id)
+        latest_other_reply = (
+            select(func.max(ForumReply.created_at))
+            .where(
+                ForumReply.post_id == reply.post_id,
+                ForumReply.id != reply.id,
+                ForumReply.status == 'published',
+            )
+            .scalar_subquery()
+        )
+        touch_post(reply.post_id, {
+            ForumPost.reply_count: ForumPost.reply_count - 1,
+            ForumPost.last_activity_at: func.coalesce(latest_other_reply, ForumPost.created_at),
+        })
+        notification_counts.invalidate(reply.post.user_id)
+        bump_activity([(reply.user_id, reply.created_at.date(), 'replies', -1)])
     db.session.delete(reply)
+    refresh_summary(reply.user_id, 'forum')
     db.session.commit()
     flash('🗑️ Reply deleted successfully.', 'success')
     return redirect(url_for('forum.forum_home'))
@@ -0,0 +1,146 @@
+# routes/forum_search.py
+from markupsafe import Markup, escape
+from sqlalchemy import text
+from extensions import db
+
+SEARCH_TABLE = "forum_search"
+
+# snippet() wraps matched terms in these control characters so the excerpt can
+# be HTML-escaped before the <mark> tags go in.
+_HIT_START = "\x02"
+_HIT_END = "\x03"
+
+# Posts and replies share one FTS5 table; their ids are interleaved into the
+# rowid (even = post, odd = reply) so updates and deletes are rowid lookups.
+def _post_rowid(post_id):
+    return post_id * 2
+
+
+def _reply_rowid(reply_id):
+    return reply_id * 2 + 1
+
+
+def ensure_search_index(connection):
+    """Create the FTS5 table if it is missing. Returns True when it was just created."""
+    exists = connection.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+        {"name": SEARCH_TABLE},
+    ).first()
+    if exists:
+        return False
+
+    connection.execute(text(
+        f"CREATE VIRTUAL TABLE {SEARCH_TABLE} USING fts5("
+        "title, content, kind UNINDEXED, post_id UNINDEXED, "
+        "tokenize = 'porter unicode61')"
+    ))
+    # Make the built-in rank column bm25 with titles weighted above bodies, so
+    # ORDER BY rank can use FTS5's optimised top-k path.
+    connection.execute(text(
+        f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rank) VALUES ('rank', 'bm25(2.0, 1.0)')"
+    ))
+    return True
+
+
+def rebuild_search_index(connection):
+    """Repopulate the index from forum_posts and forum_replies in bulk."""
+    connection.execute(text(f"DELETE FROM {SEARCH_TABLE}"))
+    connection.execute(text(
+        f"INSERT INTO {SEARCH_TABLE}(rowid, title, content, kind, post_id) "
+        "SELECT id * 2, title, content, 'post', id FROM forum_posts WHERE status = 'published'"
+    ))
+    connection.execute(text(
+        f"INSERT INTO {SEARCH_TABLE}(rowid, title, content, kind, post_id) "
+        "SELECT id * 2 + 1, '', content, 'reply', post_id FROM forum_replies WHERE status = 'published'"
+    ))
+    connection.execute(text(f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}) VALUES ('optimize')"))
+
+
+def _write_row(rowid, title, content, kind, post_id):
+    db.session.execute(text(f"DELETE FROM {SEARCH_TABLE} WHERE rowid = :rowid"), {"rowid": rowid})
+    db.session.execute(
+        text(
+            f"INSERT INTO {SEARCH_TABLE}(rowid, title, content, kind, post_id) "
+            "VALUES (:rowid, :title, :content, :kind, :post_id)"
+        ),
+        {"rowid": rowid, "title": title, "content": content, "kind": kind, "post_id": post_id},
+    )
+
+
+def index_post(post):
+    """Add or refresh a post in the index; runs in the caller's transaction."""
+    _write_row(_post_rowid(post.id), post.title, post.content, "post", post.id)
+
+
+def index_reply(reply):
+    """Add or refresh a reply in the index; runs in the caller's transaction."""
+    _write_row(_reply_rowid(reply.id), "", reply.content, "reply", reply.post_id)
+
+
+def remove_reply(reply_id):
+    db.session.execute(
+        text(f"DELETE FROM {SEARCH_TABLE} WHERE rowid = :rowid"),
+        {"rowid": _reply_rowid(reply_id)},
+    )
+
+
+def remove_post(post_id, reply_ids=()):
+    """Drop a post and the given replies from the index."""
+    rowids = [_post_rowid(post_id)] + [_reply_rowid(reply_id) for reply_id in reply_ids]
+    for rowid in rowids:
+        db.session.execute(text(f"DELETE FROM {SEARCH_TABLE} WHERE rowid = :rowid"), {"rowid": rowid})
+
+
+def build_match_query(raw_query):
+    """Turn free text into a safe FTS5 query: every term quoted, the last one prefix-matched."""
+    terms = [term.replace('"', "") for term in (raw_query or "").split()]
+    terms = [term for term in terms if term]
+    if not terms:
+        return None
+    quoted = [f'"{term}"' for term in terms]
+    quoted[-1] += "*"
+    return " ".join(quoted)
+
+
+def highlight(excerpt):
+    """Escape a snippet and turn the match markers into <mark> tags."""
+    escaped = str(escape(excerpt or ""))
+    return Markup(escaped.replace(_HIT_START, "<mark>").replace(_HIT_END, "</mark>"))
+
+
+def search_forum(raw_query, page=1, per_page=20):
+    """Return ``(hits, has_next)`` for one page of bm25-ranked matches.
+
+    Each hit is a dict with ``kind``, ``id``, ``post_id`` and a highlighted ``excerpt``.
+    """
+    match = build_match_query(raw_query)
+    if not match:
+        return [], False
+
+    page = max(page, 1)
+    rows = db.session.execute(
+        text(
+            f"SELECT rowid, kind, post_id, "
+            f"snippet({SEARCH_TABLE}, -1, :start, :end, '…', 16) AS excerpt "
+            f"FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH :match "
+            "ORDER BY rank LIMIT :limit OFFSET :offset"
+        ),
+        {
+            "start": _HIT_START,
+            "end": _HIT_END,
+            "match": match,
+            "limit": per_page + 1,
+            "offset": (page - 1) * per_page,
+        },
+    ).all()
+
+    hits = [
+        {
+            "kind": row.kind,
+            "id": row.rowid // 2,
+            "post_id": row.post_id,
+            "excerpt": highlight(row.excerpt),
+        }
+        for row in rows[:per_page]
+    ]
+    return hits, len(rows) > per_page
@@ -0,0 +1,68 @@
+# routes/fragment_cache.py
+import threading
+from collections import OrderedDict
+
+
+class FragmentCache:
+    """LRU cache of rendered forum post cards.
+
+    Entries are stored per post id together with the post's ``version``
+    stamp; a lookup only hits when the stamp still matches, so a write that
+    bumps the version makes older renders unreachable even in other worker
+    processes. ``invalidate`` additionally frees the local entry right away.
+    """
+
+    def __init__(self, max_entries=1000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def init_app(self, app):
+        app.config.setdefault("FORUM_FRAGMENT_CACHE_SIZE", 1000)
+        self.max_entries = app.config["FORUM_FRAGMENT_CACHE_SIZE"]
+        self.clear()
+
+    def get(self, post_id, version):
+        with self._lock:
+            entry = self._entries.get(post_id)
+            if entry is None or entry[0] != version:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(post_id)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, post_id, version, html):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[post_id] = (version, html)
+            self._entries.move_to_end(post_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, post_id):
+        with self._lock:
+            self._entries.pop(post_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+            }
+
+
+fragment_cache = FragmentCache()
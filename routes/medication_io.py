@@ -0,0 +1,149 @@
+# routes/medication_io.py
+import csv
+import io
+import itertools
+import json
+from datetime import datetime
+
+from sqlalchemy import select
+
+from extensions import db
+from models.medical_history import MedicalHistory
+from models.medication import Medication
+from models.profile import Profile
+
+MEDICATION_FIELDS = ("name", "dosage", "frequency", "start_date", "end_date", "reminder_time", "notes")
+EXPORT_FIELDS = ("record_id", "condition") + MEDICATION_FIELDS
+_LENGTHS = {
+    name: Medication.__table__.c[name].type.length
+    for name in MEDICATION_FIELDS
+    if getattr(Medication.__table__.c[name].type, "length", None)
+}
+_FORMATS = {"start_date": "%Y-%m-%d", "end_date": "%Y-%m-%d", "reminder_time": "%H:%M"}
+_FORMAT_HINTS = {"%Y-%m-%d": "YYYY-MM-DD", "%H:%M": "HH:MM"}
+
+
+class MedicationImportError(ValueError):
+    """The upload as a whole cannot be read (wrong format, not a list of rows, too many rows)."""
+
+
+def read_medication_upload(upload, max_rows):
+    """Return the rows of a CSV or JSON upload as a list of dicts.
+
+    The format follows the file extension, falling back to the content type.
+    Column names are the ones the exports write, so an export
+    can be imported again; unknown columns are ignored. CSV files are read
+    no further than one row past ``max_rows``; the size of JSON files is
+    bounded by the route's request size limit.
+    """
+    filename = (upload.filename or "").lower()
+    if filename.endswith(".json") or upload.mimetype == "application/json":
+        try:
+            records = json.load(upload.stream)
+        except (UnicodeDecodeError, ValueError):
+            raise MedicationImportError("The file is not valid JSON.")
+        if not isinstance(records, list) or not all(isinstance(record, dict) for record in records):
+            raise MedicationImportError("JSON imports must be a list of objects.")
+    elif filename.endswith(".csv") or upload.mimetype in ("text/csv", "application/vnd.ms-excel"):
+        try:
+            reader = csv.DictReader(io.TextIOWrapper(upload.stream, encoding="utf-8-sig", newline=""))
+            records = list(itertools.islice(reader, max_rows + 1))
+        except (UnicodeDecodeError, csv.Error):
+            raise MedicationImportError("The file is not a readable UTF-8 CSV file.")
+    else:
+        raise MedicationImportError("Upload a .csv or .json file.")
+
+    if not records:
+        raise MedicationImportError("The file has no rows.")
+    if len(records) > max_rows:
+        raise MedicationImportError(f"Import at most {max_rows} rows at a time.")
+    return records
+
+
+def validate_medication_rows(records, medical_history_id):
+    """Turn uploaded records into insert parameters.
+
+    Returns ``(rows, errors)`` where ``errors`` is a list of
+    ``(row_number, message)``; row numbers count data rows from 1. Each
+    value is parsed once here, so the insert only sees typed values.
+    """
+    rows, errors = [], []
+    for number, record in enumerate(records, start=1):
+        row = {"medical_history_id": medical_history_id}
+        problems = []
+        for name in MEDICATION_FIELDS:
+            value = record.get(name)
+            value = str(value).strip() if value is not None else ""
+            if not value:
+                row[name] = None
+                continue
+            if name in _FORMATS:
+                try:
+                    parsed = datetime.strptime(value, _FORMATS[name])
+                except ValueError:
+                    problems.append(f"{name} must be {_FORMAT_HINTS[_FORMATS[name]]}")
+                    continue
+                row[name] = parsed.time() if name == "reminder_time" else parsed.date()
+                continue
+            if name in _LENGTHS and len(value) > _LENGTHS[name]:
+                problems.append(f"{name} is longer than {_LENGTHS[name]} characters")
+            row[name] = value
+
+        if not row["name"]:
+            problems.insert(0, "name is required")
+        if row.get("start_date") and row.get("end_date") and row["end_date"] < row["start_date"]:
+            problems.append("end_date is before start_date")
+        if problems:
+            errors.append((number, "; ".join(problems)))
+        else:
+            rows.append(row)
+    return rows, errors
+
+
+def _export_rows(user_id, batch_size):
+    query = (
+        select(
+            MedicalHistory.id, MedicalHistory.disease,
+            *(getattr(Medication, name) for name in MEDICATION_FIELDS),
+        )
+        .join(MedicalHistory, MedicalHistory.id == Medication.medical_history_id)
+        .join(Profile, Profile.id == MedicalHistory.profile_id)
+        .where(Profile.user_id == user_id)
+        .order_by(MedicalHistory.id, Medication.id)
+        .execution_options(yield_per=batch_size)
+    )
+    for row in db.session.execute(query):
+        yield {
+            name: (value.strftime(_FORMATS[name]) if name in _FORMATS and value is not None else value)
+            for name, value in zip(EXPORT_FIELDS, row)
+        }
+
+
+def export_medications_csv(user_id, batch_size=500):
+    """Yield the user's medications as CSV text, one database batch at a time."""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS)
+    writer.writeheader()
+    written = 0
+    for row in _export_rows(user_id, batch_size):
+        writer.writerow(row)
+        written += 1
+        if written % batch_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def export_medications_json(user_id, batch_size=500):
+    """Yield the user's medications as a JSON array without building it in memory."""
+    parts = ["["]
+    written = 0
+    for row in _export_rows(user_id, batch_size):
+        parts.append(("," if written else "") + json.dumps(row))
+        written += 1
+        if written % batch_size == 0:
+            yield "".join(parts)
+            parts = []
+    parts.append("]")
+    yield "".join(parts)
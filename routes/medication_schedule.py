@@ -0,0 +1,218 @@
+# routes/medication_schedule.py
+import heapq
+import json
+import re
+from collections import namedtuple
+from datetime import datetime, time, timedelta
+
+from sqlalchemy import or_, select
+
+from extensions import db
+from models.medical_history import MedicalHistory
+from models.medication import Medication
+from models.profile import Profile
+
+# doses_per_day: doses on each dosing day; interval_minutes: gap between them
+# every_days: dosing days are this many days apart, counted from start_date
+# weekdays: dose only on these weekdays (0 = Monday); per_week: spread this
+# many dosing days over each week, starting on start_date's weekday
+DoseRule = namedtuple(
+    "DoseRule",
+    "doses_per_day interval_minutes every_days weekdays per_week as_needed",
+    defaults=(1, None, 1, None, None, False),
+)
+
+DEFAULT_FIRST_DOSE = time(8, 0)
+# Several doses a day without an explicit interval are spread over 12 waking hours
+WAKING_MINUTES = 12 * 60
+
+_NUMBERS = {"once": 1, "one": 1, "twice": 2, "two": 2, "thrice": 3, "three": 3, "four": 4, "five": 5, "six": 6}
+_ABBREVIATIONS = {
+    "qd": DoseRule(), "od": DoseRule(), "qam": DoseRule(), "qpm": DoseRule(), "qhs": DoseRule(), "hs": DoseRule(),
+    "bid": DoseRule(doses_per_day=2), "tid": DoseRule(doses_per_day=3), "qid": DoseRule(doses_per_day=4),
+    "qod": DoseRule(every_days=2), "prn": DoseRule(as_needed=True),
+}
+_WEEKDAYS = {
+    "mon": 0, "monday": 0, "tue": 1, "tues": 1, "tuesday": 1, "wed": 2, "wednesday": 2,
+    "thu": 3, "thur": 3, "thurs": 3, "thursday": 3, "fri": 4, "friday": 4,
+    "sat": 5, "saturday": 5, "sun": 6, "sunday": 6,
+}
+
+_AS_NEEDED = re.compile(r"\bas needed\b|\bwhen needed\b|\bprn\b")
+_HOURLY = re.compile(r"\bevery (?:(\d+|one|two|three|four|six) ?)?(?:hours?|hrs?|h)\b|\bq(\d+)h\b")
+_COUNT = re.compile(r"\b(\d+|" + "|".join(_NUMBERS) + r") ?(?:x|times?)\b|\b(once|twice|thrice)\b")
+_EVERY_DAYS = re.compile(r"\bevery (\d+|two|three|four|five|six) days?\b")
+_OTHER_DAY = re.compile(r"\bevery other day\b|\balternate days\b")
+_WEEKLY = re.compile(r"\bweekly\b|(?:\b(?:a|per|each|every) |/ ?)week\b")
+_DAILY = re.compile(
+    r"\bdaily\b|(?:\b(?:a|per|each|every) |/ ?)day\b|\bnightly\b|\bbedtime\b|\bevery (?:morning|evening|night)\b"
+)
+_WEEKDAY_NAMES = re.compile(r"\b(" + "|".join(_WEEKDAYS) + r")s?\b")
+
+
+def _number(word):
+    return int(word) if word.isdigit() else _NUMBERS[word]
+
+
+def parse_frequency(text):
+    """Normalize free-text ``Medication.frequency`` into a ``DoseRule``.
+
+    Blank means once daily, like the reminder scheduler assumes. Returns
+    None for text that does not describe a schedule we can expand
+    ("monthly", "with meals"), so callers can show it as unscheduled.
+    """
+    text = re.sub(r"[^a-z0-9/ ]+", " ", (text or "").lower())
+    text = re.sub(r"\s+", " ", text).strip()
+    if not text:
+        return DoseRule()
+    if text in _ABBREVIATIONS:
+        return _ABBREVIATIONS[text]
+    if _AS_NEEDED.search(text):
+        return DoseRule(as_needed=True)
+
+    hourly = _HOURLY.search(text)
+    if hourly:
+        hours = _number(hourly.group(1) or hourly.group(2) or "1")
+        if not 1 <= hours <= 24:
+            return None
+        return DoseRule(doses_per_day=-(-24 // hours), interval_minutes=hours * 60)
+
+    count = _COUNT.search(text)
+    times = _number(count.group(1) or count.group(2)) if count else 1
+    if times < 1:
+        return None
+
+    every = _EVERY_DAYS.search(text)
+    if every:
+        days = _number(every.group(1))
+        return DoseRule(doses_per_day=times, every_days=days) if days >= 1 else None
+    if _OTHER_DAY.search(text):
+        return DoseRule(doses_per_day=times, every_days=2)
+
+    weekdays = {_WEEKDAYS[name] for name in _WEEKDAY_NAMES.findall(text)}
+    if re.search(r"\bweekdays\b", text):
+        weekdays |= {0, 1, 2, 3, 4}
+    if re.search(r"\bweekends?\b", text):
+        weekdays |= {5, 6}
+    if weekdays:
+        # "twice daily on Mon and Thu": the count is per dosing day unless it says per week
+        per_day = times if count and not _WEEKLY.search(text) else 1
+        return DoseRule(doses_per_day=per_day, weekdays=frozenset(weekdays))
+    if _WEEKLY.search(text):
+        return DoseRule(per_week=min(times, 7))
+    if _DAILY.search(text) or count:
+        return DoseRule(doses_per_day=times)
+    return None
+
+
+def dose_offsets(rule):
+    """Offsets of each dose from the day's first dose."""
+    if rule.doses_per_day <= 1:
+        return (timedelta(0),)
+    interval = rule.interval_minutes or WAKING_MINUTES // (rule.doses_per_day - 1)
+    return tuple(timedelta(minutes=interval * dose) for dose in range(rule.doses_per_day))
+
+
+def _dosing_weekdays(rule, start_date):
+    if rule.weekdays:
+        return rule.weekdays
+    if rule.per_week:
+        return frozenset((start_date.weekday() + week_dose * 7 // rule.per_week) % 7
+                         for week_dose in range(rule.per_week))
+    return None
+
+
+def iter_doses(rule, start_date, end_date, first_dose, window_start, window_end):
+    """Lazily yield dose datetimes in ``[window_start, window_end)``, in order.
+
+    Dosing days run from ``start_date`` through ``end_date`` (open-ended if
+    None); ``first_dose`` is the day's first dose (``reminder_time``). Work
+    starts at the window rather than at ``start_date``, so the cost depends
+    on the window and on nothing before it.
+    """
+    if rule is None or rule.as_needed or start_date is None:
+        return
+    first_dose = first_dose or DEFAULT_FIRST_DOSE
+    offsets = dose_offsets(rule)
+    weekdays = _dosing_weekdays(rule, start_date)
+    last_day = window_end.date() if end_date is None else min(end_date, window_end.date())
+
+    # A day's later doses can spill past midnight, so begin one day early
+    day = max(start_date, window_start.date() - timedelta(days=1))
+    day += timedelta(days=-(day - start_date).days % rule.every_days)
+    step = timedelta(days=rule.every_days)
+    while day <= last_day:
+        if weekdays is None or day.weekday() in weekdays:
+            anchor = datetime.combine(day, first_dose)
+            for offset in offsets:
+                at = anchor + offset
+                if at >= window_end:
+                    return
+                if at >= window_start:
+                    yield at
+        day += step
+
+
+def describe_rule(rule):
+    """JSON-friendly form of a rule, or None for an unscheduled medication."""
+    if rule is None:
+        return None
+    described = rule._asdict()
+    described["weekdays"] = sorted(rule.weekdays) if rule.weekdays else None
+    return described
+
+
+def _tagged(doses, medication_id):
+    for at in doses:
+        yield at, medication_id
+
+
+def medication_calendar(user_id, first_day, last_day, chunk_size=500):
+    """Yield a JSON calendar of the user's doses from ``first_day`` through ``last_day``.
+
+    Each medication's doses come from its own ``iter_doses`` generator and
+    ``heapq.merge`` interleaves them by time, so memory stays flat however
+    long the range or however many doses a day; only the medication list
+    itself is held.
+    """
+    window_start = datetime.combine(first_day, time.min)
+    window_end = datetime.combine(last_day + timedelta(days=1), time.min)
+    medications = db.session.execute(
+        select(
+            Medication.id, Medication.name, Medication.dosage, Medication.frequency,
+            Medication.start_date, Medication.end_date, Medication.reminder_time,
+        )
+        .join(MedicalHistory, MedicalHistory.id == Medication.medical_history_id)
+        .join(Profile, Profile.id == MedicalHistory.profile_id)
+        .where(
+            Profile.user_id == user_id,
+            Medication.start_date <= last_day,
+            # The day before the range can still contribute doses after midnight
+            or_(Medication.end_date.is_(None), Medication.end_date >= first_day - timedelta(days=1)),
+        )
+        .order_by(Medication.id)
+    ).all()
+    rules = {med.id: parse_frequency(med.frequency) for med in medications}
+
+    yield f'{{"start": "{first_day.isoformat()}", "end": "{last_day.isoformat()}", "medications": ' + json.dumps([
+        {
+            "id": med.id,
+            "name": med.name,
+            "dosage": med.dosage,
+            "frequency": med.frequency,
+            "rule": describe_rule(rules[med.id]),
+        }
+        for med in medications
+    ])
+    parts = [', "doses": [']
+    doses = heapq.merge(*(
+        _tagged(iter_doses(rules[med.id], med.start_date, med.end_date, med.reminder_time, window_start, window_end), med.id)
+        for med in medications
+    ))
+    for count, (at, medication_id) in enumerate(doses):
+        parts.append(("," if count else "") + json.dumps({"medication_id": medication_id, "at": at.isoformat(timespec="minutes")}))
+        if len(parts) >= chunk_size:
+            yield "".join(parts)
+            parts = []
+    parts.append("]}")
+    yield "".join(parts)
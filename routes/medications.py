@@ -1,11 +1,23 @@
 # routes/medications.py
-from flask import Blueprint, request, redirect, url_for, flash
+from flask import Blueprint, Response, request, redirect, url_for, flash, abort, current_app, jsonify, stream_with_context
 from flask_login import login_required, current_user
+from sqlalchemy import insert
 from extensions import db
 from models.medication import Medication
 from models.medical_history import MedicalHistory
 from models.profile import Profile
-from datetime import datetime
+from routes.activity_rollup import bump_activity, medication_changes
+from routes.medication_io import (
+    MedicationImportError,
+    export_medications_csv,
+    export_medications_json,
+    read_medication_upload,
+    validate_medication_rows,
+)
+from routes.medication_schedule import medication_calendar
+from routes.reminder_scheduler import reminder_scheduler
+from routes.user_summary import refresh_summary
+from datetime import date, datetime, timedelta
 
 medications_bp = Blueprint('medications', __name__)
 
@@ -36,7 +48,10 @@ def add_medication():
     )
 
     db.session.add(med)
+    bump_activity(medication_changes(current_user.id, med.start_date, med.end_date))
+    refresh_summary(current_user.id, 'medications')
     db.session.commit()
+    reminder_scheduler.update(current_user.id, med)
     flash('Medication added successfully.', 'success')
     return redirect(url_for('profile.manage_profile'))
 
@@ -51,6 +66,7 @@ def update_medication(med_id):
         flash('Unauthorized action.', 'danger')
         return redirect(url_for('profile.manage_profile'))
 
+    old_span = (med.start_date, med.end_date)
     med.name = request.form.get('name')
     med.dosage = request.form.get('dosage')
     med.frequency = request.form.get('frequency')
@@ -59,7 +75,13 @@ def update_medication(med_id):
     med.reminder_time = datetime.strptime(request.form.get('reminder_time'), '%H:%M').time() if request.form.get('reminder_time') else None
     med.notes = request.form.get('notes')
 
+    bump_activity(
+        medication_changes(current_user.id, *old_span, sign=-1)
+        + medication_changes(current_user.id, med.start_date, med.end_date)
+    )
+    refresh_summary(current_user.id, 'medications')
     db.session.commit()
+    reminder_scheduler.update(current_user.id, med)
     flash('Medication updated successfully.', 'success')
     return redirect(url_for('profile.manage_profile'))
 
@@ -74,7 +96,123 @@ def delete_medication(med_id):
         flash('Unauthorized action.', 'danger')
         return redirect(url_for('profile.manage_profile'))
 
+    med_id = med.id
+    bump_activity(medication_changes(current_user.id, med.start_date, med.end_date, sign=-1))
     db.session.delete(med)
+    refresh_summary(current_user.id, 'medications')
     db.session.commit()
+    reminder_scheduler.cancel(med_id)
     flash('Medication deleted.', 'info')
     return redirect(url_for('profile.manage_profile'))
+
+
+EXPORTS = {
+    'csv': (export_medications_csv, 'text/csv'),
+    'json': (export_medications_json, 'application/json'),
+}
+
+
+def _import_response(message, category, status=200, imported=0, errors=()):
+    if request.accept_mimetypes.best == 'application/json':
+        return jsonify({
+            "imported": imported,
+            "message": message,
+            "errors": [{"row": row, "error": error} for row, error in errors],
+        }), status
+    flash(message, category)
+    for row, error in errors[:5]:
+        flash(f'Row {row}: {error}', 'warning')
+    if len(errors) > 5:
+        flash(f'...and {len(errors) - 5} more rows with errors.', 'warning')
+    return redirect(url_for('profile.manage_profile'))
+
+
+# 📥 IMPORT MEDICATIONS (CSV / JSON)
+@medications_bp.route('/medications/import', methods=['POST'])
+@login_required
+def import_medications():
+    """Add every row of an uploaded CSV/JSON file to one medical history.
+
+    A file with any invalid row is rejected as a whole, so fixing the
+    reported rows and uploading again cannot create duplicates. Valid files
+    go in as one multi-row INSERT in a single transaction.
+    """
+    # Set before the form is parsed, so a larger body is refused with 413 before it is read
+    request.max_content_length = current_app.config['MEDICATION_IMPORT_MAX_BYTES']
+    history = MedicalHistory.query.join(Profile).filter(
+        MedicalHistory.id == request.form.get('medical_history_id', type=int),
+        Profile.user_id == current_user.id,
+    ).first()
+    if not history:
+        return _import_response('Unauthorized action.', 'danger', status=403)
+
+    upload = request.files.get('file')
+    if not upload or not upload.filename:
+        return _import_response('Choose a CSV or JSON file to import.', 'warning', status=400)
+    try:
+        records = read_medication_upload(upload, current_app.config['MEDICATION_IMPORT_MAX_ROWS'])
+    except MedicationImportError as exc:
+        return _import_response(str(exc), 'warning', status=400)
+
+    rows, errors = validate_medication_rows(records, history.id)
+    if errors:
+        return _import_response(
+            f'Nothing imported: {len(errors)} of {len(records)} rows have errors.', 'danger',
+            status=422, errors=errors,
+        )
+
+    # render_nulls keeps every row in one statement instead of grouping rows by which columns are empty.
+    # RETURNING carries what the scheduler needs, so the result order does not matter.
+    inserted = db.session.execute(
+        insert(Medication).returning(
+            Medication.id, Medication.name, Medication.dosage, Medication.frequency,
+            Medication.start_date, Medication.end_date, Medication.reminder_time,
+        ),
+        rows,
+        execution_options={'render_nulls': True},
+    ).all()
+    bump_activity([
+        change
+        for row in rows
+        for change in medication_changes(current_user.id, row['start_date'], row['end_date'])
+    ])
+    refresh_summary(current_user.id, 'medications')
+    db.session.commit()
+    reminder_scheduler.update(current_user.id, *inserted)
+    return _import_response(f'Imported {len(inserted)} medications.', 'success', imported=len(inserted))
+
+
+# 📤 EXPORT MEDICATIONS
+@medications_bp.route('/medications/export', methods=['GET'])
+@login_required
+def export_medications():
+    """Stream all of the user's medications as CSV or JSON (``?format=``)."""
+    fmt = request.args.get('format', 'csv')
+    if fmt not in EXPORTS:
+        abort(400)
+    exporter, mimetype = EXPORTS[fmt]
+    # stream_with_context keeps the session open while rows are read in batches
+    response = Response(
+        stream_with_context(exporter(current_user.id, current_app.config['MEDICATION_EXPORT_BATCH_SIZE'])),
+        mimetype=mimetype,
+    )
+    response.headers['Content-Disposition'] = f'attachment; filename=medications.{fmt}'
+    return response
+
+
+# 📅 DOSE CALENDAR
+@medications_bp.route('/medications/calendar', methods=['GET'])
+@login_required
+def dose_calendar():
+    """Stream dose times for ``?start=&end=`` (YYYY-MM-DD, inclusive; default: the next 7 days)."""
+    try:
+        first_day = datetime.strptime(request.args['start'], '%Y-%m-%d').date() if request.args.get('start') else date.today()
+        last_day = datetime.strptime(request.args['end'], '%Y-%m-%d').date() if request.args.get('end') else first_day + timedelta(days=6)
+    except ValueError:
+        abort(400)
+    if last_day < first_day or (last_day - first_day).days >= current_app.config['MEDICATION_CALENDAR_MAX_DAYS']:
+        abort(400)
+    return Response(
+        stream_with_context(medication_calendar(current_user.id, first_day, last_day)),
+        mimetype='application/json',
+    )
@@ -0,0 +1,243 @@
+# routes/metrics.py
+import bisect
+import hmac
+import math
+import threading
+
+import requests
+from flask import Blueprint, Response, abort, current_app, request
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in list(zip(names, values)) + list(extra)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value):
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _ShardedMetric:
+    """Base for metrics whose hot path never takes a lock.
+
+    Each thread writes only to its own shard dict, so updates are plain dict
+    operations. A scrape sums every shard; shards of threads that have exited
+    are folded into ``_retired`` so short-lived request threads do not pile up.
+    """
+
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._shards = []
+        self._retired = {}
+        self._lock = threading.Lock()
+
+    def _shard(self):
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._local.shard = {}
+            with self._lock:
+                self._shards.append((threading.current_thread(), shard))
+        return shard
+
+    def _key(self, labels):
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _merge(self, total, key, values):
+        raise NotImplementedError
+
+    def collect(self):
+        """Return ``{label_values: value}`` summed over every thread."""
+        with self._lock:
+            live = []
+            for thread, shard in self._shards:
+                if thread.is_alive():
+                    live.append((thread, shard))
+                else:
+                    for key, values in shard.items():
+                        self._merge(self._retired, key, values)
+            self._shards = live
+            total = {}
+            for key, values in self._retired.items():
+                self._merge(total, key, values)
+            for _, shard in live:
+                # Copy first: the owning thread may add keys while we iterate
+                for key, values in list(shard.items()):
+                    self._merge(total, key, values)
+        return total
+
+
+class Counter(_ShardedMetric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        shard = self._shard()
+        key = self._key(labels)
+        shard[key] = shard.get(key, 0) + amount
+
+    def _merge(self, total, key, value):
+        total[key] = total.get(key, 0) + value
+
+    def render(self):
+        return [f"{self.name}{_labels(self.labelnames, key)} {_number(value)}"
+                for key, value in sorted(self.collect().items())]
+
+
+class Histogram(_ShardedMetric):
+    kind = "histogram"
+    DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, count=1, **labels):
+        """Record ``value`` (``count`` times, for a batch that shares one measurement)."""
+        shard = self._shard()
+        key = self._key(labels)
+        # Per-bucket (not cumulative) counts, then the sum and the count
+        values = shard.get(key)
+        if values is None:
+            values = shard[key] = [0] * (len(self.buckets) + 3)
+        values[bisect.bisect_left(self.buckets, value)] += count
+        values[-2] += value * count
+        values[-1] += count
+
+    def _merge(self, total, key, values):
+        current = total.get(key)
+        if current is None:
+            total[key] = list(values)
+        else:
+            for index, value in enumerate(values):
+                current[index] += value
+
+    def render(self):
+        lines = []
+        for key, values in sorted(self.collect().items()):
+            running = 0
+            for bound, count in zip(self.buckets + (math.inf,), values):
+                running += count
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, [('le', _number(bound))])} {running}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_number(values[-2])}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {values[-1]}")
+        return lines
+
+
+class Gauge:
+    """Value read from ``callback`` at scrape time; returns ``{label_values: value}``."""
+
+    kind = "gauge"
+
+    def __init__(self, name, documentation, labelnames=(), callback=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.callback = callback
+
+    def render(self):
+        values = self.callback() if self.callback else {}
+        return [f"{self.name}{_labels(self.labelnames, key)} {_number(value)}"
+                for key, value in sorted(values.items())]
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=Histogram.DEFAULT_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def gauge(self, name, documentation, labelnames=(), callback=None):
+        return self.register(Gauge(name, documentation, labelnames, callback))
+
+    def render(self):
+        """Every metric in the Prometheus text exposition format."""
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda metric: metric.name)
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+MODERATION_LATENCY = registry.histogram(
+    "moderation_backend_latency_seconds", "Time spent in one moderation backend call.", ["backend"]
+)
+MODERATION_ERRORS = registry.counter(
+    "moderation_backend_errors_total", "Failed moderation backend calls by kind.", ["backend", "kind"]
+)
+MODERATION_RETRIES = registry.counter(
+    "moderation_http_retries_total", "HTTP retries towards a moderation backend.", ["backend", "reason"]
+)
+MODERATION_PARSE_FAILURES = registry.counter(
+    "moderation_parse_failures_total", "Backend replies with no usable JSON verdict.", ["backend"]
+)
+MODERATION_FALLBACKS = registry.counter(
+    "moderation_fallbacks_total", "Texts answered with a fallback instead of a real verdict.", ["backend"]
+)
+REMINDERS_SENT = registry.counter(
+    "medication_reminders_sent_total", "Medication reminders handed to the notification streams."
+)
+REMINDER_SKEW = registry.histogram(
+    "medication_reminder_skew_seconds", "Delay between a reminder's due time and its dispatch.",
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 30.0),
+)
+MODERATION_VERDICTS = registry.counter(
+    "moderation_verdicts_total", "Moderation verdicts by where they came from, outcome and category.",
+    ["source", "outcome", "category"],
+)
+
+
+def error_kind(exc):
+    """Coarse label for a backend exception."""
+    if isinstance(exc, requests.Timeout):
+        return "timeout"
+    if isinstance(exc, requests.ConnectionError):
+        return "connection"
+    if isinstance(exc, requests.HTTPError):
+        return "http"
+    if isinstance(exc, ValueError):
+        return "parse"
+    return "other"
+
+
+LOCAL_ADDRESSES = ("127.0.0.1", "::1")
+
+metrics_bp = Blueprint("metrics", __name__)
+
+
+@metrics_bp.route("/metrics")
+def metrics():
+    # With a shared secret any scraper holding it may read; without one, only local requests
+    token = current_app.config.get("METRICS_TOKEN")
+    if token:
+        if not hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {token}"):
+            abort(403)
+    elif request.remote_addr not in LOCAL_ADDRESSES:
+        abort(403)
+    return Response(registry.render(), mimetype="text/plain; version=0.0.4")
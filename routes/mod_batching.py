@@ -0,0 +1,79 @@
+# routes/mod_batching.py
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from routes.mod_gemini import gemini_moderation_batch
+
+
+class MicroBatcher:
+    """Coalesce concurrent single-item calls into batched calls.
+
+    ``submit`` blocks the calling thread until its result is ready. A
+    dispatcher thread takes the first waiting item, keeps collecting for up
+    to ``window`` seconds or ``max_size`` items, hands the whole batch to
+    ``batch_fn`` and fans the results back out to the callers in order.
+    """
+
+    def __init__(self, batch_fn, window=0.05, max_size=10, enabled=False):
+        self.batch_fn = batch_fn
+        self.window = window
+        self.max_size = max_size
+        self.enabled = enabled
+        self._pending = queue.Queue()
+        self._start_lock = threading.Lock()
+        self._thread = None
+
+    def init_app(self, app, prefix):
+        app.config.setdefault(f"{prefix}_BATCHING", False)
+        app.config.setdefault(f"{prefix}_BATCH_WINDOW", 0.05)
+        app.config.setdefault(f"{prefix}_BATCH_SIZE", 10)
+        self.enabled = app.config[f"{prefix}_BATCHING"]
+        self.window = app.config[f"{prefix}_BATCH_WINDOW"]
+        self.max_size = app.config[f"{prefix}_BATCH_SIZE"]
+
+    def submit(self, item):
+        self._ensure_started()
+        future = Future()
+        self._pending.put((item, future))
+        return future.result()
+
+    def _ensure_started(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="moderation-batcher", daemon=True)
+                self._thread.start()
+
+    def _collect(self):
+        batch = [self._pending.get()]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._pending.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            items = [item for item, _ in batch]
+            try:
+                results = self.batch_fn(items)
+                if len(results) != len(batch):
+                    raise ValueError(f"batch returned {len(results)} results for {len(batch)} items")
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+
+
+gemini_batcher = MicroBatcher(gemini_moderation_batch)
@@ -1,12 +1,42 @@
 import os
 import json
 import re
-import requests
-
-def extract_json(text):
+import hashlib
+import logging
+from routes.metrics import MODERATION_ERRORS, MODERATION_PARSE_FAILURES, error_kind
+from routes.mod_http import moderation_http
+
+logger = logging.getLogger(__name__)
+
+GEMINI_MODEL = "models/gemini-2.5-flash"
+GEMINI_API_BASE = "https://generativelanguage.googleapis.com/v1"
+
+PROMPT_TEMPLATE = (
+    "Moderate the following forum text.\n"
+    "Return ONLY a JSON object like:\n"
+    "{{ \"safe\": true/false, \"reason\": \"text\", \"categories\": [] }}\n\n"
+    "TEXT: {text}"
+)
+BATCH_PROMPT_TEMPLATE = (
+    "Moderate each of the following forum texts independently.\n"
+    "Return ONLY a JSON array with exactly one object per text, in the same order, like:\n"
+    "[{{ \"id\": 1, \"safe\": true/false, \"reason\": \"text\", \"categories\": [] }}]\n\n"
+    "{texts}"
+)
+# Cached verdicts are keyed on this, so editing a prompt or the model retires them
+PROMPT_VERSION = hashlib.sha256(
+    f"{GEMINI_MODEL}\n{PROMPT_TEMPLATE}\n{BATCH_PROMPT_TEMPLATE}".encode("utf-8")
+).hexdigest()[:12]
+
+# Results that do not reflect a real verdict; never cache these
+FALLBACK_RESULT = (True, "Gemini unavailable (fallback allowed).", None)
+KEY_MISSING_RESULT = (False, "Gemini API key missing.")
+
+def extract_json(text, expect=dict):
     """
-    Extracts JSON object from Gemini output.
-    Removes backticks, ```json, and any extra text.
+    Extracts the first JSON object (or array, with expect=list) from Gemini output.
+    Removes backticks, ```json, and any extra text around it, and copes with
+    braces inside strings or trailing commentary that a greedy regex would swallow.
     """
     if not text:
         return None
@@ -15,30 +45,28 @@ def extract_json(text):
     cleaned = re.sub(r"```(?:json)?", "", text).strip()
     cleaned = cleaned.replace("```", "").strip()
 
-    # 2. Extract JSON between { }
-    match = re.search(r"\{.*\}", cleaned, re.DOTALL)
-    if match:
-        return match.group(0)
-
+    # 2. Decode from each candidate opening bracket until one parses
+    opener = "[" if expect is list else "{"
+    decoder = json.JSONDecoder()
+    position = cleaned.find(opener)
+    while position != -1:
+        try:
+            value, end = decoder.raw_decode(cleaned, position)
+        except ValueError:
+            value = None
+        if isinstance(value, expect):
+            return cleaned[position:end]
+        position = cleaned.find(opener, position + 1)
+
+    MODERATION_PARSE_FAILURES.inc(backend="gemini")
     return None
 
 
-def gemini_moderation(text: str):
-    """Moderate content using Gemini 2.5 Flash."""
-
+def _generate_text(prompt):
+    """Send one generateContent request and return the model's text output."""
     GEMINI_KEY = os.getenv("GEMINI_API_KEY")
-    if not GEMINI_KEY:
-        return False, "Gemini API key missing."
-
-    model = "models/gemini-2.5-flash"
-    url = f"https://generativelanguage.googleapis.com/v1/{model}:generateContent?key={GEMINI_KEY}"
-
-    prompt = (
-        "Moderate the following forum text.\n"
-        "Return ONLY a JSON object like:\n"
-        "{ \"safe\": true/false, \"reason\": \"text\", \"categories\": [] }\n\n"
-        f"TEXT: {text}"
-    )
+    base = os.getenv("GEMINI_API_BASE", GEMINI_API_BASE)
+    url = f"{base}/{GEMINI_MODEL}:generateContent?key={GEMINI_KEY}"
 
     payload = {
         "contents": [{
@@ -46,36 +74,86 @@ def gemini_moderation(text: str):
         }]
     }
 
-    try:
-        response = requests.post(url, json=payload)
-        full = response.json()
+    response = moderation_http.post("gemini", url, json=payload)
+    # A 429/5xx still failing after retries is a backend error, not an unparseable reply
+    response.raise_for_status()
+    full = response.json()
+    logger.debug("Gemini response", extra={"status": response.status_code, "payload": full})
+
+    # Extract the model output text
+    return (
+        full.get("candidates", [{}])[0]
+            .get("content", {})
+            .get("parts", [{}])[0]
+            .get("text", "")
+    )
+
+
+def _verdict_from(ai):
+    is_safe = ai.get("safe", True)
+    reason = ai.get("reason", "No explanation")
+    categories = ai.get("categories", [])
+    primary_category = categories[0] if categories else None
 
-        print("\n--- GEMINI RAW RESPONSE ---")
-        print(full)
-        print("--- END ---\n")
+    return is_safe, f"Gemini: {reason}", primary_category
 
-        # Extract the model output text
-        raw_text = (
-            full.get("candidates", [{}])[0]
-                .get("content", {})
-                .get("parts", [{}])[0]
-                .get("text", "")
-        )
+
+def gemini_moderation(text: str):
+    """Moderate content using Gemini 2.5 Flash."""
+
+    if not os.getenv("GEMINI_API_KEY"):
+        return KEY_MISSING_RESULT
+
+    try:
+        raw_text = _generate_text(PROMPT_TEMPLATE.format(text=text))
 
         # Clean & extract JSON
         json_str = extract_json(raw_text)
         if not json_str:
             raise ValueError("Could not extract JSON from Gemini response")
 
-        ai = json.loads(json_str)
+        return _verdict_from(json.loads(json_str))
+
+    except Exception as e:
+        MODERATION_ERRORS.inc(backend="gemini", kind=error_kind(e))
+        logger.warning("Gemini moderation failed: %s", e)
+        return FALLBACK_RESULT
+
+
+def gemini_moderation_batch(texts):
+    """Moderate several texts with one Gemini request; returns one result per text.
 
-        is_safe = ai.get("safe", True)
-        reason = ai.get("reason", "No explanation")
-        categories = ai.get("categories", [])
-        primary_category = categories[0] if categories else None
+    If the reply is not a JSON array with a verdict for every text, each text
+    is re-checked with its own ``gemini_moderation`` call.
+    """
+    texts = list(texts)
+    if len(texts) == 1:
+        return [gemini_moderation(texts[0])]
+    if not os.getenv("GEMINI_API_KEY"):
+        return [KEY_MISSING_RESULT] * len(texts)
+
+    numbered = "\n\n".join(f"TEXT {index}: {text}" for index, text in enumerate(texts, start=1))
+    try:
+        raw_text = _generate_text(BATCH_PROMPT_TEMPLATE.format(texts=numbered))
+    except Exception as e:
+        MODERATION_ERRORS.inc(backend="gemini", kind=error_kind(e))
+        logger.warning("Gemini batch moderation failed: %s", e, extra={"batch_size": len(texts)})
+        return [FALLBACK_RESULT] * len(texts)
+
+    try:
+        json_str = extract_json(raw_text, expect=list)
+        if not json_str:
+            raise ValueError("Could not extract JSON array from Gemini response")
+        items = json.loads(json_str)
+        if len(items) != len(texts) or not all(isinstance(item, dict) for item in items):
+            raise ValueError(f"Expected {len(texts)} verdicts, got {len(items)}")
 
-        return is_safe, f"Gemini: {reason}", primary_category
+        by_id = {item.get("id"): item for item in items}
+        if set(by_id) == set(range(1, len(texts) + 1)):
+            items = [by_id[index] for index in range(1, len(texts) + 1)]
+        return [_verdict_from(item) for item in items]
 
     except Exception as e:
-        print("[Gemini Error]", e)
-        return True, "Gemini unavailable (fallback allowed).", None
+        MODERATION_ERRORS.inc(backend="gemini", kind="batch_" + error_kind(e))
+        logger.warning("Unusable Gemini batch reply, falling back to per-item calls: %s", e)
+        return [gemini_moderation(text) for text in texts]
@@ -0,0 +1,119 @@
+# routes/mod_http.py
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from routes.metrics import MODERATION_RETRIES
+
+# Statuses worth retrying: rate limiting and transient server errors
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class ModerationHTTPClient:
+    """Shared HTTP client for the moderation backends.
+
+    One ``requests.Session`` keeps a pool of keep-alive connections per host,
+    so repeated calls skip the TCP/TLS handshake. Each call uses
+    (connect, read) timeouts, is retried on connection errors, timeouts,
+    429 and 5xx with capped, fully jittered exponential backoff (honouring
+    ``Retry-After``), and holds a per-backend semaphore so one backend
+    cannot tie up every worker thread.
+
+    ``MODERATION_READ_TIMEOUTS`` overrides the read timeout per backend; the
+    Professor keeps its original 5 s. Retries multiply the wait: with the
+    defaults a Professor call gives up after at most 3 x (3.05 + 5) s plus
+    up to 1.5 s of backoff, and a Gemini call after 3 x (3.05 + 10) s plus
+    backoff; a ``Retry-After`` header can stretch each wait to the 8 s cap.
+    """
+
+    def __init__(self):
+        self.connect_timeout = 3.05
+        self.read_timeout = 10
+        self.read_timeouts = {"professor": 5}
+        self.max_retries = 2
+        self.backoff = 0.5
+        self.backoff_cap = 8.0
+        self.limits = {}
+        self._semaphores = {}
+        self._semaphore_lock = threading.Lock()
+        self.session = self._build_session(pool_size=10)
+
+    def init_app(self, app):
+        app.config.setdefault("MODERATION_HTTP_POOL_SIZE", 10)
+        app.config.setdefault("MODERATION_CONNECT_TIMEOUT", 3.05)
+        app.config.setdefault("MODERATION_READ_TIMEOUT", 10)
+        app.config.setdefault("MODERATION_READ_TIMEOUTS", {"professor": 5})
+        app.config.setdefault("MODERATION_MAX_RETRIES", 2)
+        app.config.setdefault("MODERATION_RETRY_BACKOFF", 0.5)
+        app.config.setdefault("MODERATION_RETRY_BACKOFF_CAP", 8.0)
+        app.config.setdefault("MODERATION_CONCURRENCY", {"gemini": 8, "professor": 4})
+
+        self.connect_timeout = app.config["MODERATION_CONNECT_TIMEOUT"]
+        self.read_timeout = app.config["MODERATION_READ_TIMEOUT"]
+        self.read_timeouts = dict(app.config["MODERATION_READ_TIMEOUTS"])
+        self.max_retries = app.config["MODERATION_MAX_RETRIES"]
+        self.backoff = app.config["MODERATION_RETRY_BACKOFF"]
+        self.backoff_cap = app.config["MODERATION_RETRY_BACKOFF_CAP"]
+        with self._semaphore_lock:
+            self.limits = dict(app.config["MODERATION_CONCURRENCY"])
+            self._semaphores = {}
+        self.session.close()
+        self.session = self._build_session(app.config["MODERATION_HTTP_POOL_SIZE"])
+
+    @staticmethod
+    def _build_session(pool_size):
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    def _semaphore(self, backend):
+        with self._semaphore_lock:
+            semaphore = self._semaphores.get(backend)
+            if semaphore is None:
+                semaphore = threading.BoundedSemaphore(self.limits.get(backend, 4))
+                self._semaphores[backend] = semaphore
+            return semaphore
+
+    def _delay(self, attempt, response=None):
+        if response is not None:
+            retry_after = response.headers.get("Retry-After", "")
+            if retry_after.isdigit():
+                return min(float(retry_after), self.backoff_cap)
+        return random.uniform(0, min(self.backoff_cap, self.backoff * (2 ** attempt)))
+
+    def post(self, backend, url, **kwargs):
+        """POST with pooling, timeouts, retries and the backend's concurrency limit.
+
+        Returns the final response (which may still be a 429/5xx once retries
+        run out) and re-raises the last connection error or timeout.
+        """
+        kwargs.setdefault("timeout", (self.connect_timeout, self.read_timeouts.get(backend, self.read_timeout)))
+        semaphore = self._semaphore(backend)
+
+        for attempt in range(self.max_retries + 1):
+            last_attempt = attempt == self.max_retries
+            try:
+                with semaphore:
+                    response = self.session.post(url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if last_attempt:
+                    raise
+                MODERATION_RETRIES.inc(backend=backend, reason=type(e).__name__)
+                time.sleep(self._delay(attempt))
+                continue
+
+            if response.status_code in RETRY_STATUSES and not last_attempt:
+                delay = self._delay(attempt, response)
+                MODERATION_RETRIES.inc(backend=backend, reason=str(response.status_code))
+                response.close()
+                time.sleep(delay)
+                continue
+            return response
+
+
+moderation_http = ModerationHTTPClient()
@@ -0,0 +1,156 @@
+# routes/mod_lexicon.py
+import hashlib
+import json
+import os
+import re
+from collections import deque
+
+from routes.verdict_cache import normalize_text
+
+DEFAULT_LEXICON_PATH = os.path.join(os.path.dirname(__file__), "moderation_lexicon.json")
+
+_WORD = re.compile(r"[\w'+]+")
+
+
+class KeywordMatcher:
+    """Aho-Corasick automaton over a fixed set of keywords.
+
+    Built once from ``(phrase, value)`` pairs, it finds every keyword in a
+    single pass over the text regardless of how many keywords there are.
+    Matches only count on word boundaries, so "harm" does not fire inside
+    "pharmacy" but still does inside "self-harm".
+    """
+
+    def __init__(self, keywords):
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]
+
+        for phrase, value in keywords:
+            phrase = normalize_text(phrase)
+            if not phrase:
+                continue
+            node = 0
+            for char in phrase:
+                child = self._goto[node].get(char)
+                if child is None:
+                    child = len(self._goto)
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                    self._goto[node][char] = child
+                node = child
+            self._out[node].append((len(phrase), phrase, value))
+
+        # Breadth-first so each node's failure link is resolved before its children
+        pending = deque(self._goto[0].values())
+        while pending:
+            node = pending.popleft()
+            for char, child in self._goto[node].items():
+                pending.append(child)
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(char, 0)
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+
+    def find(self, text):
+        """Return ``(value, phrase, start)`` for every whole-word keyword in ``text``."""
+        text = normalize_text(text)
+        matches = []
+        node = 0
+        for index, char in enumerate(text):
+            while node and char not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(char, 0)
+            for length, phrase, value in self._out[node]:
+                start = index - length + 1
+                before = text[start - 1] if start > 0 else " "
+                after = text[index + 1] if index + 1 < len(text) else " "
+                if not before.isalnum() and not after.isalnum():
+                    matches.append((value, phrase, start))
+        return matches
+
+
+class Lexicon:
+    """Moderation keywords loaded from one JSON file.
+
+    ``categories`` maps each flag category to its keywords, in priority
+    order; ``block`` holds phrases unsafe enough to flag without asking a
+    remote backend; ``trivial`` is the vocabulary of short replies (thanks,
+    greetings) that can skip the remote call altogether; ``backend_labels``
+    are the remote backends' category labels that block a post.
+    """
+
+    def __init__(self):
+        self.enabled = True
+        self.trivial_max_length = 40
+        self.load(DEFAULT_LEXICON_PATH)
+
+    def init_app(self, app):
+        app.config.setdefault("MODERATION_PREFILTER", True)
+        app.config.setdefault("MODERATION_TRIVIAL_MAX_LENGTH", 40)
+        app.config.setdefault("MODERATION_LEXICON_PATH", DEFAULT_LEXICON_PATH)
+        self.enabled = app.config["MODERATION_PREFILTER"]
+        self.trivial_max_length = app.config["MODERATION_TRIVIAL_MAX_LENGTH"]
+        self.load(app.config["MODERATION_LEXICON_PATH"])
+
+    def load(self, path):
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+
+        categories = data.get("categories", {})
+        block = data.get("block", {})
+        self.priority = {category: rank for rank, category in enumerate(list(categories) + list(block))}
+        self.keywords = KeywordMatcher(
+            (keyword, category) for category, keywords in categories.items() for keyword in keywords
+        )
+        self.blocklist = KeywordMatcher(
+            (phrase, category) for category, phrases in block.items() for phrase in phrases
+        )
+        self.trivial = frozenset(normalize_text(word) for word in data.get("trivial", []))
+        self.backend_labels = tuple(label.lower() for label in data.get("backend_labels", []))
+        # Part of the Professor backend's verdict version, so editing the labels retires cached verdicts
+        self.backend_labels_version = hashlib.sha256("\n".join(self.backend_labels).encode("utf-8")).hexdigest()[:8]
+
+    def category_for(self, *texts):
+        """Highest-priority category whose keywords appear in any of ``texts``, or None."""
+        found = {category for text in texts for category, _, _ in self.keywords.find(text or "")}
+        if not found:
+            return None
+        return min(found, key=self.priority.get)
+
+    def flagged_labels(self, labels):
+        """The backend category labels that block, in their original order.
+
+        Substring match on purpose: "harmful" or "self_harm" must still block.
+        """
+        return [label for label in labels if any(flagged in label.lower() for flagged in self.backend_labels)]
+
+    def is_trivial(self, text):
+        normalized = normalize_text(text)
+        if not normalized or len(normalized) > self.trivial_max_length:
+            return False
+        words = _WORD.findall(normalized)
+        return bool(words) and all(word in self.trivial for word in words)
+
+    def prefilter(self, text):
+        """Decide clear-cut content locally.
+
+        Returns a ``(is_safe, detail, category)`` verdict, or None when the
+        text needs a remote backend.
+        """
+        if not self.enabled:
+            return None
+
+        blocked = self.blocklist.find(text or "")
+        if blocked:
+            category, phrase, _ = min(blocked, key=lambda match: self.priority.get(match[0]))
+            return False, f'Keyword filter: matched "{phrase}".', category
+
+        if self.is_trivial(text):
+            return True, "Keyword filter: trivial content.", None
+        return None
+
+
+lexicon = Lexicon()
@@ -1,25 +1,40 @@
-import requests
+import logging
+import os
+from routes.metrics import MODERATION_ERRORS, error_kind
+from routes.mod_http import moderation_http
+from routes.mod_lexicon import lexicon
+
+logger = logging.getLogger(__name__)
 
 API_URL = "http://cmsai:8000/generate/"
 
+# Bump when the verdict mapping below changes so cached verdicts are retired;
+# the lexicon's backend_labels are versioned separately (see prompt_versions)
+PROMPT_VERSION = "1"
+
+# Result that does not reflect a real verdict; never cache it
+FALLBACK_RESULT = (True, "Professor AI unavailable (fallback allowed).")
+
 def professor_moderation(text):
     """Call Professor's campus moderation API."""
     try:
-        response = requests.post(API_URL, json={"prompt": text}, timeout=5)
+        url = os.getenv("PROFESSOR_API_URL", API_URL)
+        response = moderation_http.post("professor", url, json={"prompt": text})
         response.raise_for_status()
         data = response.json()
-        print(f"[Professor AI] Moderation response:", data)
+        logger.debug("Professor AI response", extra={"payload": data})
     except Exception as e:
-        print(f"[Professor AI] Error:", e)
-        return True, "Professor AI unavailable (fallback allowed)."
+        MODERATION_ERRORS.inc(backend="professor", kind=error_kind(e))
+        logger.warning("Professor AI moderation failed: %s", e)
+        return FALLBACK_RESULT
 
     safety = data.get("safety", "safe").lower()
     categories = [c.lower() for c in data.get("categories", [])]
 
-    flagged_keywords = ["self-harm","self harm","suicide","violence","harm"]
-    matched = [c for c in categories if any(k in c for k in flagged_keywords)]
+    matched = lexicon.flagged_labels(categories)
 
-    primary_category = matched[0] if matched else None
+    # The lexicon only normalizes the label; underscores count as spaces so "self_harm" reads as "self harm"
+    primary_category = (lexicon.category_for(matched[0].replace("_", " ")) or matched[0]) if matched else None
 
     if safety == "unsafe":
         detail = "Professor AI flagged content as unsafe."
@@ -28,6 +43,6 @@ def professor_moderation(text):
         return False, detail, primary_category
 
     if matched:
-         return False, f"Professor AI detected harmful content: {', '.join(matched)}", primary_category
+        return False, f"Professor AI detected harmful content: {', '.join(matched)}", primary_category
 
     return True, "Professor AI cleared the content as safe.", None
@@ -0,0 +1,211 @@
+# routes/mod_router.py
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from routes.metrics import MODERATION_ERRORS, MODERATION_LATENCY, error_kind
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitBreaker:
+    """Track one backend's recent calls and stop sending it traffic when it degrades.
+
+    Closed: calls flow normally. Once at least ``min_calls`` of the last
+    ``window`` calls are recorded and the share of failures (errors, fallback
+    replies, or calls slower than ``slow_call``) reaches ``error_threshold``,
+    the breaker opens and rejects calls for ``cooldown`` seconds. It then goes
+    half-open and lets a single probe through: success closes it, failure
+    re-opens it.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, window=20, min_calls=5, error_threshold=0.5, slow_call=8.0, cooldown=30.0):
+        self.window = window
+        self.min_calls = min_calls
+        self.error_threshold = error_threshold
+        self.slow_call = slow_call
+        self.cooldown = cooldown
+        self.state = self.CLOSED
+        self._outcomes = deque(maxlen=window)
+        self._latencies = deque(maxlen=100)
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self._opened_at >= self.cooldown:
+                self.state = self.HALF_OPEN
+                self._probing = False
+            if self.state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record(self, ok, latency):
+        failed = not ok or latency > self.slow_call
+        with self._lock:
+            if ok:
+                self._latencies.append(latency)
+            if self.state == self.HALF_OPEN:
+                self._probing = False
+                if failed:
+                    self._trip()
+                else:
+                    self.state = self.CLOSED
+                    self._outcomes.clear()
+                return
+            if self.state == self.OPEN:
+                return
+
+            self._outcomes.append(failed)
+            if len(self._outcomes) >= self.min_calls:
+                if sum(self._outcomes) / len(self._outcomes) >= self.error_threshold:
+                    self._trip()
+
+    def p95(self, min_samples=20):
+        """95th percentile latency of recent successful calls, or None with too few samples."""
+        with self._lock:
+            samples = sorted(self._latencies)
+        if len(samples) < min_samples:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+
+    def _trip(self):
+        self.state = self.OPEN
+        self._opened_at = time.monotonic()
+        self._outcomes.clear()
+
+
+class ModerationRouter:
+    """Send each text to the preferred backend that is healthy, failing over to the rest.
+
+    ``backends`` maps a name to a callable returning a moderation result, and
+    ``fallbacks`` maps the same names to the result used when nobody can
+    answer. ``is_failure`` says whether a returned result stands in for a
+    real verdict. With hedging on, if the primary has not answered within
+    its recent p95 latency a second request goes to the next backend and
+    the first real verdict wins.
+    """
+
+    def __init__(self, backends, fallbacks, is_failure):
+        self.backends = backends
+        self.fallbacks = fallbacks
+        self.is_failure = is_failure
+        self.source = "gemini"
+        self.failover = list(backends)
+        self.hedge = False
+        self.hedge_min_samples = 20
+        self.breakers = {name: CircuitBreaker() for name in backends}
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+    def init_app(self, app):
+        app.config.setdefault("MODERATION_SOURCE", os.getenv("MODERATION_SOURCE", "gemini"))
+        app.config.setdefault("MODERATION_FAILOVER", True)
+        app.config.setdefault("MODERATION_HEDGE", False)
+        app.config.setdefault("MODERATION_HEDGE_MIN_SAMPLES", 20)
+        app.config.setdefault("MODERATION_BREAKER_WINDOW", 20)
+        app.config.setdefault("MODERATION_BREAKER_MIN_CALLS", 5)
+        app.config.setdefault("MODERATION_BREAKER_ERROR_RATE", 0.5)
+        app.config.setdefault("MODERATION_BREAKER_SLOW_CALL", 8.0)
+        app.config.setdefault("MODERATION_BREAKER_COOLDOWN", 30.0)
+
+        source = app.config["MODERATION_SOURCE"]
+        if source not in self.backends:
+            raise ValueError(f"Unknown MODERATION_SOURCE {source!r}; expected one of {sorted(self.backends)}")
+        self.source = source
+        others = [name for name in self.backends if name != source]
+        self.failover = [source] + (others if app.config["MODERATION_FAILOVER"] else [])
+        self.hedge = app.config["MODERATION_HEDGE"]
+        self.hedge_min_samples = app.config["MODERATION_HEDGE_MIN_SAMPLES"]
+        self.breakers = {
+            name: CircuitBreaker(
+                window=app.config["MODERATION_BREAKER_WINDOW"],
+                min_calls=app.config["MODERATION_BREAKER_MIN_CALLS"],
+                error_threshold=app.config["MODERATION_BREAKER_ERROR_RATE"],
+                slow_call=app.config["MODERATION_BREAKER_SLOW_CALL"],
+                cooldown=app.config["MODERATION_BREAKER_COOLDOWN"],
+            )
+            for name in self.backends
+        }
+
+    def states(self):
+        return {name: breaker.state for name, breaker in self.breakers.items()}
+
+    def route(self, text):
+        """Moderate ``text`` and return ``(backend_name, result)``."""
+        candidates = list(self.failover)
+        first = None
+        while candidates:
+            name = candidates.pop(0)
+            # Ask lazily: a half-open breaker hands out its single probe on allow()
+            if not self.breakers[name].allow():
+                continue
+            hedge_budget = self.breakers[name].p95(self.hedge_min_samples) if self.hedge else None
+            if hedge_budget is not None and candidates:
+                answered, result = self._hedged(name, candidates, text, hedge_budget)
+            else:
+                answered, result = name, self._call(name, text)
+            if not self.is_failure(result):
+                return answered, result
+            if first is None:
+                first = (answered, result)
+
+        if first is None:
+            # Every breaker is open: answer at once instead of waiting on a timeout
+            return self.source, self.fallbacks[self.source]
+        return first
+
+    def _call(self, name, text):
+        started = time.monotonic()
+        try:
+            result = self.backends[name](text)
+        except Exception as e:
+            MODERATION_ERRORS.inc(backend=name, kind=error_kind(e))
+            logger.exception("Moderation backend %s raised", name)
+            result = self.fallbacks[name]
+        elapsed = time.monotonic() - started
+        MODERATION_LATENCY.observe(elapsed, backend=name)
+        logger.debug("Moderated with %s", name, extra={"backend": name, "seconds": round(elapsed, 4)})
+        self.breakers[name].record(not self.is_failure(result), elapsed)
+        return result
+
+    def _hedged(self, primary, candidates, text, budget):
+        """Race ``primary`` against the next allowed candidate once ``budget`` seconds pass."""
+        executor = self._pool()
+        futures = {executor.submit(self._call, primary, text): primary}
+        done, _ = wait(futures, timeout=budget)
+        if not done:
+            for name in list(candidates):
+                if self.breakers[name].allow():
+                    candidates.remove(name)
+                    futures[executor.submit(self._call, name, text)] = name
+                    break
+
+        pending = set(futures)
+        fallback = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                result = future.result()
+                if not self.is_failure(result):
+                    return futures[future], result
+                if fallback is None or futures[future] == primary:
+                    fallback = (futures[future], result)
+        return fallback
+
+    def _pool(self):
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="moderation-hedge")
+            return self._executor
@@ -1,8 +1,25 @@
+from routes import mod_gemini, mod_professor
 from routes.mod_professor import professor_moderation
 from routes.mod_gemini import gemini_moderation
+from routes.mod_batching import gemini_batcher
+from routes.mod_lexicon import lexicon
+from routes.mod_router import ModerationRouter
+from routes.metrics import MODERATION_FALLBACKS, MODERATION_VERDICTS, registry
+from routes.verdict_cache import verdict_cache
 
-# Change this to "professor" or "gemini"
-MODERATION_SOURCE = "gemini"        # default
+# Backend replies that stand in for a verdict when the service failed
+FALLBACK_RESULTS = (
+    mod_gemini.FALLBACK_RESULT,
+    mod_gemini.KEY_MISSING_RESULT,
+    mod_professor.FALLBACK_RESULT,
+)
+
+def prompt_versions():
+    """Current prompt version of each backend, used to key and purge cached verdicts."""
+    return {
+        "gemini": mod_gemini.PROMPT_VERSION,
+        "professor": f"{mod_professor.PROMPT_VERSION}.{lexicon.backend_labels_version}",
+    }
 
 def normalize_response(result):
     if not isinstance(result, tuple):
@@ -11,10 +28,56 @@ def normalize_response(result):
         return result[0], result[1], None
     return result[0], result[1], result[2]
 
+def call_backend(source, text):
+    if source == "gemini":
+        if gemini_batcher.enabled:
+            return gemini_batcher.submit(text)
+        return gemini_moderation(text)
+
+    return professor_moderation(text)
+
+moderation_router = ModerationRouter(
+    backends={
+        "gemini": lambda text: call_backend("gemini", text),
+        "professor": lambda text: call_backend("professor", text),
+    },
+    fallbacks={
+        "gemini": mod_gemini.FALLBACK_RESULT,
+        "professor": mod_professor.FALLBACK_RESULT,
+    },
+    is_failure=lambda result: result in FALLBACK_RESULTS,
+)
+
+registry.gauge(
+    "moderation_breaker_open", "1 while a backend's circuit breaker is not closed.", ["backend"],
+    callback=lambda: {(name,): int(state != "closed") for name, state in moderation_router.states().items()},
+)
+
+def record_verdict(source, verdict):
+    MODERATION_VERDICTS.inc(
+        source=source,
+        outcome="safe" if verdict[0] else "unsafe",
+        # Backends return free-text categories; keep the label set bounded
+        category=(lexicon.category_for(verdict[2].replace("_", " ")) or "other") if verdict[2] else "none",
+    )
+    return verdict
+
 def is_safe_content_ai(text):
-    if MODERATION_SOURCE == "gemini":
-        print("[Moderator] Using Gemini AI")
-        return normalize_response(gemini_moderation(text))
+    # Clear-cut content is decided locally before any cache or remote call
+    verdict = lexicon.prefilter(text)
+    if verdict is not None:
+        return record_verdict("prefilter", verdict)
+
+    versions = prompt_versions()
+    for source in moderation_router.failover:
+        cached = verdict_cache.get(text, source, versions.get(source, ""))
+        if cached is not None:
+            return record_verdict("cache", cached)
 
-    print("[Moderator] Using Professor AI")
-    return normalize_response(professor_moderation(text))
+    source, result = moderation_router.route(text)
+    verdict = normalize_response(result)
+    if result in FALLBACK_RESULTS:
+        MODERATION_FALLBACKS.inc(backend=source)
+    else:
+        verdict_cache.store(text, source, versions.get(source, ""), verdict)
+    return record_verdict(source, verdict)
@@ -0,0 +1,197 @@
+# routes/moderation_queue.py
+import logging
+import threading
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import and_, or_, update
+
+from extensions import db
+from models.moderation_job import ModerationJob
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue_job(kind, action, target_id, user_id, content, title=None):
+    """Add a moderation job to the session; it becomes durable when the caller commits.
+
+    A newer edit supersedes any older edit of the same item that is still queued.
+    """
+    if action == 'edit':
+        ModerationJob.query.filter_by(
+            kind=kind, action='edit', target_id=target_id, status='queued'
+        ).update({ModerationJob.status: 'superseded'}, synchronize_session=False)
+
+    job = ModerationJob(
+        kind=kind,
+        action=action,
+        target_id=target_id,
+        user_id=user_id,
+        title=title,
+        content=content,
+        status='queued',
+    )
+    db.session.add(job)
+    return job
+
+
+def claim_next_job():
+    """Atomically move the oldest runnable job to ``processing`` and return its id.
+
+    Jobs left in ``processing`` past the lease (e.g. a worker died) are runnable
+    again until they reach the attempt limit; ``fail_stale_jobs`` fails the rest.
+    """
+    config = current_app.config
+    now = datetime.utcnow()
+    stale_before = now - timedelta(seconds=config["MODERATION_JOB_LEASE"])
+
+    next_job = (
+        db.select(ModerationJob.id)
+        .where(
+            ModerationJob.attempts < config["MODERATION_MAX_ATTEMPTS"],
+            or_(
+                ModerationJob.status == 'queued',
+                and_(ModerationJob.status == 'processing', ModerationJob.claimed_at < stale_before),
+            ),
+        )
+        .order_by(ModerationJob.id)
+        .limit(1)
+        .scalar_subquery()
+    )
+    claimed = db.session.execute(
+        update(ModerationJob)
+        .where(ModerationJob.id == next_job)
+        .values(status='processing', claimed_at=now, attempts=ModerationJob.attempts + 1)
+        .returning(ModerationJob.id)
+        .execution_options(synchronize_session=False)
+    ).scalar()
+    db.session.commit()
+    return claimed
+
+
+def fail_stale_jobs():
+    """Fail jobs left in ``processing`` past the lease on their last attempt; returns their ids."""
+    config = current_app.config
+    now = datetime.utcnow()
+    failed = db.session.execute(
+        update(ModerationJob)
+        .where(
+            ModerationJob.status == 'processing',
+            ModerationJob.claimed_at < now - timedelta(seconds=config["MODERATION_JOB_LEASE"]),
+            ModerationJob.attempts >= config["MODERATION_MAX_ATTEMPTS"],
+        )
+        .values(status='failed', finished_at=now)
+        .returning(ModerationJob.id)
+        .execution_options(synchronize_session=False)
+    ).scalars().all()
+    db.session.commit()
+    return failed
+
+
+def release_job(job_id):
+    """Put a job whose handler crashed back in the queue, or fail it after the last attempt.
+
+    Returns True if the job was failed.
+    """
+    job = db.session.get(ModerationJob, job_id)
+    if job is None:
+        return False
+    failed = job.attempts >= current_app.config["MODERATION_MAX_ATTEMPTS"]
+    if failed:
+        job.status = 'failed'
+        job.finished_at = datetime.utcnow()
+    else:
+        job.status = 'queued'
+    db.session.commit()
+    return failed
+
+
+class ModerationWorkerPool:
+    """Background threads that drain the ``moderation_jobs`` table.
+
+    Workers sleep on a semaphore that ``notify`` releases once per committed
+    job, and also poll every ``MODERATION_POLL_INTERVAL`` seconds so jobs
+    queued by other processes (or left over from a restart) are picked up.
+    An idle worker also fails stale jobs that used their last attempt.
+    ``on_failure`` is called with the id of every job that ends up failed.
+    """
+
+    def __init__(self):
+        self._wakeup = threading.Semaphore(0)
+        self._stopping = threading.Event()
+        self._threads = []
+
+    @property
+    def running(self):
+        return any(thread.is_alive() for thread in self._threads)
+
+    def start(self, app, handler, on_failure=None):
+        if self.running:
+            return
+        self._stopping.clear()
+        self._threads = [
+            threading.Thread(
+                target=self._run,
+                args=(app, handler, on_failure),
+                name=f"moderation-worker-{index}",
+                daemon=True,
+            )
+            for index in range(app.config["MODERATION_WORKERS"])
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self, timeout=5):
+        self._stopping.set()
+        for _ in self._threads:
+            self._wakeup.release()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def notify(self):
+        self._wakeup.release()
+
+    def _run(self, app, handler, on_failure):
+        poll_interval = app.config["MODERATION_POLL_INTERVAL"]
+        while not self._stopping.is_set():
+            with app.app_context():
+                job_id = None
+                failed = []
+                try:
+                    job_id = claim_next_job()
+                    if job_id is not None:
+                        handler(job_id)
+                    else:
+                        failed = fail_stale_jobs()
+                except Exception:
+                    logger.exception("Moderation job %s failed", job_id)
+                    db.session.rollback()
+                    if job_id is not None and release_job(job_id):
+                        failed = [job_id]
+                try:
+                    for failed_id in failed:
+                        if on_failure is not None:
+                            on_failure(failed_id)
+                except Exception:
+                    logger.exception("Could not clean up failed moderation jobs %s", failed)
+                    db.session.rollback()
+                finally:
+                    db.session.remove()
+
+            if job_id is None:
+                self._wakeup.acquire(timeout=poll_interval)
+
+
+moderation_workers = ModerationWorkerPool()
+
+
+def dispatch_job(job_id, handler):
+    """Hand a committed job to the workers, or run it inline in synchronous mode.
+
+    Returns the handler's result in synchronous mode and None otherwise.
+    """
+    if current_app.config["MODERATION_ASYNC"]:
+        moderation_workers.notify()
+        return None
+    return handler(job_id)
@@ -0,0 +1,161 @@
+# routes/notification_broker.py
+import json
+import threading
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, event, func, insert, select
+
+from extensions import db
+from models.notification_event import NotificationEvent
+
+
+class Subscription:
+    """One open stream's wake-up signal.
+
+    The events themselves live in ``notification_events``; a subscription
+    only lets a commit in this process wake its streams straight away
+    instead of at their next poll.
+    """
+
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self._ready = threading.Event()
+
+    def wake(self):
+        self._ready.set()
+
+    def wait(self, timeout):
+        """Wait up to ``timeout`` seconds for a wake-up; returns True if woken."""
+        woken = self._ready.wait(timeout)
+        self._ready.clear()
+        return woken
+
+
+class NotificationBroker:
+    """Notification events for users' open streams, kept in the ``notification_events`` outbox.
+
+    ``publish`` adds rows in the caller's transaction, so an event exists
+    exactly when the change it announces commits, whichever process made
+    it. Streams read the rows after the last id they sent, polling every
+    ``NOTIFICATION_POLL_INTERVAL`` seconds; streams in the publishing
+    process are also woken as soon as the transaction commits. Rows older
+    than ``NOTIFICATION_RETENTION`` seconds are pruned, and a stream that
+    reconnects from before the oldest remaining row is told to resync.
+    """
+
+    PRUNE_EVERY = 100  # published events between prunes
+
+    def __init__(self):
+        self.batch_size = 100
+        self.retention = timedelta(days=1)
+        self._subscribers = defaultdict(set)
+        self._lock = threading.Lock()
+        self._published = 0
+
+    def init_app(self, app):
+        app.config.setdefault("NOTIFICATION_STREAM_BUFFER", 100)
+        app.config.setdefault("NOTIFICATION_RETENTION", 24 * 3600)
+        app.config.setdefault("NOTIFICATION_POLL_INTERVAL", 2.0)
+        app.config.setdefault("NOTIFICATION_HEARTBEAT", 15.0)
+        app.config.setdefault("NOTIFICATION_STREAM", False)
+        self.batch_size = app.config["NOTIFICATION_STREAM_BUFFER"]
+        self.retention = timedelta(seconds=app.config["NOTIFICATION_RETENTION"])
+
+    def publish(self, user_id, kind, data):
+        return self.publish_many([(user_id, kind, data)])[0]
+
+    def publish_many(self, events):
+        """Add ``(user_id, kind, data)`` events to the current transaction; returns their ids."""
+        if not events:
+            return []
+        ids = db.session.execute(
+            insert(NotificationEvent).returning(NotificationEvent.id, sort_by_parameter_order=True),
+            [
+                {"user_id": user_id, "kind": kind, "data": json.dumps(data, default=str)}
+                for user_id, kind, data in events
+            ],
+        ).scalars().all()
+        db.session.info.setdefault("notified_users", set()).update(user_id for user_id, _, _ in events)
+        with self._lock:
+            before, self._published = self._published, self._published + len(events)
+            due = before // self.PRUNE_EVERY != self._published // self.PRUNE_EVERY
+        if due:
+            self.prune()
+        return ids
+
+    def prune(self):
+        """Delete events older than the retention period in the current transaction."""
+        db.session.execute(
+            delete(NotificationEvent).where(NotificationEvent.created_at < datetime.utcnow() - self.retention)
+        )
+
+    def events_after(self, user_id, last_event_id):
+        """Up to ``batch_size`` of the user's events after ``last_event_id``, oldest first."""
+        rows = db.session.execute(
+            select(NotificationEvent.id, NotificationEvent.kind, NotificationEvent.data)
+            .where(NotificationEvent.user_id == user_id, NotificationEvent.id > last_event_id)
+            .order_by(NotificationEvent.id)
+            .limit(self.batch_size)
+        )
+        return [(event_id, kind, json.loads(data)) for event_id, kind, data in rows]
+
+    def latest_id(self, user_id):
+        """Id of the user's newest event, or 0; a new stream starts after it."""
+        return db.session.execute(
+            select(func.max(NotificationEvent.id)).where(NotificationEvent.user_id == user_id)
+        ).scalar() or 0
+
+    def missed(self, last_event_id):
+        """True if events after ``last_event_id`` may have been pruned already."""
+        oldest = db.session.execute(select(func.min(NotificationEvent.id))).scalar()
+        return oldest is not None and oldest > last_event_id + 1
+
+    def subscribe(self, user_id):
+        subscription = Subscription(user_id)
+        with self._lock:
+            self._subscribers[user_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.user_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.user_id]
+
+    def wake(self, user_ids):
+        with self._lock:
+            subscriptions = [s for user_id in user_ids for s in self._subscribers.get(user_id, ())]
+        for subscription in subscriptions:
+            subscription.wake()
+
+    def connections(self):
+        with self._lock:
+            return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+
+notification_broker = NotificationBroker()
+
+
+def publish_on_commit(user_id, kind, data):
+    """Publish an event with the current ``db.session`` transaction.
+
+    The event row commits or rolls back together with the change it
+    announces.
+    """
+    notification_broker.publish(user_id, kind, data)
+
+
+@event.listens_for(db.session, "after_commit")
+def _wake_streams(session):
+    user_ids = session.info.pop("notified_users", None)
+    if user_ids:
+        notification_broker.wake(user_ids)
+
+
+@event.listens_for(db.session, "after_soft_rollback")
+def _forget_notified(session, previous_transaction):
+    if not session.in_transaction():
+        session.info.pop("notified_users", None)
@@ -0,0 +1,278 @@
+# routes/notifications.py
+import json
+import threading
+import time
+from datetime import datetime
+
+from flask import Blueprint, Response, abort, current_app, g, has_request_context, jsonify, redirect, request, url_for
+from flask_login import current_user, login_required
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import joinedload
+
+from extensions import db
+from models.appointment import Appointment
+from models.forum import ForumPost, ForumReply
+from routes.notification_broker import notification_broker
+
+EMPTY_NOTIFICATIONS = {
+    "appointment_notifications": [],
+    "reply_notifications": [],
+    "notification_count": 0,
+}
+
+
+class NotificationCountCache:
+    """Per-user ``(appointments, replies)`` notification counts.
+
+    Entries are dropped by ``invalidate`` whenever a user's appointments or
+    the replies to their posts change, and expire on their own after
+    ``NOTIFICATION_COUNT_TTL`` seconds or when the next appointment starts,
+    since time passing also changes what counts as upcoming.
+    """
+
+    def __init__(self):
+        self.ttl = 60.0
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        app.config.setdefault("NOTIFICATION_COUNT_TTL", 60.0)
+        app.config.setdefault("NOTIFICATION_LIMIT", 10)
+        self.ttl = app.config["NOTIFICATION_COUNT_TTL"]
+        self.clear()
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            counts, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[user_id]
+                return None
+            return counts
+
+    def set(self, user_id, counts, lifetime=None):
+        lifetime = self.ttl if lifetime is None else min(self.ttl, lifetime)
+        with self._lock:
+            self._entries[user_id] = (counts, time.monotonic() + lifetime)
+
+    def invalidate(self, *user_ids):
+        with self._lock:
+            for user_id in user_ids:
+                self._entries.pop(user_id, None)
+        if has_request_context():
+            g.pop("_notifications", None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+notification_counts = NotificationCountCache()
+
+
+def upcoming_appointments_query(user_id, now):
+    today, current_time = now.date(), now.time()
+    return Appointment.query.filter(
+        Appointment.user_id == user_id,
+        or_(
+            Appointment.date > today,
+            and_(Appointment.date == today, Appointment.time >= current_time),
+        ),
+    )
+
+
+def reply_notifications_query(user):
+    """Unread published replies by other people on the user's posts.
+
+    Only replies after the user's ``(notifications_seen_at,
+    notifications_seen_reply_id)`` watermark are unread, so each of the
+    user's posts costs one range scan of ``ix_forum_replies_post_id_created_at``
+    no matter how many replies it has collected over time.
+    """
+    query = (
+        ForumReply.query.join(ForumPost, ForumPost.id == ForumReply.post_id)
+        .filter(
+            ForumPost.user_id == user.id,
+            ForumReply.user_id != user.id,
+            ForumReply.status == 'published',
+        )
+    )
+    if user.notifications_seen_at is not None:
+        query = query.filter(or_(
+            ForumReply.created_at > user.notifications_seen_at,
+            and_(
+                ForumReply.created_at == user.notifications_seen_at,
+                ForumReply.id > user.notifications_seen_reply_id,
+            ),
+        ))
+    return query
+
+
+def mark_replies_read(user, through_reply_id=None):
+    """Move the user's watermark up to ``through_reply_id`` (default: the newest unread reply).
+
+    Returns True if the watermark moved. Commits.
+    """
+    unread = reply_notifications_query(user)
+    if through_reply_id is not None:
+        unread = unread.filter(ForumReply.id == through_reply_id)
+    newest = (
+        unread.with_entities(ForumReply.created_at, ForumReply.id)
+        .order_by(ForumReply.created_at.desc(), ForumReply.id.desc())
+        .first()
+    )
+    if newest is None:
+        return False
+    user.notifications_seen_at, user.notifications_seen_reply_id = newest
+    db.session.commit()
+    notification_counts.invalidate(user.id)
+    return True
+
+
+def get_notifications(user):
+    """Notification context for ``user``, computed at most once per request.
+
+    Covers upcoming appointments and unread replies. Lists are capped at ``NOTIFICATION_LIMIT`` entries; the badge count comes
+    from ``notification_counts`` and is only recounted on a cache miss.
+    """
+    if not getattr(user, "is_authenticated", False):
+        return EMPTY_NOTIFICATIONS
+    if has_request_context() and "_notifications" in g:
+        return g._notifications
+
+    now = datetime.now()
+    limit = current_app.config["NOTIFICATION_LIMIT"]
+    appointments_query = upcoming_appointments_query(user.id, now)
+    replies_query = reply_notifications_query(user)
+
+    counts = notification_counts.get(user.id)
+    appointments = []
+    replies = []
+    if counts is None or counts[0]:
+        appointments = (
+            appointments_query.order_by(Appointment.date.asc(), Appointment.time.asc())
+            .limit(limit)
+            .all()
+        )
+    if counts is None or counts[1]:
+        replies = (
+            replies_query.options(joinedload(ForumReply.user))
+            .order_by(ForumReply.created_at.desc(), ForumReply.id.desc())
+            .limit(limit)
+            .all()
+        )
+
+    if counts is None:
+        appointment_count = len(appointments) if len(appointments) < limit else appointments_query.count()
+        reply_count = len(replies) if len(replies) < limit else replies_query.count()
+        counts = (appointment_count, reply_count)
+        lifetime = None
+        if appointments:
+            # The soonest appointment drops out of the list once it starts
+            first = appointments[0]
+            lifetime = max(0.0, (datetime.combine(first.date, first.time) - now).total_seconds())
+        notification_counts.set(user.id, counts, lifetime)
+
+    result = {
+        "appointment_notifications": appointments,
+        "reply_notifications": replies,
+        "notification_count": sum(counts),
+    }
+    if has_request_context():
+        g._notifications = result
+    return result
+
+
+notifications_bp = Blueprint('notifications', __name__)
+
+
+@notifications_bp.route('/notifications/read', methods=['POST'])
+@login_required
+def mark_read():
+    """Mark reply notifications read, up to the ``through`` reply id if one is given."""
+    through = request.form.get('through', type=int)
+    moved = mark_replies_read(current_user, through)
+    if request.accept_mimetypes.best == 'application/json':
+        return jsonify({"updated": moved, "notification_count": get_notifications(current_user)["notification_count"]})
+    return redirect(request.referrer or url_for('dashboard.home'))
+
+
+def _sse(kind, data, event_id=None):
+    lines = [] if event_id is None else [f"id: {event_id}"]
+    lines.append(f"event: {kind}")
+    lines.append(f"data: {json.dumps(data, default=str)}")
+    return "\n".join(lines) + "\n\n"
+
+
+def event_stream(app, subscription, last_event_id, resync=False):
+    """Yield SSE frames for ``subscription`` until the client goes away.
+
+    Events are read from the outbox after ``last_event_id``. Between reads
+    the stream waits for a commit in this process to wake it, or at most
+    ``NOTIFICATION_POLL_INTERVAL`` seconds for events from other processes,
+    without holding a database connection. A comment line goes out every
+    ``NOTIFICATION_HEARTBEAT`` seconds without events so proxies keep the
+    connection open.
+    """
+    heartbeat = app.config["NOTIFICATION_HEARTBEAT"]
+    poll_interval = min(app.config["NOTIFICATION_POLL_INTERVAL"], heartbeat)
+    try:
+        yield "retry: 5000\n\n"
+        if resync:
+            yield _sse("resync", {})
+        quiet = 0.0
+        while True:
+            with app.app_context():
+                events = notification_broker.events_after(subscription.user_id, last_event_id)
+            for event_id, kind, data in events:
+                yield _sse(kind, data, event_id)
+                last_event_id = event_id
+            if events:
+                quiet = 0.0
+                continue
+            if quiet >= heartbeat:
+                yield ": heartbeat\n\n"
+                quiet = 0.0
+            started = time.monotonic()
+            subscription.wait(poll_interval)
+            quiet += time.monotonic() - started
+    finally:
+        notification_broker.unsubscribe(subscription)
+
+
+@notifications_bp.route('/notifications/stream')
+@login_required
+def stream():
+    """Live notification events for the navbar badge, opt-in via ``NOTIFICATION_STREAM``.
+
+    Each open stream holds a worker thread for as long as the browser
+    stays connected (every tab of every signed-in user), so only enable it
+    under an async server such as gunicorn with gevent or eventlet workers.
+    When it is off this returns 404, which the page does not retry.
+    """
+    if not current_app.config["NOTIFICATION_STREAM"]:
+        abort(404)
+    subscription = notification_broker.subscribe(current_user.id)
+    # A reconnect resumes after the browser's Last-Event-ID, a new
+    # connection after the newest event there is now
+    last_event_id = request.headers.get('Last-Event-ID', type=int)
+    resync = last_event_id is not None and notification_broker.missed(last_event_id)
+    if last_event_id is None:
+        last_event_id = notification_broker.latest_id(current_user.id)
+    # Not wrapped in stream_with_context: the request, and its database
+    # session, is torn down before the long-lived body starts streaming;
+    # each read opens a short app context of its own
+    response = Response(
+        event_stream(
+            current_app._get_current_object(),
+            subscription,
+            last_event_id,
+            resync,
+        ),
+        mimetype='text/event-stream',
+    )
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
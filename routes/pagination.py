@@ -0,0 +1,69 @@
+# routes/pagination.py
+import base64
+import binascii
+from datetime import datetime
+
+from sqlalchemy import bindparam, text
+
+from extensions import db
+
+# Stands in for a missing timestamp on legacy rows; sorts them last in newest-first feeds
+LEGACY_TIMESTAMP = datetime(1970, 1, 1)
+
+
+def encode_cursor(timestamp, row_id):
+    """Pack a (timestamp, id) keyset position into an opaque URL-safe token."""
+    raw = f"{timestamp.isoformat()}|{row_id}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token):
+    """Return the (timestamp, id) position of a cursor token, or None if it is malformed."""
+    if not token:
+        return None
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8")
+        stamp, row_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(stamp), int(row_id)
+    except (ValueError, UnicodeError, binascii.Error):
+        return None
+
+
+def fill_missing_timestamps(connection, table, column):
+    """Set NULL ``column`` values to ``LEGACY_TIMESTAMP``; returns the number of rows changed.
+
+    A NULL cannot take part in the (timestamp, id) comparison or be encoded
+    in a cursor, so such rows would drop out of every keyset page.
+    """
+    return connection.execute(
+        text(f"UPDATE {table} SET {column} = :legacy WHERE {column} IS NULL").bindparams(
+            bindparam("legacy", LEGACY_TIMESTAMP, type_=db.DateTime)
+        )
+    ).rowcount
+
+
+def keyset_page(query, timestamp_column, id_column, cursor=None, limit=20, descending=True):
+    """Fetch one page of ``query`` ordered by (timestamp, id) starting after ``cursor``.
+
+    Returns ``(rows, next_cursor)``; ``next_cursor`` is None on the last page.
+    One extra row is fetched to find out whether another page exists.
+    """
+    key = db.tuple_(timestamp_column, id_column)
+    position = decode_cursor(cursor)
+    if position:
+        bound = db.tuple_(*position)
+        query = query.filter(key < bound if descending else key > bound)
+
+    if descending:
+        query = query.order_by(timestamp_column.desc(), id_column.desc())
+    else:
+        query = query.order_by(timestamp_column.asc(), id_column.asc())
+
+    rows = query.limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(getattr(last, timestamp_column.key), getattr(last, id_column.key))
+    return rows, next_cursor
@@ -4,10 +4,15 @@ import uuid
 from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app, send_from_directory
 from flask_login import login_required, current_user
 from datetime import datetime
+from sqlalchemy import func
+from sqlalchemy.orm import selectinload
 from extensions import db
 from models.profile import Profile
 from models.medical_history import MedicalHistory
 from models.medication import Medication
+from routes.activity_rollup import bump_activity, medication_changes
+from routes.reminder_scheduler import reminder_scheduler
+from routes.user_summary import refresh_summary
 from werkzeug.utils import secure_filename
 
 profile_bp = Blueprint('profile', __name__)
@@ -38,8 +43,21 @@ def manage_profile():
         return redirect(url_for('profile.manage_profile'))
 
     histories = MedicalHistory.query.filter_by(profile_id=profile.id)\
+        .options(selectinload(MedicalHistory.medications))\
         .order_by(MedicalHistory.created_at.desc()).all() if profile else []
-    return render_template('profile.html', profile=profile, medical_histories=histories)
+    # One grouped count instead of checking every medication in Python
+    active_counts = dict(
+        db.session.query(Medication.medical_history_id, func.count(Medication.id))
+        .join(MedicalHistory, MedicalHistory.id == Medication.medical_history_id)
+        .filter(MedicalHistory.profile_id == profile.id, Medication.is_active)
+        .group_by(Medication.medical_history_id)
+    ) if profile else {}
+    return render_template(
+        'profile.html',
+        profile=profile,
+        medical_histories=histories,
+        active_counts=active_counts,
+    )
 
 
 # -------- PROFILE: delete ----------
@@ -51,8 +69,17 @@ def delete_profile():
         flash('No profile to delete.', 'info')
         return redirect(url_for('profile.manage_profile'))
 
+    medications = [med for history in profile.medical_histories for med in history.medications]
+    med_ids = [med.id for med in medications]
+    bump_activity([
+        change
+        for med in medications
+        for change in medication_changes(current_user.id, med.start_date, med.end_date, sign=-1)
+    ])
     db.session.delete(profile)
+    refresh_summary(current_user.id, 'medications')
     db.session.commit()
+    reminder_scheduler.cancel(*med_ids)
     flash('Profile deleted successfully.', 'info')
     return redirect(url_for('profile.manage_profile'))
 
@@ -144,8 +171,16 @@ def delete_medical_history(record_id):
     
     _delete_report_file(rec.report_filename)
 
+    med_ids = [med.id for med in rec.medications]
+    bump_activity([
+        change
+        for med in rec.medications
+        for change in medication_changes(current_user.id, med.start_date, med.end_date, sign=-1)
+    ])
     db.session.delete(rec)
+    refresh_summary(current_user.id, 'medications')
     db.session.commit()
+    reminder_scheduler.cancel(*med_ids)
     flash('Medical record deleted.', 'info')
     return redirect(url_for('profile.manage_profile'))
 
@@ -214,7 +249,10 @@ def add_medication(record_id):
         return redirect(url_for('profile.manage_profile'))
 
     db.session.add(med)
+    bump_activity(medication_changes(current_user.id, med.start_date, med.end_date))
+    refresh_summary(current_user.id, 'medications')
     db.session.commit()
+    reminder_scheduler.update(current_user.id, med)
     flash('Medication added.', 'success')
     return redirect(url_for('profile.manage_profile'))
 
@@ -229,6 +267,7 @@ def edit_medication(med_id):
         flash('Unauthorized action.', 'danger')
         return redirect(url_for('profile.manage_profile'))
 
+    old_span = (med.start_date, med.end_date)
     med.name = (request.form.get('name') or '').strip()
     med.dosage = request.form.get('dosage') or None
     med.frequency = request.form.get('frequency') or None
@@ -246,7 +285,13 @@ def edit_medication(med_id):
         flash('Medication name is required.', 'warning')
         return redirect(url_for('profile.manage_profile'))
 
+    bump_activity(
+        medication_changes(current_user.id, *old_span, sign=-1)
+        + medication_changes(current_user.id, med.start_date, med.end_date)
+    )
+    refresh_summary(current_user.id, 'medications')
     db.session.commit()
+    reminder_scheduler.update(current_user.id, med)
     flash('Medication updated.', 'success')
     return redirect(url_for('profile.manage_profile'))
 
@@ -261,8 +306,12 @@ def delete_medication(med_id):
         flash('Unauthorized action.', 'danger')
         return redirect(url_for('profile.manage_profile'))
 
+    med_id = med.id
+    bump_activity(medication_changes(current_user.id, med.start_date, med.end_date, sign=-1))
     db.session.delete(med)
+    refresh_summary(current_user.id, 'medications')
     db.session.commit()
+    reminder_scheduler.cancel(med_id)
     flash('Medication deleted.', 'info')
     return redirect(url_for('profile.manage_profile'))
 
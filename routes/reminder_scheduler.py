@@ -0,0 +1,294 @@
+# routes/reminder_scheduler.py
+import heapq
+import itertools
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import or_, select
+
+from extensions import db
+from models.medical_history import MedicalHistory
+from models.medication import Medication
+from models.profile import Profile
+from routes.metrics import REMINDER_SKEW, REMINDERS_SENT, registry
+from routes.appointments import publish_due_appointments
+from routes.medication_schedule import iter_doses, parse_frequency
+from routes.notification_broker import notification_broker
+
+logger = logging.getLogger(__name__)
+
+
+class Reminder:
+    __slots__ = (
+        "medication_id", "user_id", "name", "dosage", "rule", "reminder_time", "start_date", "end_date", "fire_at",
+    )
+
+    def __init__(self, medication_id, user_id, name, dosage, rule, reminder_time, start_date, end_date, fire_at):
+        self.medication_id = medication_id
+        self.user_id = user_id
+        self.name = name
+        self.dosage = dosage
+        self.rule = rule
+        self.reminder_time = reminder_time
+        self.start_date = start_date
+        self.end_date = end_date
+        self.fire_at = fire_at
+
+
+def next_fire_time(rule, reminder_time, start_date, end_date, after):
+    """First dose strictly after ``after``, or None.
+
+    Doses follow the medication calendar (``iter_doses``): ``rule`` is the
+    parsed frequency and ``reminder_time`` the day's first dose. As-needed
+    and unscheduled medications (``rule`` None) get no reminders.
+    """
+    if rule is None or reminder_time is None or start_date is None:
+        return None
+    # Every rule doses at least once a week (or every ``every_days``), and a
+    # day's later doses can spill one day past it
+    first_day = datetime.combine(max(start_date, after.date()), datetime.min.time())
+    window_end = first_day + timedelta(days=max(rule.every_days, 7) + 2)
+    doses = iter_doses(rule, start_date, end_date, reminder_time, after + timedelta(microseconds=1), window_end)
+    return next(doses, None)
+
+
+class ReminderScheduler:
+    """Fires medication reminders from an in-memory min-heap of next fire times.
+
+    ``load`` reads every medication that can still fire once, at start-up.
+    After that the medication routes keep the heap current through
+    ``update`` and ``cancel``; a replaced or cancelled entry stays in the
+    heap and is skipped when it surfaces. The thread sleeps until the
+    earliest deadline (or until an earlier one is scheduled), hands due
+    reminders to ``dispatch`` in batches of ``REMINDER_BATCH_SIZE`` and
+    pushes each one's next dose from the medication calendar. It wakes at least once a
+    minute, and then also sends the ``appointment-due`` events (safe to run
+    in several processes; ``flask appointments send-due`` does the same from
+    cron).
+
+    Updates only reach the scheduler in the process that runs it, so it is
+    opt-in (``REMINDER_SCHEDULER``) and only started by the serving process
+    of ``python app.py``: enable it for single-process deployments only,
+    otherwise other workers' edits and deletes would never reach the heap.
+    """
+
+    APPOINTMENT_SWEEP_EVERY = 60.0  # seconds
+
+    def __init__(self):
+        self.batch_size = 500
+        self._app = None
+        self.dispatch = publish_reminders
+        self._heap = []
+        self._entries = {}
+        self._seq = itertools.count()
+        self._loaded = False
+        self._changed = threading.Condition()
+        self._stopping = False
+        self._thread = None
+
+    def init_app(self, app):
+        app.config.setdefault("REMINDER_SCHEDULER", False)
+        app.config.setdefault("REMINDER_BATCH_SIZE", 500)
+        self.batch_size = app.config["REMINDER_BATCH_SIZE"]
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, app):
+        if self.running:
+            return
+        with app.app_context():
+            self.load()
+            db.session.remove()
+        self._app = app
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="reminder-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5):
+        with self._changed:
+            self._stopping = True
+            self._changed.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._thread = None
+
+    def load(self, now=None):
+        """Replace the heap with every medication that has a reminder still to fire."""
+        now = now or datetime.now()
+        rows = db.session.execute(
+            select(
+                Medication.id, Profile.user_id, Medication.name, Medication.dosage, Medication.frequency,
+                Medication.reminder_time, Medication.start_date, Medication.end_date,
+            )
+            .join(MedicalHistory, MedicalHistory.id == Medication.medical_history_id)
+            .join(Profile, Profile.id == MedicalHistory.profile_id)
+            .where(
+                Medication.reminder_time.is_not(None),
+                Medication.start_date.is_not(None),
+                or_(Medication.end_date.is_(None), Medication.end_date >= now.date()),
+            )
+            .execution_options(yield_per=5000)
+        )
+        entries = {}
+        heap = []
+        rules = {}  # Most medications share a handful of frequency texts
+        for medication_id, user_id, name, dosage, frequency, reminder_time, start_date, end_date in rows:
+            if frequency not in rules:
+                rules[frequency] = parse_frequency(frequency)
+            rule = rules[frequency]
+            fire_at = next_fire_time(rule, reminder_time, start_date, end_date, now)
+            if fire_at is None:
+                continue
+            seq = next(self._seq)
+            entries[medication_id] = (seq, Reminder(
+                medication_id, user_id, name, dosage, rule, reminder_time, start_date, end_date, fire_at,
+            ))
+            heap.append((fire_at, seq, medication_id))
+        heapq.heapify(heap)
+        with self._changed:
+            self._entries, self._heap = entries, heap
+            self._loaded = True
+            self._changed.notify()
+        logger.info("Loaded %d medication reminders", len(entries))
+        return len(entries)
+
+    def update(self, user_id, *medications, now=None):
+        """(Re)schedule medications after they were added or edited; no-op until loaded."""
+        if not self._loaded:
+            return
+        now = now or datetime.now()
+        with self._changed:
+            for med in medications:
+                rule = parse_frequency(med.frequency)
+                fire_at = next_fire_time(rule, med.reminder_time, med.start_date, med.end_date, now)
+                if fire_at is None:
+                    self._entries.pop(med.id, None)
+                    continue
+                self._push(Reminder(
+                    med.id, user_id, med.name, med.dosage, rule, med.reminder_time, med.start_date, med.end_date,
+                    fire_at,
+                ))
+            self._changed.notify()
+
+    def clear(self):
+        """Forget every reminder; ``update`` is a no-op again until the next ``load``."""
+        with self._changed:
+            self._entries, self._heap = {}, []
+            self._loaded = False
+
+    def cancel(self, *medication_ids):
+        with self._changed:
+            for medication_id in medication_ids:
+                self._entries.pop(medication_id, None)
+
+    def pending(self):
+        with self._changed:
+            return len(self._entries)
+
+    def due(self, now=None):
+        """Pop up to ``batch_size`` reminders due at ``now`` and schedule their next occurrence."""
+        now = now or datetime.now()
+        batch = []
+        with self._changed:
+            heap, entries = self._heap, self._entries
+            while heap and len(batch) < self.batch_size:
+                fire_at, seq, medication_id = heap[0]
+                if fire_at > now:
+                    break
+                entry = entries.get(medication_id)
+                if entry is None or entry[0] != seq:
+                    heapq.heappop(heap)
+                    continue
+                reminder = entry[1]
+                batch.append((reminder, fire_at))
+                # Measured from now, so a scheduler that fell behind does not replay missed doses
+                following = next_fire_time(
+                    reminder.rule, reminder.reminder_time, reminder.start_date, reminder.end_date, max(fire_at, now),
+                )
+                if following is None:
+                    heapq.heappop(heap)
+                    del entries[medication_id]
+                else:
+                    # Same entry, same sequence number: replacing the root is one sift, not two
+                    reminder.fire_at = following
+                    heapq.heapreplace(heap, (following, seq, medication_id))
+            self._compact()
+        return batch
+
+    def _push(self, reminder):
+        seq = next(self._seq)
+        self._entries[reminder.medication_id] = (seq, reminder)
+        heapq.heappush(self._heap, (reminder.fire_at, seq, reminder.medication_id))
+
+    def _compact(self):
+        # Drop replaced and cancelled entries once they outnumber the live ones
+        if len(self._heap) > 2 * len(self._entries) + 1024:
+            self._heap = [(reminder.fire_at, seq, medication_id)
+                          for medication_id, (seq, reminder) in self._entries.items()]
+            heapq.heapify(self._heap)
+
+    def _seconds_until_next(self):
+        # Re-check at least once a minute in case the wall clock jumps
+        if not self._heap:
+            return 60.0
+        return min(60.0, (self._heap[0][0] - datetime.now()).total_seconds())
+
+    def _run(self):
+        next_sweep = 0.0
+        while True:
+            with self._changed:
+                while not self._stopping:
+                    timeout = min(self._seconds_until_next(), next_sweep - time.monotonic())
+                    if timeout <= 0:
+                        break
+                    self._changed.wait(timeout)
+                if self._stopping:
+                    return
+            with self._app.app_context():
+                if time.monotonic() >= next_sweep:
+                    next_sweep = time.monotonic() + self.APPOINTMENT_SWEEP_EVERY
+                    try:
+                        publish_due_appointments()
+                    except Exception:
+                        logger.exception("Could not send appointment-due events")
+                batch = self.due()
+                if not batch:
+                    continue
+                try:
+                    self.dispatch(batch)
+                except Exception:
+                    logger.exception("Could not dispatch %d medication reminders", len(batch))
+
+
+def publish_reminders(batch):
+    """Default dispatcher: add each reminder to its owner's notification events (commits)."""
+    # Reminders come due in bulk at the same minute, so format and measure once per deadline
+    by_deadline = {}
+    for reminder, fire_at in batch:
+        by_deadline.setdefault(fire_at, []).append(reminder)
+    for fire_at, reminders in by_deadline.items():
+        due_at = fire_at.isoformat()
+        notification_broker.publish_many([
+            (reminder.user_id, 'reminder', {
+                "medication_id": reminder.medication_id,
+                "name": reminder.name,
+                "dosage": reminder.dosage,
+                "due_at": due_at,
+            })
+            for reminder in reminders
+        ])
+        REMINDER_SKEW.observe(max(0.0, time.time() - fire_at.timestamp()), count=len(reminders))
+    db.session.commit()
+    REMINDERS_SENT.inc(len(batch))
+
+
+reminder_scheduler = ReminderScheduler()
+
+registry.gauge(
+    "medication_reminders_scheduled", "Medications with a reminder waiting in the scheduler.",
+    callback=lambda: {(): reminder_scheduler.pending()},
+)
@@ -0,0 +1,113 @@
+# routes/user_summary.py
+from datetime import date, timedelta
+
+from sqlalchemy import Date, and_, func, insert, literal, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from extensions import db
+from models.appointment import Appointment
+from models.forum import ForumPost, ForumReply
+from models.medical_history import MedicalHistory
+from models.medication import Medication
+from models.profile import Profile
+from models.user import User
+from models.user_summary import UserSummary
+
+SECTIONS = ("medications", "appointments", "forum")
+# Sections whose values depend on the current day
+DAILY_SECTIONS = frozenset({"medications", "appointments"})
+
+
+def _section_columns(section, user_id, today):
+    """Column name -> scalar subquery for one section of the summary of ``user_id``.
+
+    ``user_id`` is either a plain id or a column to correlate with, so the
+    same definitions serve single-user refreshes and the full rebuild.
+    """
+    if section == "medications":
+        medications = (
+            select(func.count(Medication.id))
+            .join(MedicalHistory, MedicalHistory.id == Medication.medical_history_id)
+            .join(Profile, Profile.id == MedicalHistory.profile_id)
+            .where(Profile.user_id == user_id)
+        )
+        return {
+            "medication_total": medications.scalar_subquery(),
+            "medication_active": medications.where(Medication.active_on(today)).scalar_subquery(),
+        }
+
+    if section == "appointments":
+        upcoming = and_(Appointment.user_id == user_id, Appointment.date >= today)
+        first = select().where(upcoming).order_by(Appointment.date, Appointment.time).limit(1)
+        return {
+            "appointment_upcoming": select(func.count(Appointment.id)).where(upcoming).scalar_subquery(),
+            "appointment_days_next_week": (
+                select(func.count(Appointment.date.distinct()))
+                .where(upcoming, Appointment.date <= today + timedelta(days=7))
+                .scalar_subquery()
+            ),
+            "next_appointment_date": first.add_columns(Appointment.date).scalar_subquery(),
+            "next_appointment_time": first.add_columns(Appointment.time).scalar_subquery(),
+        }
+
+    # Pending submissions may still be rejected by moderation, so only published ones count
+    posts = and_(ForumPost.user_id == user_id, ForumPost.status == 'published')
+    replies = and_(ForumReply.user_id == user_id, ForumReply.status == 'published')
+    return {
+        "post_count": select(func.count(ForumPost.id)).where(posts).scalar_subquery(),
+        "reply_count": select(func.count(ForumReply.id)).where(replies).scalar_subquery(),
+        "last_post_at": select(func.max(ForumPost.created_at)).where(posts).scalar_subquery(),
+        "last_reply_at": select(func.max(ForumReply.created_at)).where(replies).scalar_subquery(),
+    }
+
+
+def refresh_summary(user_id, *sections):
+    """Recompute sections (default: all) of one user's summary in the caller's transaction.
+
+    The new values are aggregated over that user's rows only, inside a
+    single upsert. A missing row is created in full, and a row from an
+    earlier day also gets its day-dependent sections recomputed.
+    """
+    today = date.today()
+    as_of = db.session.execute(select(UserSummary.as_of).where(UserSummary.user_id == user_id)).first()
+    wanted = set(sections or SECTIONS)
+    if as_of is None:
+        wanted = set(SECTIONS)
+    elif as_of[0] != today:
+        wanted |= DAILY_SECTIONS
+
+    values = {}
+    for section in SECTIONS:
+        if section in wanted:
+            values.update(_section_columns(section, user_id, today))
+    if DAILY_SECTIONS <= wanted:
+        values["as_of"] = today
+
+    stmt = sqlite_insert(UserSummary).values(user_id=user_id, **values)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["user_id"],
+        set_={name: stmt.excluded[name] for name in values},
+    )
+    db.session.execute(stmt)
+
+
+def get_summary(user_id):
+    """The user's summary row, refreshed first if it is missing or from an earlier day (commits then)."""
+    summary = db.session.get(UserSummary, user_id)
+    if summary is None or summary.as_of != date.today():
+        refresh_summary(user_id)
+        db.session.commit()
+        summary = db.session.get(UserSummary, user_id, populate_existing=True)
+    return summary
+
+
+def rebuild_user_summaries(conn):
+    """Recompute every user's summary from the source tables."""
+    today = date.today()
+    columns = {"as_of": literal(today, Date)}
+    for section in SECTIONS:
+        columns.update(_section_columns(section, User.id, today))
+    conn.execute(UserSummary.__table__.delete())
+    conn.execute(
+        insert(UserSummary).from_select(["user_id", *columns], select(User.id, *columns.values()))
+    )
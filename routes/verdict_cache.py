@@ -0,0 +1,179 @@
+# routes/verdict_cache.py
+import hashlib
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from flask import has_app_context
+from sqlalchemy import event
+
+from extensions import db
+from models.moderation_verdict import ModerationVerdict
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text):
+    """Fold case, Unicode compatibility forms and whitespace so trivial variants share a key."""
+    folded = unicodedata.normalize("NFKC", text or "").casefold()
+    return _WHITESPACE.sub(" ", folded).strip()
+
+
+def verdict_key(text, backend, prompt_version):
+    payload = f"{backend}\x00{prompt_version}\x00{normalize_text(text)}"
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class VerdictCache:
+    """Two-tier cache of moderation verdicts.
+
+    An in-process LRU answers repeats without touching the database; misses
+    fall through to the ``moderation_verdicts`` table, which survives restarts
+    and is shared by every worker. Entries expire after
+    ``MODERATION_VERDICT_TTL`` seconds and the table is trimmed to
+    ``MODERATION_VERDICT_MAX_ROWS`` oldest-first.
+    """
+
+    PRUNE_EVERY = 100  # stores between table trims
+
+    def __init__(self):
+        self.ttl = timedelta(days=7)
+        self.memory_size = 1024
+        self.max_rows = 100_000
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._stores = 0
+        self.hits = 0
+        self.misses = 0
+
+    def init_app(self, app):
+        app.config.setdefault("MODERATION_VERDICT_TTL", 7 * 24 * 3600)
+        app.config.setdefault("MODERATION_VERDICT_MEMORY_SIZE", 1024)
+        app.config.setdefault("MODERATION_VERDICT_MAX_ROWS", 100_000)
+        self.ttl = timedelta(seconds=app.config["MODERATION_VERDICT_TTL"])
+        self.memory_size = app.config["MODERATION_VERDICT_MEMORY_SIZE"]
+        self.max_rows = app.config["MODERATION_VERDICT_MAX_ROWS"]
+        self.clear_memory()
+
+    def get(self, text, backend, prompt_version):
+        """Return a cached ``(is_safe, detail, category)`` verdict or None."""
+        key = verdict_key(text, backend, prompt_version)
+        now = datetime.utcnow()
+
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                verdict, expires_at = entry
+                if expires_at > now:
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    return verdict
+                del self._memory[key]
+
+        row = db.session.get(ModerationVerdict, key) if has_app_context() else None
+        if row is None or row.created_at + self.ttl <= now:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        verdict = (row.is_safe, row.reason, row.category)
+        self._remember(key, verdict, row.created_at + self.ttl)
+        with self._lock:
+            self.hits += 1
+        return verdict
+
+    def store(self, text, backend, prompt_version, verdict):
+        """Cache a verdict. The database row is written with the caller's transaction.
+
+        The in-process tier is only filled once that transaction commits, so
+        a rollback cannot leave a verdict in memory with no row behind it.
+        """
+        key = verdict_key(text, backend, prompt_version)
+        now = datetime.utcnow()
+        if not has_app_context():
+            self._remember(key, verdict, now + self.ttl)
+            return
+
+        is_safe, detail, category = verdict
+        db.session.merge(ModerationVerdict(
+            key=key,
+            backend=backend,
+            prompt_version=prompt_version,
+            is_safe=bool(is_safe),
+            reason=detail,
+            category=category,
+            created_at=now,
+        ))
+        db.session.info.setdefault("pending_verdicts", []).append((key, verdict, now + self.ttl))
+        with self._lock:
+            self._stores += 1
+            due = self._stores % self.PRUNE_EVERY == 0
+        if due:
+            self.prune()
+
+    def prune(self):
+        """Delete expired rows, then the oldest rows beyond ``max_rows``."""
+        cutoff = datetime.utcnow() - self.ttl
+        ModerationVerdict.query.filter(ModerationVerdict.created_at <= cutoff).delete(
+            synchronize_session=False
+        )
+        excess = ModerationVerdict.query.count() - self.max_rows
+        if excess > 0:
+            oldest = (
+                db.select(ModerationVerdict.key)
+                .order_by(ModerationVerdict.created_at.asc())
+                .limit(excess)
+            )
+            ModerationVerdict.query.filter(ModerationVerdict.key.in_(oldest)).delete(
+                synchronize_session=False
+            )
+
+    def purge(self, current_versions=None):
+        """Drop cached verdicts made with other prompt versions (all of them if None).
+
+        ``current_versions`` maps backend name to its current prompt version.
+        Returns the number of rows deleted; the caller commits.
+        """
+        query = ModerationVerdict.query
+        if current_versions is not None:
+            stale = [
+                db.and_(ModerationVerdict.backend == backend, ModerationVerdict.prompt_version != version)
+                for backend, version in current_versions.items()
+            ]
+            stale.append(ModerationVerdict.backend.notin_(list(current_versions)))
+            query = query.filter(db.or_(*stale))
+        deleted = query.delete(synchronize_session=False)
+        self.clear_memory()
+        return deleted
+
+    def clear_memory(self):
+        with self._lock:
+            self._memory.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def _remember(self, key, verdict, expires_at):
+        if self.memory_size <= 0:
+            return
+        with self._lock:
+            self._memory[key] = (verdict, expires_at)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_size:
+                self._memory.popitem(last=False)
+
+
+verdict_cache = VerdictCache()
+
+
+@event.listens_for(db.session, "after_commit")
+def _remember_committed(session):
+    for key, verdict, expires_at in session.info.pop("pending_verdicts", ()):
+        verdict_cache._remember(key, verdict, expires_at)
+
+
+@event.listens_for(db.session, "after_soft_rollback")
+def _forget_rolled_back(session, previous_transaction):
+    if not session.in_transaction():
+        session.info.pop("pending_verdicts", None)
@@ -0,0 +1,35 @@
+import unittest
+from benchmarks.moderation_bench import percentile, run_benchmark
+from benchmarks.stub_servers import LatencyProfile
+
+
+class BenchmarkHarnessTestCase(unittest.TestCase):
+    def test_percentile_uses_nearest_rank(self):
+        samples = list(range(1, 101))
+        self.assertEqual(percentile(samples, 0.50), 51)
+        self.assertEqual(percentile(samples, 0.99), 100)
+        self.assertIsNone(percentile([], 0.95))
+
+    def test_smoke_run_against_stubs(self):
+        results = run_benchmark(
+            targets=("moderation", "forum"),
+            concurrency=(2,),
+            requests=6,
+            gemini=LatencyProfile(median_ms=1, error_rate=0.0, seed=1),
+            professor=LatencyProfile(median_ms=1, error_rate=0.0, seed=2),
+            unsafe_rate=0.5,
+            overrides={"TESTING": True},
+        )
+
+        moderation, forum = results["scenarios"]
+        self.assertEqual(moderation["requests"], 6)
+        self.assertEqual(sum(moderation["outcomes"].values()), 6)
+        self.assertNotIn("fallback", moderation["outcomes"])
+        self.assertEqual(moderation["backend_calls"]["gemini"]["requests"], 6)
+        self.assertEqual(forum["outcomes"], {"http_302": 6})
+        # Blocked posts are removed and logged, so every POST ends up in one of the two
+        self.assertEqual(forum["forum"]["posts"].get("published", 0) + forum["forum"]["flagged"], 6)
+
+
+if __name__ == "__main__":
+    unittest.main()
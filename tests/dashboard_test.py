@@ -0,0 +1,299 @@
+import os
+import time as time_module
+import unittest
+from datetime import date, datetime, time, timedelta
+from unittest.mock import patch
+
+from app import create_app
+from extensions import db, bcrypt
+from models.activity_daily_count import ActivityDailyCount
+from models.appointment import Appointment
+from models.forum import ForumPost, ForumReply
+from models.medical_history import MedicalHistory
+from models.medication import Medication
+from models.profile import Profile
+from models.user import User
+from models.user_summary import UserSummary
+from routes.activity_rollup import activity_series, rebuild_activity_rollup, utc_today
+from routes.user_summary import get_summary, rebuild_user_summaries
+
+
+class DashboardTestBase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app({
+            "TESTING": True,
+            "SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:",
+            "WTF_CSRF_ENABLED": False,
+        })
+        self.client = self.app.test_client()
+
+        with self.app.app_context():
+            db.create_all()
+            password_hash = bcrypt.generate_password_hash("password123").decode("utf-8")
+            user = User(username="summary", email="summary@example.com", password=password_hash)
+            other = User(username="neighbour", email="neighbour@example.com", password=password_hash)
+            db.session.add_all([user, other])
+            db.session.commit()
+            self.user_id, self.other_id = user.id, other.id
+
+            profile = Profile(user_id=user.id, full_name="Summary User")
+            db.session.add(profile)
+            db.session.flush()
+            history = MedicalHistory(profile_id=profile.id, disease="Anxiety")
+            db.session.add(history)
+            db.session.commit()
+            self.history_id = history.id
+
+        self.client.post(
+            "/login",
+            data={"email": "summary@example.com", "password": "password123"},
+            follow_redirects=True,
+        )
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def summary(self):
+        with self.app.app_context():
+            summary = db.session.get(UserSummary, self.user_id)
+            return {
+                column.name: getattr(summary, column.name)
+                for column in UserSummary.__table__.columns
+            } if summary else None
+
+
+class DashboardSummaryTestCase(DashboardTestBase):
+    def test_write_paths_keep_summary_current(self):
+        today = date.today()
+        self.client.post("/medications/add", data={
+            "medical_history_id": self.history_id,
+            "name": "Sertraline",
+            "start_date": (today - timedelta(days=3)).isoformat(),
+        })
+        self.client.post("/medications/add", data={
+            "medical_history_id": self.history_id,
+            "name": "Old prescription",
+            "start_date": (today - timedelta(days=30)).isoformat(),
+            "end_date": (today - timedelta(days=10)).isoformat(),
+        })
+        for days, at in ((2, "09:00"), (2, "08:00"), (20, "10:00")):
+            self.client.post("/appointments/new", data={
+                "title": "Session",
+                "date": (today + timedelta(days=days)).isoformat(),
+                "time": at,
+            })
+        with patch("routes.forum.is_safe_content_ai", return_value=(True, "ok")):
+            self.client.post("/forum/new", data={"title": "Hello", "content": "First post here"})
+            with self.app.app_context():
+                post_id = ForumPost.query.first().id
+            self.client.post(f"/forum/{post_id}/reply", data={"content": "And a reply"})
+
+        summary = self.summary()
+        self.assertEqual(summary["as_of"], today)
+        self.assertEqual((summary["medication_total"], summary["medication_active"]), (2, 1))
+        self.assertEqual(summary["appointment_upcoming"], 3)
+        self.assertEqual(summary["appointment_days_next_week"], 1)
+        self.assertEqual(summary["next_appointment_date"], today + timedelta(days=2))
+        self.assertEqual(summary["next_appointment_time"], time(8, 0))
+        self.assertEqual((summary["post_count"], summary["reply_count"]), (1, 1))
+        self.assertIsNotNone(summary["last_reply_at"])
+
+        with self.app.app_context():
+            med_id = Medication.query.filter_by(name="Sertraline").first().id
+        self.client.post(f"/medications/{med_id}/delete")
+        self.client.post(f"/forum/delete/{post_id}")
+        summary = self.summary()
+        self.assertEqual((summary["medication_total"], summary["medication_active"]), (1, 0))
+        self.assertEqual((summary["post_count"], summary["reply_count"]), (0, 0))
+
+    def test_deleting_a_thread_updates_other_repliers(self):
+        with self.app.app_context():
+            post = ForumPost(title="Mine", content="Body", user_id=self.user_id)
+            db.session.add(post)
+            db.session.flush()
+            db.session.add(ForumReply(post_id=post.id, user_id=self.other_id, content="Reply"))
+            db.session.commit()
+            post_id = post.id
+            rebuild_user_summaries(db.session.connection())
+            db.session.commit()
+            self.assertEqual(db.session.get(UserSummary, self.other_id).reply_count, 1)
+
+        self.client.post(f"/forum/delete/{post_id}")
+        with self.app.app_context():
+            self.assertEqual(db.session.get(UserSummary, self.other_id).reply_count, 0)
+
+    def test_pending_forum_items_are_not_counted(self):
+        with self.app.app_context():
+            post = ForumPost(title="Waiting", content="Body", user_id=self.user_id, status="pending")
+            db.session.add(post)
+            db.session.flush()
+            db.session.add(ForumReply(post_id=post.id, user_id=self.user_id, content="Reply", status="pending"))
+            db.session.commit()
+            rebuild_user_summaries(db.session.connection())
+            db.session.commit()
+        summary = self.summary()
+        self.assertEqual((summary["post_count"], summary["reply_count"]), (0, 0))
+        self.assertIsNone(summary["last_post_at"])
+
+    def test_stale_summary_is_refreshed_on_read(self):
+        with self.app.app_context():
+            db.session.add(Appointment(
+                user_id=self.user_id, title="Soon", date=date.today() + timedelta(days=1), time=time(9, 0),
+            ))
+            db.session.commit()
+            rebuild_user_summaries(db.session.connection())
+            db.session.commit()
+            summary = db.session.get(UserSummary, self.user_id)
+            summary.as_of = date.today() - timedelta(days=1)
+            summary.appointment_upcoming = 0
+            db.session.commit()
+
+            with self.app.test_request_context():
+                self.assertEqual(get_summary(self.user_id).appointment_upcoming, 1)
+        self.assertEqual(self.summary()["as_of"], date.today())
+
+    def test_rebuild_matches_incremental_values(self):
+        self.client.post("/appointments/new", data={
+            "title": "Checkup",
+            "date": (date.today() + timedelta(days=4)).isoformat(),
+            "time": "11:15",
+        })
+        incremental = self.summary()
+        with self.app.app_context():
+            rebuild_user_summaries(db.session.connection())
+            db.session.commit()
+        self.assertEqual(self.summary(), incremental)
+
+    def test_dashboard_renders_from_summary(self):
+        self.client.post("/appointments/new", data={
+            "title": "Therapy Session",
+            "date": (datetime.now() + timedelta(days=1)).strftime("%Y-%m-%d"),
+            "time": "10:30",
+        })
+        response = self.client.get("/dashboard/home")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b"Therapy Session", response.data)
+        self.assertIn(b"1 in the next 7 days", response.data)
+
+    def test_recent_activity_skips_pending_forum_items(self):
+        with self.app.app_context():
+            post = ForumPost(title="Visible thread", content="Body", user_id=self.user_id)
+            db.session.add(post)
+            db.session.flush()
+            db.session.add_all([
+                ForumPost(title="Awaiting review", content="Body", user_id=self.user_id, status="pending"),
+                ForumReply(post_id=post.id, user_id=self.user_id, content="Reply", status="pending"),
+            ])
+            db.session.commit()
+            rebuild_user_summaries(db.session.connection())
+            db.session.commit()
+        response = self.client.get("/dashboard/home")
+        self.assertIn(b"Visible thread", response.data)
+        self.assertNotIn(b"Awaiting review", response.data)
+        self.assertNotIn(b"Reply on Visible thread", response.data)
+
+    def test_rebuild_command(self):
+        runner = self.app.test_cli_runner()
+        result = runner.invoke(args=["dashboard", "rebuild-summaries"])
+        self.assertIn("Dashboard summaries rebuilt.", result.output)
+        self.assertEqual(self.summary()["medication_total"], 0)
+
+
+class ActivityChartTestCase(DashboardTestBase):
+    def rollup(self):
+        with self.app.app_context():
+            return sorted(
+                (row.user_id, row.day, row.posts, row.replies, row.appointments, row.medication_delta)
+                for row in ActivityDailyCount.query
+                if any((row.posts, row.replies, row.appointments, row.medication_delta))
+            )
+
+    def series(self, days=7):
+        with self.app.app_context():
+            return activity_series(self.user_id, days)
+
+    def test_medication_spans_become_a_running_count(self):
+        today = utc_today()
+        self.client.post("/medications/add", data={
+            "medical_history_id": self.history_id,
+            "name": "Short course",
+            "start_date": (today - timedelta(days=3)).isoformat(),
+            "end_date": (today - timedelta(days=1)).isoformat(),
+        })
+        self.client.post("/medications/add", data={
+            "medical_history_id": self.history_id,
+            "name": "Ongoing",
+            "start_date": (today - timedelta(days=60)).isoformat(),
+        })
+        self.assertEqual(self.series()["medications"], [1, 1, 1, 2, 2, 2, 1])
+
+        with self.app.app_context():
+            med_id = Medication.query.filter_by(name="Short course").first().id
+        self.client.post(f"/medications/{med_id}/update", data={
+            "name": "Short course",
+            "start_date": (today - timedelta(days=1)).isoformat(),
+            "end_date": today.isoformat(),
+        })
+        self.assertEqual(self.series()["medications"], [1, 1, 1, 1, 1, 2, 2])
+
+    def test_forum_and_appointments_feed_the_series(self):
+        today = utc_today()
+        self.client.post("/appointments/new", data={"title": "Check-in", "date": today.isoformat(), "time": "23:59"})
+        with patch("routes.forum.is_safe_content_ai", return_value=(True, "ok")):
+            self.client.post("/forum/new", data={"title": "Hello", "content": "First post here"})
+            with self.app.app_context():
+                post_id = ForumPost.query.first().id
+            self.client.post(f"/forum/{post_id}/reply", data={"content": "And a reply"})
+
+        series = self.series()
+        self.assertEqual(series["days"][-1], today)
+        self.assertEqual((series["posts"][-1], series["replies"][-1], series["appointments"][-1]), (1, 1, 1))
+        self.assertEqual(series["active_days"][-1], 1)
+
+        self.client.post(f"/forum/delete/{post_id}")
+        self.assertEqual(self.series()["posts"][-1] + self.series()["replies"][-1], 0)
+
+    def test_forum_activity_lands_on_today_off_utc(self):
+        # Local time is a day apart from UTC in one of these for any hour of the day
+        for zone in ("Etc/GMT+12", "Etc/GMT-14"):
+            with self.subTest(zone=zone), patch.dict(os.environ, {"TZ": zone}):
+                time_module.tzset()
+                with patch("routes.forum.is_safe_content_ai", return_value=(True, "ok")):
+                    self.client.post("/forum/new", data={"title": zone, "content": "Posted off UTC"})
+                payload = self.client.get("/dashboard/activity?days=7").get_json()
+                self.assertEqual(payload["labels"][-1], utc_today().strftime("%a"))
+                self.assertGreaterEqual(payload["forum"][-1], 1)
+            time_module.tzset()
+
+    def test_rebuild_matches_incremental_rollup(self):
+        today = utc_today()
+        self.client.post("/medications/add", data={
+            "medical_history_id": self.history_id,
+            "name": "Course",
+            "start_date": (today - timedelta(days=5)).isoformat(),
+            "end_date": (today + timedelta(days=5)).isoformat(),
+        })
+        self.client.post("/appointments/new", data={
+            "title": "Session", "date": (today - timedelta(days=2)).isoformat(), "time": "09:00",
+        })
+        incremental = self.rollup()
+        self.assertTrue(incremental)
+        with self.app.app_context():
+            rebuild_activity_rollup(db.session.connection())
+            db.session.commit()
+        self.assertEqual(self.rollup(), incremental)
+
+    def test_chart_api_ranges(self):
+        response = self.client.get("/dashboard/activity?days=30")
+        self.assertEqual(response.status_code, 200)
+        payload = response.get_json()
+        self.assertEqual(payload["days"], 30)
+        self.assertEqual(len(payload["labels"]), 30)
+        self.assertEqual(len(payload["medications"]), 30)
+        self.assertEqual(self.client.get("/dashboard/activity?days=12").status_code, 400)
+
+
+if __name__ == "__main__":
+    unittest.main()
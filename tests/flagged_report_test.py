@@ -0,0 +1,106 @@
+import unittest
+from datetime import date, timedelta
+from app import create_app
+from extensions import db, bcrypt
+from models.user import User
+from models.flagged_daily_count import FlaggedDailyCount
+from routes.flagged_report import rebuild_flagged_rollup
+from routes.forum import log_flagged_content
+
+
+class FlaggedReportTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app({
+            "TESTING": True,
+            "SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:",
+            "WTF_CSRF_ENABLED": False,
+            "FLAGGED_REPORT_PAGE_SIZE": 2,
+            "MODERATOR_EMAILS": ["mod@example.com"],
+        })
+        self.client = self.app.test_client()
+
+        with self.app.app_context():
+            db.create_all()
+            password_hash = bcrypt.generate_password_hash("password123").decode("utf-8")
+            db.session.add(User(username="member", email="member@example.com", password=password_hash))
+            db.session.add(User(username="moderator", email="mod@example.com", password=password_hash))
+            db.session.commit()
+
+            log_flagged_content(1, "first threat", "Gemini: unsafe", "threat", "post")
+            log_flagged_content(1, "second threat", "Gemini: unsafe", "threat", "reply")
+            log_flagged_content(1, "bullying", "Gemini: unsafe", "abuse", "post")
+            log_flagged_content(1, "no category", None, None, "reply")
+            log_flagged_content(2, "moderator's own", "Gemini: unsafe", "threat", "post")
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def login(self, email):
+        return self.client.post(
+            "/login",
+            data={"email": email, "password": "password123"},
+            follow_redirects=True,
+        )
+
+    def rollup(self):
+        return {
+            (row.user_id, row.category, row.source_type): row.count
+            for row in FlaggedDailyCount.query.all()
+        }
+
+    def test_rollup_is_maintained_on_insert_and_matches_a_rebuild(self):
+        with self.app.app_context():
+            incremental = self.rollup()
+            self.assertEqual(incremental[(1, "threat", "post")], 1)
+            self.assertEqual(incremental[(1, "threat", "reply")], 1)
+            self.assertEqual(incremental[(1, "unspecified", "reply")], 1)
+            self.assertEqual(sum(incremental.values()), 5)
+
+            with db.engine.begin() as conn:
+                rebuild_flagged_rollup(conn)
+            db.session.expire_all()
+            self.assertEqual(self.rollup(), incremental)
+
+    def test_report_is_paginated_and_filtered(self):
+        self.login("member@example.com")
+
+        response = self.client.get("/dashboard/flagged-report")
+        page = response.get_data(as_text=True)
+        self.assertIn("4 total", page)
+        self.assertIn("no category", page)
+        self.assertIn("bullying", page)
+        self.assertNotIn("first threat", page)
+        self.assertNotIn("moderator&#39;s own", page)
+
+        cursor = page.split("cursor=")[1].split('"')[0]
+        older = self.client.get(f"/dashboard/flagged-report?cursor={cursor}").get_data(as_text=True)
+        self.assertIn("first threat", older)
+        self.assertIn("second threat", older)
+        self.assertNotIn("bullying", older)
+
+        filtered = self.client.get("/dashboard/flagged-report?category=threat&source_type=reply")
+        text = filtered.get_data(as_text=True)
+        self.assertIn("second threat", text)
+        self.assertNotIn("first threat", text)
+
+        tomorrow = (date.today() + timedelta(days=1)).isoformat()
+        empty = self.client.get(f"/dashboard/flagged-report?start={tomorrow}")
+        self.assertIn("No flagged content found.", empty.get_data(as_text=True))
+
+    def test_moderation_overview_requires_a_moderator(self):
+        self.login("member@example.com")
+        self.assertEqual(self.client.get("/dashboard/moderation/flagged").status_code, 403)
+        self.client.get("/logout")
+
+        self.login("mod@example.com")
+        response = self.client.get("/dashboard/moderation/flagged?category=threat")
+        self.assertEqual(response.status_code, 200)
+        text = response.get_data(as_text=True)
+        self.assertIn("<h3 class=\"fw-bold\">3</h3>", text)
+        self.assertIn("member", text)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,9 +1,19 @@
+import os
+import sqlite3
+import tempfile
 import unittest
+from datetime import datetime, timedelta
+from types import SimpleNamespace
 from unittest.mock import patch
+from sqlalchemy import text
 from app import create_app
 from extensions import db, bcrypt
 from models.user import User
 from models.forum import ForumPost, ForumReply
+from routes.forum import _publish, _reject, load_forum_page
+from routes.forum_search import SEARCH_TABLE, index_post, index_reply
+from routes.fragment_cache import fragment_cache
+from routes.pagination import LEGACY_TIMESTAMP
 
 
 class ForumTestCase(unittest.TestCase):
@@ -114,6 +124,282 @@ class ForumTestCase(unittest.TestCase):
         with self.app.app_context():
             self.assertEqual(ForumReply.query.count(), 0)
 
+    def create_posts(self, count):
+        with self.app.app_context():
+            user = User.query.filter_by(email="forum@example.com").first()
+            base = datetime(2024, 1, 1)
+            for i in range(count):
+                db.session.add(ForumPost(
+                    user_id=user.id,
+                    title=f"Post {i}",
+                    content=f"Body {i}",
+                    created_at=base + timedelta(minutes=i),
+                ))
+            db.session.commit()
+
+    def test_forum_home_is_paginated(self):
+        self.app.config["FORUM_PAGE_SIZE"] = 2
+        self.create_posts(3)
+
+        response = self.client.get("/forum")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b"Post 2", response.data)
+        self.assertIn(b"Post 1", response.data)
+        self.assertNotIn(b"Post 0", response.data)
+        self.assertIn(b"load-more-posts", response.data)
+
+    def test_load_more_returns_next_slice(self):
+        self.app.config["FORUM_PAGE_SIZE"] = 2
+        self.create_posts(5)
+
+        first = self.client.get("/forum/more").get_json()
+        self.assertIn("Post 4", first["html"])
+        self.assertIsNotNone(first["next_cursor"])
+
+        second = self.client.get(f"/forum/more?cursor={first['next_cursor']}").get_json()
+        self.assertIn("Post 2", second["html"])
+        self.assertIn("Post 1", second["html"])
+        self.assertNotIn("Post 3", second["html"])
+
+        last = self.client.get(f"/forum/more?cursor={second['next_cursor']}").get_json()
+        self.assertIn("Post 0", last["html"])
+        self.assertIsNone(last["next_cursor"])
+
+    @patch("routes.forum.is_safe_content_ai", return_value=(True, "Clean"))
+    def test_search_finds_posts_and_replies(self, mock_moderation):
+        self.client.post(
+            "/forum/new",
+            data={"title": "Sleeping tips", "content": "Meditation helps me unwind."},
+            follow_redirects=True,
+        )
+        with self.app.app_context():
+            post_id = ForumPost.query.first().id
+        self.client.post(
+            f"/forum/{post_id}/reply",
+            data={"content": "Breathing exercises before bed work well."},
+            follow_redirects=True,
+        )
+
+        response = self.client.get("/forum/search?q=meditation")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b"<mark>Meditation</mark>", response.data)
+
+        response = self.client.get("/forum/search?q=breathing")
+        self.assertIn(b"<mark>Breathing</mark>", response.data)
+        self.assertIn(b"Sleeping tips", response.data)
+
+    @patch("routes.forum.is_safe_content_ai", return_value=(True, "Clean"))
+    def test_search_index_follows_edits_and_deletes(self, mock_moderation):
+        self.client.post(
+            "/forum/new",
+            data={"title": "Original", "content": "Journaling every morning"},
+            follow_redirects=True,
+        )
+        with self.app.app_context():
+            post_id = ForumPost.query.first().id
+
+        self.client.post(
+            f"/forum/edit/{post_id}",
+            data={"title": "Updated", "content": "Walking every evening"},
+            follow_redirects=True,
+        )
+        self.assertNotIn(b"<mark>", self.client.get("/forum/search?q=journaling").data)
+        self.assertIn(b"<mark>Walking</mark>", self.client.get("/forum/search?q=walking").data)
+
+        self.client.post(f"/forum/delete/{post_id}", follow_redirects=True)
+        self.assertNotIn(b"<mark>", self.client.get("/forum/search?q=walking").data)
+
+    @patch("routes.forum.is_safe_content_ai", return_value=(True, "Clean"))
+    def test_post_cards_are_cached_until_a_reply_changes_them(self, mock_moderation):
+        self.client.post(
+            "/forum/new",
+            data={"title": "Cached", "content": "Rendered once"},
+            follow_redirects=False,
+        )
+        with self.app.app_context():
+            post_id = ForumPost.query.first().id
+        fragment_cache.clear()
+
+        self.client.get("/forum")
+        self.client.get("/forum")
+        stats = self.client.get("/forum/cache-stats").get_json()
+        self.assertEqual(stats["misses"], 1)
+        self.assertEqual(stats["hits"], 1)
+
+        self.client.post(f"/forum/{post_id}/reply", data={"content": "Fresh reply"})
+        response = self.client.get("/forum")
+        self.assertIn(b"Fresh reply", response.data)
+        self.assertEqual(self.client.get("/forum/cache-stats").get_json()["misses"], 2)
+
+    @patch("routes.forum.is_safe_content_ai", return_value=(True, "Clean"))
+    def test_cached_cards_only_show_actions_to_the_author(self, mock_moderation):
+        self.client.post("/forum/new", data={"title": "Mine", "content": "Owned post"})
+        with self.app.app_context():
+            post_id = ForumPost.query.first().id
+            password_hash = bcrypt.generate_password_hash("password123").decode("utf-8")
+            db.session.add(User(username="other", email="other@example.com", password=password_hash))
+            db.session.commit()
+
+        edit_link = f"/forum/edit/{post_id}".encode()
+        self.assertIn(edit_link, self.client.get("/forum").data)
+
+        self.client.get("/logout")
+        self.client.post("/login", data={"email": "other@example.com", "password": "password123"})
+        response = self.client.get("/forum")
+        self.assertIn(b"Owned post", response.data)
+        self.assertNotIn(edit_link, response.data)
+        self.assertGreaterEqual(fragment_cache.stats()["hits"], 1)
+
+    @patch("routes.forum.is_safe_content_ai", return_value=(True, "Clean"))
+    def test_reply_count_and_activity_follow_replies(self, mock_moderation):
+        self.client.post("/forum/new", data={"title": "Counted", "content": "Tally replies"})
+        with self.app.app_context():
+            post_id = ForumPost.query.first().id
+
+        self.client.post(f"/forum/{post_id}/reply", data={"content": "First"})
+        self.client.post(f"/forum/{post_id}/reply", data={"content": "Second"})
+        with self.app.app_context():
+            post = db.session.get(ForumPost, post_id)
+            latest = ForumReply.query.order_by(ForumReply.id.desc()).first()
+            self.assertEqual(post.reply_count, 2)
+            self.assertEqual(post.last_activity_at, latest.created_at)
+            first_reply = ForumReply.query.order_by(ForumReply.id.asc()).first()
+            latest_id, first_created = latest.id, first_reply.created_at
+
+        self.client.post(f"/forum/delete-reply/{latest_id}")
+        with self.app.app_context():
+            post = db.session.get(ForumPost, post_id)
+            self.assertEqual(post.reply_count, 1)
+            self.assertEqual(post.last_activity_at, first_created)
+
+    def test_activity_sort_and_recount_command(self):
+        self.create_posts(2)
+        with self.app.app_context():
+            older = ForumPost.query.filter_by(title="Post 0").first()
+            db.session.add(ForumReply(
+                post_id=older.id,
+                user_id=older.user_id,
+                content="Bump",
+                created_at=datetime(2024, 2, 1),
+            ))
+            db.session.commit()
+
+        result = self.app.test_cli_runner().invoke(args=["forum", "recount"])
+        self.assertIsNone(result.exception)
+
+        with self.app.app_context():
+            older = ForumPost.query.filter_by(title="Post 0").first()
+            self.assertEqual(older.reply_count, 1)
+            self.assertEqual(older.last_activity_at, datetime(2024, 2, 1))
+
+        html = self.client.get("/forum?sort=activity").data
+        self.assertLess(html.index(b"Post 0"), html.index(b"Post 1"))
+        html = self.client.get("/forum").data
+        self.assertLess(html.index(b"Post 1"), html.index(b"Post 0"))
+
+    @patch("routes.forum.is_safe_content_ai", return_value=(True, "Clean"))
+    def test_thread_page_pages_replies_oldest_first(self, mock_moderation):
+        self.app.config["FORUM_REPLY_PAGE_SIZE"] = 2
+        self.client.post("/forum/new", data={"title": "Threaded", "content": "Read all replies"})
+        with self.app.app_context():
+            post_id = ForumPost.query.first().id
+        for index in range(3):
+            self.client.post(f"/forum/{post_id}/reply", data={"content": f"Reply number {index}"})
+
+        page = self.client.get(f"/forum/{post_id}").get_data(as_text=True)
+        self.assertIn("Read all replies", page)
+        self.assertLess(page.index("Reply number 0"), page.index("Reply number 1"))
+        self.assertNotIn("Reply number 2", page)
+        self.assertIn("/forum/edit-reply/", page)
+
+        cursor = page.split('data-next-cursor="')[1].split('"')[0]
+        more = self.client.get(f"/forum/{post_id}/replies?cursor={cursor}").get_json()
+        self.assertIn("Reply number 2", more["html"])
+        self.assertNotIn("Reply number 0", more["html"])
+        self.assertIsNone(more["next_cursor"])
+
+        response = self.client.post(
+            f"/forum/{post_id}/reply",
+            data={"content": "From the thread", "return_to": "thread"},
+        )
+        self.assertTrue(response.headers["Location"].endswith(f"/forum/{post_id}"))
+
+    def test_search_index_only_holds_published_items(self):
+        def indexed():
+            return db.session.execute(text(f"SELECT kind, post_id FROM {SEARCH_TABLE}")).all()
+
+        with self.app.app_context():
+            post = ForumPost(user_id=1, title="Pending", content="Not yet", status="pending")
+            db.session.add(post)
+            db.session.commit()
+            # An edit cleared while the post's own review is still pending
+            _publish(SimpleNamespace(kind="post", action="edit", target_id=post.id, title="Edited", content="Still not yet"))
+            db.session.commit()
+            self.assertEqual(indexed(), [])
+
+            # A row left behind by a pending item goes with it when the item is rejected
+            index_post(post)
+            reply = ForumReply(post_id=post.id, user_id=1, content="Pending reply", status="pending")
+            db.session.add(reply)
+            db.session.flush()
+            index_reply(reply)
+            db.session.commit()
+            _reject(SimpleNamespace(kind="reply", action="create", target_id=reply.id, user_id=1, text="Pending reply"), "Blocked", None)
+            _reject(SimpleNamespace(kind="post", action="create", target_id=post.id, user_id=1, text="Pending"), "Blocked", None)
+            self.assertEqual(indexed(), [])
+
+    def test_thread_page_hides_unpublished_posts(self):
+        with self.app.app_context():
+            post = ForumPost(user_id=1, title="Pending", content="Not yet", status="pending")
+            db.session.add(post)
+            db.session.commit()
+            post_id = post.id
+
+        self.assertEqual(self.client.get(f"/forum/{post_id}").status_code, 404)
+        self.assertEqual(self.client.get(f"/forum/{post_id}/replies").status_code, 404)
+
+
+class LegacyTimestampTestCase(unittest.TestCase):
+    def setUp(self):
+        handle, self.db_path = tempfile.mkstemp(suffix=".db")
+        os.close(handle)
+        # A forum_posts table from before created_at was NOT NULL and last_activity_at existed
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute(
+                "CREATE TABLE forum_posts (id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL, "
+                "title VARCHAR(200) NOT NULL, content TEXT NOT NULL, created_at DATETIME)"
+            )
+            conn.executemany(
+                "INSERT INTO forum_posts (user_id, title, content, created_at) VALUES (1, ?, 'Body', ?)",
+                [("Dated", "2024-01-01 00:00:00.000000"), ("Undated A", None), ("Undated B", None)],
+            )
+        self.app = create_app({
+            "TESTING": True,
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{self.db_path}",
+            "FORUM_PAGE_SIZE": 1,
+        })
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.engine.dispose()
+        os.remove(self.db_path)
+
+    def test_rows_without_timestamps_are_backfilled_and_paged(self):
+        with self.app.app_context():
+            undated = ForumPost.query.filter(ForumPost.title.like("Undated%")).all()
+            self.assertEqual({post.created_at for post in undated}, {LEGACY_TIMESTAMP})
+            self.assertEqual({post.last_activity_at for post in undated}, {LEGACY_TIMESTAMP})
+
+            for sort in ("recent", "activity"):
+                titles, cursor = [], None
+                while True:
+                    posts, cursor = load_forum_page(cursor, sort)
+                    titles += [post.title for post in posts]
+                    if cursor is None:
+                        break
+                self.assertEqual(titles, ["Dated", "Undated B", "Undated A"])
+
 
 if __name__ == "__main__":
     unittest.main()
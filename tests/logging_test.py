@@ -0,0 +1,59 @@
+import io
+import json
+import logging
+import unittest
+from app import create_app
+import logging_setup
+from logging_setup import DebugSampler, JsonFormatter
+
+
+class LoggingSetupTestCase(unittest.TestCase):
+    def make_record(self, msg, level=logging.INFO, **extra):
+        record = logging.makeLogRecord({"name": "routes.test", "levelno": level,
+                                        "levelname": logging.getLevelName(level), "msg": msg})
+        record.__dict__.update(extra)
+        return record
+
+    def test_json_records_carry_extra_fields_and_truncate_payloads(self):
+        formatter = JsonFormatter(max_length=20)
+        line = formatter.format(self.make_record("short", backend="gemini", payload={"text": "x" * 100}))
+        entry = json.loads(line)
+
+        self.assertEqual(entry["msg"], "short")
+        self.assertEqual(entry["logger"], "routes.test")
+        self.assertEqual(entry["backend"], "gemini")
+        self.assertTrue(entry["payload"].endswith("chars)"))
+        self.assertLess(len(entry["payload"]), 50)
+
+    def test_debug_records_are_sampled(self):
+        sampler = DebugSampler(0.25)
+        debug = [sampler.filter(self.make_record("d", logging.DEBUG)) for _ in range(8)]
+        self.assertEqual(debug.count(True), 2)
+        self.assertTrue(sampler.filter(self.make_record("w", logging.WARNING)))
+
+    def test_create_app_logs_through_the_queue_listener(self):
+        create_app({
+            "TESTING": True,
+            "SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:",
+            "LOG_LEVELS": {"routes.noisy": "ERROR"},
+        })
+        stream = io.StringIO()
+        logging_setup._listener.handlers[0].setStream(stream)
+
+        logging.getLogger("routes.quiet").warning("kept %s", 1, extra={"job_id": 7})
+        logging.getLogger("routes.noisy").warning("dropped")
+        try:
+            raise RuntimeError("boom")
+        except RuntimeError:
+            logging.getLogger("routes.quiet").exception("failed")
+        logging_setup._listener.stop()
+        logging_setup._listener.start()
+
+        lines = [json.loads(line) for line in stream.getvalue().splitlines()]
+        self.assertEqual([line["msg"] for line in lines], ["kept 1", "failed"])
+        self.assertEqual(lines[0]["job_id"], 7)
+        self.assertIn("RuntimeError: boom", lines[1]["exc"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,146 @@
+import io
+import json
+import unittest
+from datetime import date, time
+
+from app import create_app
+from extensions import db, bcrypt
+from models.medical_history import MedicalHistory
+from models.medication import Medication
+from models.profile import Profile
+from models.user import User
+from models.user_summary import UserSummary
+
+CSV_UPLOAD = (
+    "name,dosage,frequency,start_date,end_date,reminder_time,notes\n"
+    "Sertraline,50mg,Once daily,2024-01-01,,08:00,With breakfast\n"
+    "Melatonin,3mg,,2024-02-01,2024-03-01,21:30,\n"
+)
+
+
+class MedicationImportExportTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app({
+            "TESTING": True,
+            "SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:",
+            "WTF_CSRF_ENABLED": False,
+            "MEDICATION_EXPORT_BATCH_SIZE": 2,
+        })
+        self.client = self.app.test_client()
+
+        with self.app.app_context():
+            db.create_all()
+            password_hash = bcrypt.generate_password_hash("password123").decode("utf-8")
+            user = User(username="importer", email="importer@example.com", password=password_hash)
+            other = User(username="other", email="other@example.com", password=password_hash)
+            db.session.add_all([user, other])
+            db.session.commit()
+            self.user_id = user.id
+
+            profiles = [Profile(user_id=user.id, full_name="Importer"), Profile(user_id=other.id, full_name="Other")]
+            db.session.add_all(profiles)
+            db.session.flush()
+            history = MedicalHistory(profile_id=profiles[0].id, disease="Depression")
+            foreign = MedicalHistory(profile_id=profiles[1].id, disease="Not yours")
+            db.session.add_all([history, foreign])
+            db.session.commit()
+            self.history_id, self.foreign_id = history.id, foreign.id
+
+        self.client.post(
+            "/login",
+            data={"email": "importer@example.com", "password": "password123"},
+            follow_redirects=True,
+        )
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def upload(self, content, filename, history_id=None):
+        return self.client.post(
+            "/medications/import",
+            data={
+                "medical_history_id": history_id or self.history_id,
+                "file": (io.BytesIO(content.encode("utf-8")), filename),
+            },
+            headers={"Accept": "application/json"},
+            content_type="multipart/form-data",
+        )
+
+    def test_csv_import_inserts_typed_rows(self):
+        response = self.upload(CSV_UPLOAD, "meds.csv")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()["imported"], 2)
+
+        with self.app.app_context():
+            meds = Medication.query.order_by(Medication.id).all()
+            self.assertEqual([med.name for med in meds], ["Sertraline", "Melatonin"])
+            self.assertEqual(meds[0].start_date, date(2024, 1, 1))
+            self.assertIsNone(meds[0].end_date)
+            self.assertEqual(meds[1].reminder_time, time(21, 30))
+            self.assertIsNone(meds[1].frequency)
+            self.assertEqual(db.session.get(UserSummary, self.user_id).medication_total, 2)
+
+    def test_invalid_rows_reject_the_whole_file(self):
+        rows = [
+            {"name": "Fine", "start_date": "2024-01-01"},
+            {"name": "", "start_date": "01/02/2024"},
+            {"name": "Backwards", "start_date": "2024-05-01", "end_date": "2024-04-01"},
+            {"name": "Late", "reminder_time": "25:00"},
+        ]
+        response = self.upload(json.dumps(rows), "meds.json")
+        self.assertEqual(response.status_code, 422)
+        payload = response.get_json()
+        self.assertEqual(payload["imported"], 0)
+        self.assertEqual([error["row"] for error in payload["errors"]], [2, 3, 4])
+        self.assertIn("name is required", payload["errors"][0]["error"])
+        self.assertIn("start_date must be YYYY-MM-DD", payload["errors"][0]["error"])
+        self.assertIn("end_date is before start_date", payload["errors"][1]["error"])
+        with self.app.app_context():
+            self.assertEqual(Medication.query.count(), 0)
+
+    def test_rejects_other_users_history_and_bad_files(self):
+        self.assertEqual(self.upload(CSV_UPLOAD, "meds.csv", self.foreign_id).status_code, 403)
+        self.assertEqual(self.upload("{}", "meds.json").status_code, 400)
+        self.assertEqual(self.upload(CSV_UPLOAD, "meds.txt").status_code, 400)
+        self.app.config["MEDICATION_IMPORT_MAX_ROWS"] = 1
+        self.assertEqual(self.upload(CSV_UPLOAD, "meds.csv").status_code, 400)
+        self.app.config["MEDICATION_IMPORT_MAX_BYTES"] = 64
+        self.assertEqual(self.upload(json.dumps([{"name": "Padding"}] * 10), "meds.json").status_code, 413)
+        with self.app.app_context():
+            self.assertEqual(Medication.query.count(), 0)
+
+    def test_form_import_flashes_and_redirects(self):
+        response = self.client.post(
+            "/medications/import",
+            data={"medical_history_id": self.history_id, "file": (io.BytesIO(CSV_UPLOAD.encode()), "meds.csv")},
+            content_type="multipart/form-data",
+            follow_redirects=True,
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b"Imported 2 medications.", response.data)
+
+    def test_exports_stream_and_round_trip(self):
+        self.upload(CSV_UPLOAD, "meds.csv")
+
+        response = self.client.get("/medications/export?format=csv")
+        self.assertTrue(response.is_streamed)
+        self.assertEqual(response.mimetype, "text/csv")
+        lines = response.get_data(as_text=True).splitlines()
+        self.assertEqual(lines[0], "record_id,condition,name,dosage,frequency,start_date,end_date,reminder_time,notes")
+        self.assertEqual(lines[1], f"{self.history_id},Depression,Sertraline,50mg,Once daily,2024-01-01,,08:00,With breakfast")
+        self.assertEqual(len(lines), 3)
+
+        exported = json.loads(self.client.get("/medications/export?format=json").get_data(as_text=True))
+        self.assertEqual([row["name"] for row in exported], ["Sertraline", "Melatonin"])
+        self.assertEqual(exported[1]["end_date"], "2024-03-01")
+
+        # An export is a valid import
+        response = self.upload(json.dumps(exported), "again.json")
+        self.assertEqual(response.get_json()["imported"], 2)
+        self.assertEqual(self.client.get("/medications/export?format=xml").status_code, 400)
+
+
+if __name__ == "__main__":
+    unittest.main()
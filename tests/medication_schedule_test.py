@@ -0,0 +1,160 @@
+import itertools
+import json
+import unittest
+from datetime import date, datetime, time, timedelta
+
+from app import create_app
+from extensions import db, bcrypt
+from models.medical_history import MedicalHistory
+from models.medication import Medication
+from models.profile import Profile
+from models.user import User
+from routes.medication_schedule import DoseRule, iter_doses, parse_frequency
+
+MONDAY = date(2024, 1, 1)
+
+
+def window(first_day, days):
+    start = datetime.combine(first_day, time.min)
+    return start, start + timedelta(days=days)
+
+
+class FrequencyParserTestCase(unittest.TestCase):
+    def test_common_phrasings(self):
+        cases = {
+            "Once daily": DoseRule(),
+            "": DoseRule(),
+            "2x per day": DoseRule(doses_per_day=2),
+            "Three times a day": DoseRule(doses_per_day=3),
+            "BID": DoseRule(doses_per_day=2),
+            "every 8 hours": DoseRule(doses_per_day=3, interval_minutes=480),
+            "q6h": DoseRule(doses_per_day=4, interval_minutes=360),
+            "every other day": DoseRule(every_days=2),
+            "every 3 days": DoseRule(every_days=3),
+            "twice weekly": DoseRule(per_week=2),
+            "Mon, Wed & Fri": DoseRule(weekdays=frozenset({0, 2, 4})),
+            "twice daily on weekends": DoseRule(doses_per_day=2, weekdays=frozenset({5, 6})),
+            "as needed for sleep": DoseRule(as_needed=True),
+            "1 tablet at bedtime": DoseRule(),
+        }
+        for text, rule in cases.items():
+            with self.subTest(text=text):
+                self.assertEqual(parse_frequency(text), rule)
+
+    def test_unrecognized_text(self):
+        for text in ("monthly", "with meals", "every 36 hours", "every 0 days"):
+            with self.subTest(text=text):
+                self.assertIsNone(parse_frequency(text))
+
+
+class DoseExpansionTestCase(unittest.TestCase):
+    def test_multiple_doses_are_spread_over_the_day(self):
+        doses = list(iter_doses(parse_frequency("3x per day"), MONDAY, None, time(8), *window(MONDAY, 1)))
+        self.assertEqual([at.time() for at in doses], [time(8), time(14), time(20)])
+
+    def test_interval_doses_spill_past_midnight(self):
+        rule = parse_frequency("every 8 hours")
+        doses = list(iter_doses(rule, MONDAY, None, time(20), *window(MONDAY + timedelta(days=1), 1)))
+        self.assertEqual(
+            [(at.day, at.time()) for at in doses],
+            [(2, time(4)), (2, time(12)), (2, time(20))],
+        )
+
+    def test_respects_start_end_and_step(self):
+        rule = parse_frequency("every other day")
+        doses = list(iter_doses(rule, MONDAY, MONDAY + timedelta(days=6), None, *window(MONDAY - timedelta(days=3), 14)))
+        self.assertEqual([at.date().day for at in doses], [1, 3, 5, 7])
+        self.assertEqual(doses[0].time(), time(8))
+
+        # Starting mid-course keeps the every-other-day phase from start_date
+        doses = list(iter_doses(rule, MONDAY, None, time(9), *window(MONDAY + timedelta(days=3), 4)))
+        self.assertEqual([at.date().day for at in doses], [5, 7])
+
+    def test_weekly_rules_follow_weekdays(self):
+        doses = iter_doses(parse_frequency("twice weekly"), MONDAY + timedelta(days=1), None, time(9), *window(MONDAY, 14))
+        self.assertEqual([at.strftime("%a") for at in doses], ["Tue", "Fri", "Tue", "Fri"])
+        self.assertEqual(list(iter_doses(parse_frequency("prn"), MONDAY, None, time(9), *window(MONDAY, 7))), [])
+
+    def test_expansion_is_lazy(self):
+        doses = iter_doses(parse_frequency("every hour"), MONDAY, None, time(0), *window(MONDAY, 365 * 100))
+        self.assertEqual(len(list(itertools.islice(doses, 5))), 5)
+
+
+class DoseCalendarTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app({
+            "TESTING": True,
+            "SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:",
+            "WTF_CSRF_ENABLED": False,
+        })
+        self.client = self.app.test_client()
+
+        with self.app.app_context():
+            db.create_all()
+            password_hash = bcrypt.generate_password_hash("password123").decode("utf-8")
+            user = User(username="calendar", email="calendar@example.com", password=password_hash)
+            db.session.add(user)
+            db.session.commit()
+            profile = Profile(user_id=user.id, full_name="Calendar User")
+            db.session.add(profile)
+            db.session.flush()
+            history = MedicalHistory(profile_id=profile.id, disease="Bipolar")
+            db.session.add(history)
+            db.session.flush()
+            db.session.add_all([
+                Medication(medical_history_id=history.id, name="Lithium", frequency="twice daily",
+                           start_date=MONDAY, reminder_time=time(8)),
+                Medication(medical_history_id=history.id, name="Vitamin D", frequency="weekly",
+                           start_date=MONDAY, reminder_time=time(12)),
+                Medication(medical_history_id=history.id, name="Spray", frequency="with meals",
+                           start_date=MONDAY),
+                Medication(medical_history_id=history.id, name="Finished", frequency="daily",
+                           start_date=MONDAY - timedelta(days=30), end_date=MONDAY - timedelta(days=10)),
+            ])
+            db.session.commit()
+
+        self.client.post(
+            "/login",
+            data={"email": "calendar@example.com", "password": "password123"},
+            follow_redirects=True,
+        )
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def test_calendar_merges_doses_in_time_order(self):
+        response = self.client.get("/medications/calendar?start=2024-01-01&end=2024-01-02")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_streamed)
+        payload = json.loads(response.get_data(as_text=True))
+
+        self.assertEqual((payload["start"], payload["end"]), ("2024-01-01", "2024-01-02"))
+        names = {med["id"]: med["name"] for med in payload["medications"]}
+        self.assertEqual(sorted(names.values()), ["Lithium", "Spray", "Vitamin D"])
+        spray = next(med for med in payload["medications"] if med["name"] == "Spray")
+        self.assertIsNone(spray["rule"])
+        self.assertEqual(
+            [(names[dose["medication_id"]], dose["at"]) for dose in payload["doses"]],
+            [
+                ("Lithium", "2024-01-01T08:00"),
+                ("Vitamin D", "2024-01-01T12:00"),
+                ("Lithium", "2024-01-01T20:00"),
+                ("Lithium", "2024-01-02T08:00"),
+                ("Lithium", "2024-01-02T20:00"),
+            ],
+        )
+
+    def test_a_year_of_doses(self):
+        payload = self.client.get("/medications/calendar?start=2024-01-01&end=2024-12-31").get_json()
+        self.assertEqual(len(payload["doses"]), 366 * 2 + 53)
+
+    def test_rejects_bad_ranges(self):
+        for query in ("start=2024-02-01&end=2024-01-01", "start=2024-01-01&end=2025-06-01", "start=01/01/2024"):
+            with self.subTest(query=query):
+                self.assertEqual(self.client.get(f"/medications/calendar?{query}").status_code, 400)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,743 @@
+import io
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import unittest
+from datetime import datetime, timedelta
+import requests
+from unittest.mock import patch
+from app import create_app
+from extensions import db, bcrypt
+from models.user import User
+from models.forum import ForumPost, ForumReply
+from models.flagged_log import FlaggedLog
+from models.moderation_job import ModerationJob
+from models.moderation_verdict import ModerationVerdict
+from routes import mod_gemini, mod_lexicon as lexicon_module, mod_professor
+from routes.flagged_writer import flagged_log_writer
+from routes.forum import discard_failed_job, log_flagged_content, process_moderation_job
+from routes.mod_batching import MicroBatcher
+from routes.mod_http import ModerationHTTPClient
+from routes.mod_lexicon import KeywordMatcher, lexicon
+from routes.mod_router import CircuitBreaker, ModerationRouter
+from routes.metrics import MODERATION_ERRORS, MODERATION_VERDICTS, MetricsRegistry
+from routes.mod_professor import professor_moderation
+from routes.moderation import is_safe_content_ai, prompt_versions, record_verdict
+from routes.moderation_queue import claim_next_job, fail_stale_jobs, moderation_workers, release_job
+from routes.verdict_cache import verdict_cache
+
+
+class ModerationQueueTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app({
+            "TESTING": True,
+            "SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:",
+            "WTF_CSRF_ENABLED": False,
+            "MODERATION_ASYNC": True,
+        })
+        self.client = self.app.test_client()
+
+        with self.app.app_context():
+            db.create_all()
+            password_hash = bcrypt.generate_password_hash("password123").decode("utf-8")
+            user = User(username="queueuser", email="queue@example.com", password=password_hash)
+            db.session.add(user)
+            db.session.commit()
+
+        self.login()
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def login(self):
+        return self.client.post(
+            "/login",
+            data={"email": "queue@example.com", "password": "password123"},
+            follow_redirects=True,
+        )
+
+    def drain(self):
+        with self.app.app_context():
+            while True:
+                job_id = claim_next_job()
+                if job_id is None:
+                    break
+                process_moderation_job(job_id)
+
+    @patch("routes.forum.is_safe_content_ai")
+    def test_post_is_pending_until_the_queue_publishes_it(self, mock_moderation):
+        response = self.client.post(
+            "/forum/new",
+            data={"title": "Queued", "content": "Waiting for review"},
+            follow_redirects=True,
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(mock_moderation.called)
+        self.assertIn(b"Awaiting review", response.data)
+
+        with self.app.app_context():
+            self.assertEqual(ForumPost.query.one().status, "pending")
+            self.assertEqual(ModerationJob.query.one().status, "queued")
+
+        mock_moderation.return_value = (True, "Clean", None)
+        self.drain()
+
+        response = self.client.get("/forum")
+        self.assertNotIn(b"Awaiting review", response.data)
+        self.assertIn(b"Waiting for review", response.data)
+        with self.app.app_context():
+            self.assertEqual(ForumPost.query.one().status, "published")
+            self.assertEqual(ModerationJob.query.one().outcome, "published")
+
+    @patch("routes.forum.is_safe_content_ai", return_value=(False, "Harmful", "violence"))
+    def test_flagged_reply_becomes_a_flagged_log(self, mock_moderation):
+        with self.app.app_context():
+            post = ForumPost(user_id=1, title="Topic", content="Published topic")
+            db.session.add(post)
+            db.session.commit()
+            post_id = post.id
+
+        self.client.post(f"/forum/{post_id}/reply", data={"content": "Something harmful"})
+        self.drain()
+
+        with self.app.app_context():
+            self.assertEqual(ForumReply.query.count(), 0)
+            self.assertEqual(db.session.get(ForumPost, post_id).reply_count, 0)
+            log = FlaggedLog.query.one()
+            self.assertEqual(log.category, "violence")
+            self.assertEqual(log.source_type, "reply")
+
+    @patch("routes.forum.is_safe_content_ai", return_value=(True, "Clean", None))
+    def test_replies_need_a_published_thread(self, mock_moderation):
+        self.assertEqual(self.client.post("/forum/999/reply", data={"content": "Hello?"}).status_code, 404)
+
+        with self.app.app_context():
+            post = ForumPost(user_id=1, title="Topic", content="Published topic")
+            db.session.add(post)
+            db.session.commit()
+            post_id = post.id
+        self.client.post(f"/forum/{post_id}/reply", data={"content": "Queued reply"})
+        with self.app.app_context():
+            # Bulk delete skips the ORM cascade, leaving the reply without a thread
+            ForumPost.query.filter_by(id=post_id).delete()
+            db.session.commit()
+        self.drain()
+
+        with self.app.app_context():
+            self.assertEqual(ForumReply.query.count(), 0)
+            self.assertEqual(ModerationJob.query.one().status, "done")
+        self.assertFalse(mock_moderation.called)
+
+    def test_jobs_out_of_attempts_are_failed_and_cleaned_up(self):
+        self.client.post("/forum/new", data={"title": "Stuck", "content": "Never reviewed"})
+        self.client.post("/forum/new", data={"title": "Crashed", "content": "Handler blew up"})
+        with self.app.app_context():
+            stuck, crashed = ModerationJob.query.order_by(ModerationJob.id).all()
+            # A worker died on the last attempt, long ago
+            stuck.status, stuck.attempts = "processing", 3
+            stuck.claimed_at = datetime.utcnow() - timedelta(hours=1)
+            crashed.status, crashed.attempts = "processing", 3
+            db.session.commit()
+            stuck_id, crashed_id = stuck.id, crashed.id
+
+            self.assertIsNone(claim_next_job())
+            self.assertEqual(fail_stale_jobs(), [stuck_id])
+            self.assertTrue(release_job(crashed_id))
+            for job_id in (stuck_id, crashed_id):
+                discard_failed_job(job_id)
+            self.assertEqual(ForumPost.query.count(), 0)
+            self.assertEqual(ModerationJob.query.filter_by(status="failed").count(), 2)
+
+        response = self.client.get("/forum")
+        self.assertNotIn(b"Awaiting review", response.data)
+        self.assertIn(b"Could not be reviewed", response.data)
+        self.assertIn(b"Never reviewed", response.data)
+
+    @patch("routes.forum.is_safe_content_ai", return_value=(False, "Harmful", "abuse"))
+    def test_blocked_edit_keeps_the_published_text(self, mock_moderation):
+        with self.app.app_context():
+            post = ForumPost(user_id=1, title="Original", content="Kind words")
+            db.session.add(post)
+            db.session.commit()
+            post_id = post.id
+
+        self.client.post(f"/forum/edit/{post_id}", data={"title": "Changed", "content": "Unkind words"})
+        self.drain()
+
+        with self.app.app_context():
+            post = db.session.get(ForumPost, post_id)
+            self.assertEqual(post.title, "Original")
+            self.assertEqual(post.status, "published")
+            self.assertEqual(FlaggedLog.query.count(), 1)
+
+
+class ModerationWorkerPoolTestCase(unittest.TestCase):
+    def setUp(self):
+        handle, self.db_path = tempfile.mkstemp(suffix=".db")
+        os.close(handle)
+        self.app = create_app({
+            "TESTING": True,
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{self.db_path}",
+            "MODERATION_ASYNC": True,
+            "MODERATION_POLL_INTERVAL": 0.1,
+        })
+        with self.app.app_context():
+            db.create_all()
+            db.session.add(User(username="worker", email="worker@example.com", password="x"))
+            db.session.commit()
+
+    def tearDown(self):
+        moderation_workers.stop()
+        with self.app.app_context():
+            db.session.remove()
+            db.engine.dispose()
+        os.remove(self.db_path)
+
+    @patch("routes.forum.is_safe_content_ai", return_value=(True, "Clean", None))
+    def test_workers_drain_the_queue(self, mock_moderation):
+        with self.app.app_context():
+            for i in range(3):
+                post = ForumPost(user_id=1, title=f"Post {i}", content="Body", status="pending")
+                db.session.add(post)
+                db.session.flush()
+                db.session.add(ModerationJob(
+                    kind="post", action="create", target_id=post.id, user_id=1,
+                    title=post.title, content=post.content,
+                ))
+            db.session.commit()
+
+        moderation_workers.start(self.app, process_moderation_job)
+        deadline = time.time() + 5
+        while time.time() < deadline:
+            with self.app.app_context():
+                if ForumPost.query.filter_by(status="published").count() == 3:
+                    break
+            time.sleep(0.05)
+
+        with self.app.app_context():
+            self.assertEqual(ForumPost.query.filter_by(status="published").count(), 3)
+            self.assertEqual(ModerationJob.query.filter_by(status="done").count(), 3)
+
+    def test_backend_call_does_not_hold_the_write_lock(self):
+        with self.app.app_context():
+            post = ForumPost(user_id=1, title="Slow", content="Body", status="pending")
+            db.session.add(post)
+            db.session.flush()
+            job = ModerationJob(
+                kind="post", action="create", target_id=post.id, user_id=1,
+                title=post.title, content=post.content,
+            )
+            db.session.add(job)
+            db.session.commit()
+            post_id, job_id = post.id, job.id
+
+        def slow_backend(text):
+            # A request saving something while moderation is still waiting on the backend
+            conn = sqlite3.connect(self.db_path, timeout=0.1)
+            try:
+                with conn:
+                    conn.execute(
+                        "INSERT INTO user (username, email, password) VALUES ('writer', 'writer@example.com', 'x')"
+                    )
+            finally:
+                conn.close()
+            time.sleep(0.05)
+            return True, "Clean", None
+
+        with patch("routes.forum.is_safe_content_ai", side_effect=slow_backend), self.app.app_context():
+            claim_next_job()
+            self.assertEqual(process_moderation_job(job_id), (True, "Clean"))
+            self.assertEqual(User.query.count(), 2)
+            self.assertEqual(db.session.get(ForumPost, post_id).status, "published")
+            self.assertEqual(db.session.get(ModerationJob, job_id).status, "done")
+
+    def test_create_app_starts_no_workers(self):
+        create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{self.db_path}", "MODERATION_ASYNC": True})
+        self.assertFalse(moderation_workers.running)
+
+    @patch("routes.forum.moderation_workers")
+    def test_work_command_runs_the_pool_in_the_foreground(self, mock_workers):
+        mock_workers.running = False
+        result = self.app.test_cli_runner().invoke(args=["forum", "work"])
+        self.assertIn("Moderation workers stopped.", result.output)
+        mock_workers.start.assert_called_once_with(self.app, process_moderation_job, discard_failed_job)
+        mock_workers.stop.assert_called_once_with()
+
+
+class FlaggedLogWriterTestCase(unittest.TestCase):
+    def setUp(self):
+        handle, self.db_path = tempfile.mkstemp(suffix=".db")
+        os.close(handle)
+        self.app = create_app({
+            "TESTING": True,
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{self.db_path}",
+            "FLAGGED_LOG_BUFFERED": True,
+            "FLAGGED_LOG_BATCH_SIZE": 3,
+            "FLAGGED_LOG_FLUSH_INTERVAL": 60,
+        })
+        with self.app.app_context():
+            db.create_all()
+            db.session.add(User(username="flagged", email="flagged@example.com", password="x"))
+            db.session.commit()
+
+    def tearDown(self):
+        flagged_log_writer.flush()
+        with self.app.app_context():
+            db.session.remove()
+            db.engine.dispose()
+        os.remove(self.db_path)
+
+    def test_entries_are_written_in_batches(self):
+        with self.app.app_context():
+            log_flagged_content(1, "first", "Gemini: unsafe", "threat", "post")
+            log_flagged_content(1, "second", None, "abuse", "reply")
+            self.assertEqual(FlaggedLog.query.count(), 0)
+            self.assertEqual(flagged_log_writer.pending(), 2)
+
+            # The third entry fills the batch and wakes the writer thread
+            log_flagged_content(1, "third", "Gemini: unsafe", "threat", "post")
+            deadline = time.time() + 5
+            while FlaggedLog.query.count() < 3 and time.time() < deadline:
+                db.session.remove()
+                time.sleep(0.02)
+            self.assertEqual(FlaggedLog.query.count(), 3)
+            self.assertEqual(
+                FlaggedLog.query.filter_by(text="second").one().reason,
+                "Content blocked by moderation.",
+            )
+
+    def test_a_bad_row_is_dropped_after_the_retries(self):
+        with self.app.app_context():
+            log_flagged_content(1, "good", "Gemini: unsafe", "threat", "post")
+            log_flagged_content(None, "orphan", "Gemini: unsafe", "threat", "post")
+        for _ in range(3):
+            self.assertEqual(flagged_log_writer.flush(), 0)
+            self.assertEqual(flagged_log_writer.pending(), 2)
+        with self.assertLogs("routes.flagged_writer", "ERROR"):
+            self.assertEqual(flagged_log_writer.flush(), 1)
+        self.assertEqual(flagged_log_writer.pending(), 0)
+        with self.app.app_context():
+            self.assertEqual([log.text for log in FlaggedLog.query.all()], ["good"])
+
+    def test_buffer_is_capped(self):
+        flagged_log_writer.max_buffer = 2
+        flagged_log_writer.batch_size = 10
+        with self.app.app_context(), self.assertLogs("routes.flagged_writer", "ERROR"):
+            for text in ("one", "two", "three"):
+                log_flagged_content(1, text, "Gemini: unsafe", "threat", "post")
+        self.assertEqual(flagged_log_writer.pending(), 2)
+        flagged_log_writer.flush()
+        with self.app.app_context():
+            self.assertEqual(sorted(log.text for log in FlaggedLog.query.all()), ["three", "two"])
+
+    def test_flush_writes_pending_entries(self):
+        with self.app.app_context():
+            log_flagged_content(1, "only", "Gemini: unsafe", "threat", "post")
+        self.assertEqual(flagged_log_writer.flush(), 1)
+        self.assertEqual(flagged_log_writer.pending(), 0)
+        with self.app.app_context():
+            self.assertEqual(FlaggedLog.query.count(), 1)
+
+
+class VerdictCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app({
+            "TESTING": True,
+            "SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:",
+        })
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    @patch("routes.moderation.gemini_moderation", return_value=(True, "Gemini: fine", None))
+    def test_normalized_repeats_reuse_one_verdict(self, mock_gemini):
+        first = is_safe_content_ai("Thank you so much for sharing this")
+        second = is_safe_content_ai("  thank   YOU so much for sharing THIS\n")
+        self.assertEqual(first, second)
+        self.assertEqual(mock_gemini.call_count, 1)
+
+    @patch("routes.moderation.professor_moderation", return_value=mod_professor.FALLBACK_RESULT)
+    @patch("routes.moderation.gemini_moderation", return_value=mod_gemini.FALLBACK_RESULT)
+    def test_fallback_results_are_not_cached(self, mock_gemini, mock_professor):
+        is_safe_content_ai("Hello there, how is everyone doing")
+        is_safe_content_ai("Hello there, how is everyone doing")
+        self.assertEqual(mock_gemini.call_count, 2)
+        self.assertEqual(mock_professor.call_count, 2)
+        self.assertEqual(ModerationVerdict.query.count(), 0)
+
+    @patch("routes.moderation.gemini_moderation", return_value=(False, "Gemini: unsafe", "threat"))
+    def test_rolled_back_verdicts_are_not_remembered(self, mock_gemini):
+        is_safe_content_ai("A threatening message")
+        db.session.rollback()
+        is_safe_content_ai("A threatening message")
+        self.assertEqual(mock_gemini.call_count, 2)
+
+        db.session.commit()
+        is_safe_content_ai("A threatening message")
+        self.assertEqual(mock_gemini.call_count, 2)
+        self.assertEqual(ModerationVerdict.query.count(), 1)
+
+    @patch("routes.moderation.gemini_moderation", return_value=(False, "Gemini: unsafe", "threat"))
+    def test_verdicts_survive_in_sqlite_and_purge_on_prompt_change(self, mock_gemini):
+        is_safe_content_ai("A threatening message")
+        db.session.commit()
+        verdict_cache.clear_memory()
+
+        self.assertEqual(is_safe_content_ai("a threatening message"), (False, "Gemini: unsafe", "threat"))
+        self.assertEqual(mock_gemini.call_count, 1)
+
+        versions = prompt_versions()
+        versions["gemini"] = "new-prompt"
+        self.assertEqual(verdict_cache.purge(versions), 1)
+        self.assertEqual(ModerationVerdict.query.count(), 0)
+
+
+class GeminiBatchingTestCase(unittest.TestCase):
+    def test_extract_json_skips_noise_and_nested_braces(self):
+        raw = 'Sure! {not json} ```json\n{"safe": false, "reason": "uses {braces}"}\n``` done {}'
+        self.assertEqual(
+            mod_gemini.extract_json(raw),
+            '{"safe": false, "reason": "uses {braces}"}',
+        )
+        self.assertEqual(
+            mod_gemini.extract_json('Verdicts: [1] then [{"id": 1, "safe": true}]', expect=list),
+            "[1]",
+        )
+        self.assertIsNone(mod_gemini.extract_json("no json here"))
+
+    @patch.dict(os.environ, {"GEMINI_API_KEY": "test-key"})
+    @patch("routes.mod_gemini._generate_text")
+    def test_batch_reply_is_fanned_out_in_order(self, mock_generate):
+        mock_generate.return_value = (
+            '```json\n[{"id": 2, "safe": false, "reason": "mean", "categories": ["abuse"]},'
+            ' {"id": 1, "safe": true, "reason": "ok", "categories": []}]\n```'
+        )
+        results = mod_gemini.gemini_moderation_batch(["hello", "you are awful"])
+        self.assertEqual(results, [(True, "Gemini: ok", None), (False, "Gemini: mean", "abuse")])
+        self.assertEqual(mock_generate.call_count, 1)
+
+    @patch.dict(os.environ, {"GEMINI_API_KEY": "test-key"})
+    @patch("routes.mod_gemini._generate_text")
+    def test_malformed_batch_reply_falls_back_to_single_calls(self, mock_generate):
+        mock_generate.side_effect = [
+            '[{"id": 1, "safe": true}]',
+            '{"safe": true, "reason": "first"}',
+            '{"safe": false, "reason": "second", "categories": ["threat"]}',
+        ]
+        results = mod_gemini.gemini_moderation_batch(["one", "two"])
+        self.assertEqual(results, [(True, "Gemini: first", None), (False, "Gemini: second", "threat")])
+        self.assertEqual(mock_generate.call_count, 3)
+
+    def test_micro_batcher_coalesces_concurrent_calls(self):
+        batches = []
+
+        def batch_fn(items):
+            batches.append(list(items))
+            return [item.upper() for item in items]
+
+        batcher = MicroBatcher(batch_fn, window=0.2, max_size=10, enabled=True)
+        results = {}
+
+        def call(word):
+            results[word] = batcher.submit(word)
+
+        threads = [threading.Thread(target=call, args=(word,)) for word in ("a", "b", "c", "d")]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results, {"a": "A", "b": "B", "c": "C", "d": "D"})
+        self.assertEqual(len(batches), 1)
+        self.assertEqual(sorted(batches[0]), ["a", "b", "c", "d"])
+
+
+def fake_response(status, body=None, headers=None):
+    response = requests.Response()
+    response.status_code = status
+    response._content = json.dumps(body or {}).encode("utf-8")
+    response.raw = io.BytesIO()
+    response.headers.update(headers or {})
+    return response
+
+
+class ModerationHTTPClientTestCase(unittest.TestCase):
+    def setUp(self):
+        self.client = ModerationHTTPClient()
+        self.client.backoff = 0.001
+
+    @patch("routes.mod_http.time.sleep")
+    def test_retries_transient_errors_then_succeeds(self, mock_sleep):
+        with patch.object(self.client.session, "post") as mock_post:
+            mock_post.side_effect = [
+                requests.ConnectionError("reset"),
+                fake_response(503, headers={"Retry-After": "2"}),
+                fake_response(200, {"ok": True}),
+            ]
+            response = self.client.post("gemini", "http://backend/generate")
+
+        self.assertEqual(response.json(), {"ok": True})
+        self.assertEqual(mock_post.call_count, 3)
+        self.assertEqual(mock_sleep.call_args_list[1].args, (2.0,))
+        self.assertEqual(mock_post.call_args.kwargs["timeout"], (3.05, 10))
+
+    @patch("routes.mod_http.time.sleep")
+    def test_gives_up_after_max_retries(self, mock_sleep):
+        with patch.object(self.client.session, "post") as mock_post:
+            mock_post.return_value = fake_response(429)
+            response = self.client.post("professor", "http://backend/generate")
+
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(mock_post.call_count, self.client.max_retries + 1)
+        self.assertEqual(mock_post.call_args.kwargs["timeout"], (3.05, 5))
+        with patch.object(self.client.session, "post") as mock_post:
+            mock_post.return_value = fake_response(400)
+            self.client.post("professor", "http://backend/generate")
+        self.assertEqual(mock_post.call_count, 1)
+
+    def test_backend_concurrency_is_capped(self):
+        self.client.limits = {"professor": 2}
+        active, peak = [0], [0]
+        lock = threading.Lock()
+
+        def slow_post(url, **kwargs):
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(0.05)
+            with lock:
+                active[0] -= 1
+            return fake_response(200)
+
+        with patch.object(self.client.session, "post", side_effect=slow_post):
+            threads = [
+                threading.Thread(target=self.client.post, args=("professor", "http://backend/generate"))
+                for _ in range(6)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(peak[0], 2)
+
+    @patch.dict(os.environ, {"GEMINI_API_KEY": "test-key"})
+    @patch("routes.mod_gemini.moderation_http")
+    def test_gemini_http_errors_are_counted_as_http(self, mock_http):
+        mock_http.post.return_value = fake_response(429)
+        http_before = MODERATION_ERRORS.collect().get(("gemini", "http"), 0)
+        parse_before = MODERATION_ERRORS.collect().get(("gemini", "parse"), 0)
+        self.assertEqual(mod_gemini.gemini_moderation("hello"), mod_gemini.FALLBACK_RESULT)
+        self.assertEqual(MODERATION_ERRORS.collect()[("gemini", "http")], http_before + 1)
+        self.assertEqual(MODERATION_ERRORS.collect().get(("gemini", "parse"), 0), parse_before)
+
+    @patch("routes.mod_professor.moderation_http")
+    def test_professor_failure_falls_back(self, mock_http):
+        mock_http.post.return_value = fake_response(503)
+        self.assertEqual(professor_moderation("hello"), mod_professor.FALLBACK_RESULT)
+
+        mock_http.post.return_value = fake_response(200, {"safety": "unsafe", "categories": ["Violence"]})
+        self.assertEqual(
+            professor_moderation("hello"),
+            (False, "Professor AI flagged content as unsafe. Categories: violence.", "violence"),
+        )
+
+    @patch("routes.mod_professor.moderation_http")
+    def test_professor_categories_block_on_substrings(self, mock_http):
+        mock_http.post.return_value = fake_response(200, {"safety": "safe", "categories": ["Harmful"]})
+        self.assertEqual(
+            professor_moderation("hello"),
+            (False, "Professor AI detected harmful content: harmful", "harmful"),
+        )
+
+        mock_http.post.return_value = fake_response(200, {"safety": "safe", "categories": ["self_harm"]})
+        self.assertEqual(professor_moderation("hello")[::2], (False, "suicide"))
+
+        mock_http.post.return_value = fake_response(200, {"safety": "safe", "categories": ["spam"]})
+        self.assertEqual(professor_moderation("hello"), (True, "Professor AI cleared the content as safe.", None))
+
+    @patch("routes.mod_professor.moderation_http")
+    def test_professor_labels_come_from_the_lexicon(self, mock_http):
+        with open(lexicon_module.DEFAULT_LEXICON_PATH, encoding="utf-8") as f:
+            data = json.load(f)
+        data["backend_labels"] = ["spam"]
+        fd, path = tempfile.mkstemp(suffix=".json")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        versions = prompt_versions()
+        try:
+            lexicon.load(path)
+            self.assertNotEqual(prompt_versions()["professor"], versions["professor"])
+            mock_http.post.return_value = fake_response(200, {"safety": "safe", "categories": ["Spam", "harmful"]})
+            self.assertEqual(professor_moderation("hello")[:2], (False, "Professor AI detected harmful content: spam"))
+        finally:
+            lexicon.load(lexicon_module.DEFAULT_LEXICON_PATH)
+            os.remove(path)
+        self.assertEqual(prompt_versions(), versions)
+
+
+class LexiconPrefilterTestCase(unittest.TestCase):
+    def test_matcher_respects_word_boundaries(self):
+        matcher = KeywordMatcher([("harm", "violence"), ("self-harm", "suicide"), ("he", "x"), ("she", "y")])
+        found = {(value, phrase) for value, phrase, _ in matcher.find("Self-harm at the PHARMACY; she said")}
+        self.assertEqual(found, {("violence", "harm"), ("suicide", "self-harm"), ("y", "she")})
+
+    def test_category_priority_follows_the_lexicon(self):
+        self.assertEqual(lexicon.category_for("", "a threat of self harm"), "suicide")
+        self.assertEqual(lexicon.category_for("Gemini: bullying", "ok"), "abuse")
+        self.assertIsNone(lexicon.category_for("harmless", "a pharmacy"))
+
+    @patch("routes.moderation.gemini_moderation")
+    def test_prefilter_decides_clear_cut_text_locally(self, mock_gemini):
+        self.assertEqual(
+            is_safe_content_ai("I will KILL you tomorrow"),
+            (False, 'Keyword filter: matched "i will kill you".', "violence"),
+        )
+        self.assertEqual(is_safe_content_ai("Thanks so much!!"), (True, "Keyword filter: trivial content.", None))
+        mock_gemini.assert_not_called()
+
+        mock_gemini.return_value = (True, "Gemini: fine", None)
+        with create_app({"TESTING": True, "SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:"}).app_context():
+            db.create_all()
+            is_safe_content_ai("Thanks, that helped me a lot")
+        mock_gemini.assert_called_once()
+
+
+class ModerationRouterTestCase(unittest.TestCase):
+    FAILED = (True, "unavailable")
+
+    def make_router(self, gemini, professor):
+        router = ModerationRouter(
+            backends={"gemini": gemini, "professor": professor},
+            fallbacks={"gemini": self.FAILED, "professor": self.FAILED},
+            is_failure=lambda result: result == self.FAILED,
+        )
+        router.breakers = {
+            name: CircuitBreaker(window=4, min_calls=2, error_threshold=0.5, slow_call=1.0, cooldown=0.05)
+            for name in ("gemini", "professor")
+        }
+        return router
+
+    def test_fails_over_and_opens_the_breaker(self):
+        calls = {"gemini": 0, "professor": 0}
+
+        def gemini(text):
+            calls["gemini"] += 1
+            raise requests.Timeout("slow")
+
+        def professor(text):
+            calls["professor"] += 1
+            return (True, "Professor: ok", None)
+
+        router = self.make_router(gemini, professor)
+        for _ in range(4):
+            self.assertEqual(router.route("hello"), ("professor", (True, "Professor: ok", None)))
+
+        # Two failures trip the breaker, after which Gemini is skipped entirely
+        self.assertEqual(calls, {"gemini": 2, "professor": 4})
+        self.assertEqual(router.states()["gemini"], CircuitBreaker.OPEN)
+
+    def test_half_open_probe_closes_the_breaker(self):
+        healthy = [False]
+
+        def gemini(text):
+            return (True, "Gemini: ok", None) if healthy[0] else self.FAILED
+
+        router = self.make_router(gemini, lambda text: self.FAILED)
+        router.route("a")
+        router.route("b")
+        self.assertEqual(router.states()["gemini"], CircuitBreaker.OPEN)
+        self.assertEqual(router.route("c"), ("gemini", self.FAILED))
+
+        time.sleep(0.06)
+        healthy[0] = True
+        self.assertEqual(router.route("d"), ("gemini", (True, "Gemini: ok", None)))
+        self.assertEqual(router.states()["gemini"], CircuitBreaker.CLOSED)
+
+    def test_slow_primary_is_hedged(self):
+        def gemini(text):
+            time.sleep(0.3 if text == "slow" else 0.001)
+            return (True, "Gemini: ok", None)
+
+        router = self.make_router(gemini, lambda text: (False, "Professor: unsafe", "threat"))
+        router.hedge = True
+        router.hedge_min_samples = 5
+        for _ in range(5):
+            self.assertEqual(router.route("fast")[0], "gemini")
+
+        self.assertEqual(router.route("slow"), ("professor", (False, "Professor: unsafe", "threat")))
+
+
+class MetricsTestCase(unittest.TestCase):
+    def test_sharded_counters_and_histograms_render_as_prometheus_text(self):
+        registry = MetricsRegistry()
+        calls = registry.counter("calls_total", "Calls.", ["backend"])
+        latency = registry.histogram("latency_seconds", "Latency.", ["backend"], buckets=(0.1, 1.0))
+
+        def work():
+            for _ in range(100):
+                calls.inc(backend="gemini")
+            latency.observe(0.5, backend="gemini")
+
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        calls.inc(backend='say "hi"')
+
+        text = registry.render()
+        self.assertIn("# TYPE calls_total counter", text)
+        self.assertIn('calls_total{backend="gemini"} 400', text)
+        self.assertIn('calls_total{backend="say \\"hi\\""} 1', text)
+        self.assertIn('latency_seconds_bucket{backend="gemini",le="0.1"} 0', text)
+        self.assertIn('latency_seconds_bucket{backend="gemini",le="1.0"} 4', text)
+        self.assertIn('latency_seconds_bucket{backend="gemini",le="+Inf"} 4', text)
+        self.assertIn('latency_seconds_count{backend="gemini"} 4', text)
+
+    def test_verdict_categories_are_normalized(self):
+        for category, label in (("Self_Harm", "suicide"), ("Hate speech about X", "other"), (None, "none")):
+            with self.subTest(category=category):
+                key = ("gemini", "unsafe", label)
+                before = MODERATION_VERDICTS.collect().get(key, 0)
+                record_verdict("gemini", (False, "Gemini: unsafe", category))
+                self.assertEqual(MODERATION_VERDICTS.collect()[key], before + 1)
+
+    @patch("routes.moderation.gemini_moderation", return_value=(False, "Gemini: unsafe", "threat"))
+    def test_metrics_endpoint_reports_moderation_calls(self, mock_gemini):
+        app = create_app({"TESTING": True, "SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:", "METRICS_TOKEN": "s3cret"})
+        key = ("gemini", "unsafe", "threat")
+        with app.app_context():
+            db.create_all()
+            before = MODERATION_VERDICTS.collect().get(key, 0)
+            is_safe_content_ai("A message the stub will flag")
+
+        client = app.test_client()
+        self.assertEqual(client.get("/metrics").status_code, 403)
+        response = client.get("/metrics", headers={"Authorization": "Bearer s3cret"})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(
+            f'moderation_verdicts_total{{source="gemini",outcome="unsafe",category="threat"}} {before + 1}',
+            response.get_data(as_text=True),
+        )
+        self.assertIn('moderation_breaker_open{backend="gemini"} 0', response.get_data(as_text=True))
+
+    def test_metrics_without_a_token_are_local_only(self):
+        app = create_app({"TESTING": True, "SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:", "METRICS_TOKEN": None})
+        client = app.test_client()
+        self.assertEqual(client.get("/metrics").status_code, 200)
+        self.assertEqual(client.get("/metrics", environ_base={"REMOTE_ADDR": "10.0.0.8"}).status_code, 403)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,337 @@
+import unittest
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from sqlalchemy import delete, text, update
+
+from app import create_app
+from extensions import db, bcrypt
+from models.appointment import Appointment
+from models.forum import ForumPost, ForumReply
+from models.notification_event import NotificationEvent
+from models.user import User
+from routes import notifications as notifications_module
+from routes.appointments import publish_due_appointments
+from routes.forum import _publish
+from routes.notification_broker import NotificationBroker, notification_broker, publish_on_commit
+from routes.notifications import get_notifications, notification_counts
+
+
+class NotificationTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app({
+            "TESTING": True,
+            "SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:",
+            "WTF_CSRF_ENABLED": False,
+            "NOTIFICATION_LIMIT": 2,
+        })
+        self.client = self.app.test_client()
+
+        with self.app.app_context():
+            db.create_all()
+            password_hash = bcrypt.generate_password_hash("password123").decode("utf-8")
+            owner = User(username="owner", email="owner@example.com", password=password_hash)
+            other = User(username="other", email="other@example.com", password=password_hash)
+            db.session.add_all([owner, other])
+            db.session.commit()
+            self.owner_id, self.other_id = owner.id, other.id
+
+            post = ForumPost(title="My post", content="Some content", user_id=owner.id)
+            db.session.add(post)
+            db.session.commit()
+            self.post_id = post.id
+
+        self.client.post(
+            "/login",
+            data={"email": "owner@example.com", "password": "password123"},
+            follow_redirects=True,
+        )
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def add_appointment(self, when, title="Session"):
+        with self.app.app_context():
+            db.session.add(Appointment(
+                user_id=self.owner_id, title=title, date=when.date(), time=when.time().replace(microsecond=0),
+            ))
+            db.session.commit()
+        # Written behind the routes' backs, so drop the cached count by hand
+        notification_counts.invalidate(self.owner_id)
+
+    def add_reply(self, user_id, content="A reply", status="published"):
+        with self.app.app_context():
+            db.session.add(ForumReply(post_id=self.post_id, user_id=user_id, content=content, status=status))
+            db.session.commit()
+        notification_counts.invalidate(self.owner_id)
+
+    def notifications(self):
+        with self.app.test_request_context():
+            owner = db.session.get(User, self.owner_id)
+            result = get_notifications(owner)
+            return (
+                [appt.title for appt in result["appointment_notifications"]],
+                [reply.user.username for reply in result["reply_notifications"]],
+                result["notification_count"],
+            )
+
+    def test_only_upcoming_appointments_and_others_published_replies(self):
+        now = datetime.now()
+        self.add_appointment(now - timedelta(days=1), "Past")
+        self.add_appointment(now + timedelta(days=1), "Future")
+        self.add_reply(self.other_id)
+        self.add_reply(self.owner_id)
+        self.add_reply(self.other_id, status="pending")
+
+        appointments, replies, count = self.notifications()
+        self.assertEqual(appointments, ["Future"])
+        self.assertEqual(replies, ["other"])
+        self.assertEqual(count, 2)
+
+    def test_lists_are_limited_but_count_is_total(self):
+        now = datetime.now()
+        for day in range(1, 4):
+            self.add_appointment(now + timedelta(days=day), f"Day {day}")
+
+        appointments, _, count = self.notifications()
+        self.assertEqual(appointments, ["Day 1", "Day 2"])
+        self.assertEqual(count, 3)
+
+    def test_computed_once_per_request(self):
+        with self.app.test_request_context():
+            owner = db.session.get(User, self.owner_id)
+            with patch.object(notifications_module, "upcoming_appointments_query",
+                              wraps=notifications_module.upcoming_appointments_query) as query:
+                first = get_notifications(owner)
+                second = get_notifications(owner)
+        self.assertIs(first, second)
+        self.assertEqual(query.call_count, 1)
+
+    def test_appointment_routes_invalidate_cached_count(self):
+        self.assertEqual(self.notifications()[2], 0)
+        tomorrow = (datetime.now() + timedelta(days=1)).strftime("%Y-%m-%d")
+        self.client.post(
+            "/appointments/new",
+            data={"title": "Therapy", "date": tomorrow, "time": "10:30"},
+        )
+        self.assertEqual(self.notifications()[2], 1)
+
+        with self.app.app_context():
+            appt_id = Appointment.query.first().id
+        self.client.post(f"/appointments/delete/{appt_id}")
+        self.assertEqual(self.notifications()[2], 0)
+
+    def test_reply_delete_invalidates_owner_count(self):
+        self.add_reply(self.other_id)
+        self.assertEqual(self.notifications()[2], 1)
+
+        with self.app.app_context():
+            reply_id = ForumReply.query.first().id
+        self.client.get("/logout")
+        self.client.post(
+            "/login",
+            data={"email": "other@example.com", "password": "password123"},
+            follow_redirects=True,
+        )
+        self.client.post(f"/forum/delete-reply/{reply_id}")
+        self.assertEqual(self.notifications()[2], 0)
+
+    def test_mark_read_hides_replies_up_to_watermark(self):
+        self.add_reply(self.other_id, "first")
+        self.add_reply(self.other_id, "second")
+        with self.app.app_context():
+            first_id = ForumReply.query.filter_by(content="first").first().id
+
+        self.client.post("/notifications/read", data={"through": first_id})
+        self.assertEqual(self.notifications()[1], ["other"])
+
+        response = self.client.post("/notifications/read", headers={"Accept": "application/json"})
+        self.assertEqual(response.get_json(), {"updated": True, "notification_count": 0})
+        self.assertEqual(self.notifications()[1:], ([], 0))
+
+        # Replies published after the watermark are unread again
+        self.add_reply(self.other_id, "third")
+        self.assertEqual(self.notifications()[1:], (["other"], 1))
+
+    def test_mark_read_ignores_other_users_replies(self):
+        self.add_reply(self.owner_id, "own")
+        with self.app.app_context():
+            own_id = ForumReply.query.first().id
+        response = self.client.post(
+            "/notifications/read", data={"through": own_id}, headers={"Accept": "application/json"},
+        )
+        self.assertFalse(response.get_json()["updated"])
+        with self.app.app_context():
+            self.assertIsNone(db.session.get(User, self.owner_id).notifications_seen_at)
+
+    def test_badge_rendered(self):
+        self.add_appointment(datetime.now() + timedelta(days=1), "Checkup")
+        response = self.client.get("/dashboard", follow_redirects=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b"Checkup", response.data)
+
+    def test_commits_publish_reply_and_appointment_events(self):
+        subscription = notification_broker.subscribe(self.owner_id)
+        try:
+            with self.app.app_context():
+                reply = ForumReply(post_id=self.post_id, user_id=self.other_id, content="Hi", status="pending")
+                db.session.add(reply)
+                db.session.commit()
+                job = SimpleNamespace(kind="reply", action="create", target_id=reply.id)
+                _publish(job)
+                self.assertFalse(subscription.wait(0))
+                db.session.commit()
+            self.assertTrue(subscription.wait(0))
+
+            tomorrow = (datetime.now() + timedelta(days=1)).strftime("%Y-%m-%d")
+            self.client.post("/appointments/new", data={"title": "Therapy", "date": tomorrow, "time": "10:30"})
+            self.assertTrue(subscription.wait(0))
+        finally:
+            notification_broker.unsubscribe(subscription)
+        with self.app.app_context():
+            events = notification_broker.events_after(self.owner_id, 0)
+        self.assertEqual([kind for _, kind, _ in events], ["reply", "appointment-changed"])
+        self.assertEqual(events[0][2]["username"], "other")
+        self.assertEqual(events[1][2]["action"], "created")
+
+    def test_rolled_back_events_are_dropped(self):
+        subscription = notification_broker.subscribe(self.owner_id)
+        try:
+            with self.app.app_context():
+                publish_on_commit(self.owner_id, "reply", {})
+                db.session.rollback()
+                db.session.commit()
+                self.assertEqual(notification_broker.events_after(self.owner_id, 0), [])
+            self.assertFalse(subscription.wait(0))
+        finally:
+            notification_broker.unsubscribe(subscription)
+
+    def test_stream_is_opt_in(self):
+        self.assertEqual(self.client.get("/notifications/stream").status_code, 404)
+        self.assertNotIn(b"EventSource", self.client.get("/dashboard/home").data)
+        self.app.config["NOTIFICATION_STREAM"] = True
+        self.assertIn(b"EventSource", self.client.get("/dashboard/home").data)
+
+    def test_stream_sends_events_after_last_event_id(self):
+        self.app.config["NOTIFICATION_STREAM"] = True
+        self.app.config["NOTIFICATION_HEARTBEAT"] = 0.01
+        with self.app.app_context():
+            first = notification_broker.publish(self.owner_id, "reply", {"n": 1})
+            notification_broker.publish(self.owner_id, "reply", {"n": 2})
+            db.session.commit()
+
+        response = self.client.get("/notifications/stream", headers={"Last-Event-ID": str(first)}, buffered=False)
+        self.assertEqual(response.mimetype, "text/event-stream")
+        frames = response.response
+        self.assertEqual(next(frames), b"retry: 5000\n\n")
+        self.assertEqual(next(frames), f'id: {first + 1}\nevent: reply\ndata: {{"n": 2}}\n\n'.encode())
+        self.assertEqual(next(frames), b": heartbeat\n\n")
+        response.close()
+        self.assertEqual(notification_broker.connections(), 0)
+
+    def test_stream_reads_events_written_by_other_processes(self):
+        self.app.config["NOTIFICATION_STREAM"] = True
+        self.app.config["NOTIFICATION_POLL_INTERVAL"] = 0.01
+        with self.app.app_context():
+            notification_broker.publish(self.owner_id, "reply", {"n": 1})
+            db.session.commit()
+
+        response = self.client.get("/notifications/stream", buffered=False)
+        # Another worker's commit: a row in the outbox, but no wake-up here
+        with self.app.app_context():
+            db.session.execute(text(
+                "INSERT INTO notification_events (user_id, kind, data, created_at) "
+                "VALUES (:user_id, 'reply', '{\"n\": 2}', CURRENT_TIMESTAMP)"
+            ), {"user_id": self.owner_id})
+            db.session.commit()
+        frames = response.response
+        self.assertEqual(next(frames), b"retry: 5000\n\n")
+        self.assertRegex(next(frames).decode(), r'^id: \d+\nevent: reply\ndata: {"n": 2}\n\n$')
+        response.close()
+
+    def test_appointment_due_is_sent_once(self):
+        now = datetime.now().replace(second=0, microsecond=0)
+        self.add_appointment(now + timedelta(minutes=20), "Soon")
+        self.add_appointment(now + timedelta(hours=2), "Later")
+        with self.app.app_context():
+            self.assertEqual(publish_due_appointments(now), 1)
+            self.assertEqual(publish_due_appointments(now), 0)
+            events = notification_broker.events_after(self.owner_id, 0)
+        self.assertEqual([(kind, data["title"]) for _, kind, data in events], [("appointment-due", "Soon")])
+
+        with self.app.app_context():
+            soon = Appointment.query.filter_by(title="Soon").one()
+        self.client.post(f"/appointments/update/{soon.id}", data={
+            "title": "Soon", "date": now.date().isoformat(),
+            "time": (now + timedelta(minutes=10)).strftime("%H:%M"),
+        })
+        with self.app.app_context():
+            self.assertEqual(publish_due_appointments(now), 1)
+
+
+class NotificationBrokerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app({
+            "TESTING": True,
+            "SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:",
+            "NOTIFICATION_STREAM_BUFFER": 2,
+        })
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+        password_hash = bcrypt.generate_password_hash("password123").decode("utf-8")
+        db.session.add_all([
+            User(id=1, username="one", email="one@example.com", password=password_hash),
+            User(id=2, username="two", email="two@example.com", password=password_hash),
+        ])
+        db.session.commit()
+        self.broker = NotificationBroker()
+        self.broker.init_app(self.app)
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def publish(self, user_id, n):
+        event_id = self.broker.publish(user_id, "reply", {"n": n})
+        db.session.commit()
+        return event_id
+
+    def test_reads_only_the_same_user_in_batches(self):
+        first = self.publish(1, 1)
+        self.publish(2, 2)
+        for n in range(3, 6):
+            self.publish(1, n)
+        events = self.broker.events_after(1, first)
+        self.assertEqual([data["n"] for _, _, data in events], [3, 4])
+        self.assertEqual([data["n"] for _, _, data in self.broker.events_after(1, events[-1][0])], [5])
+        self.assertEqual(self.broker.latest_id(2), first + 1)
+
+    def test_pruned_history_asks_for_resync(self):
+        first = self.publish(1, 1)
+        second = self.publish(1, 2)
+        last = self.publish(1, 3)
+        db.session.execute(
+            update(NotificationEvent)
+            .where(NotificationEvent.id < last)
+            .values(created_at=datetime.utcnow() - timedelta(days=2))
+        )
+        self.broker.prune()
+        db.session.commit()
+        self.assertTrue(self.broker.missed(first))
+        self.assertFalse(self.broker.missed(second))
+        self.assertEqual([data["n"] for _, _, data in self.broker.events_after(1, first)], [3])
+
+    def test_ids_are_not_reused_after_pruning(self):
+        first = self.publish(1, 1)
+        db.session.execute(delete(NotificationEvent))
+        db.session.commit()
+        self.assertGreater(self.publish(1, 2), first)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,8 +1,11 @@
 import unittest
+from datetime import date, timedelta
 from app import create_app
 from extensions import db, bcrypt
 from models.user import User
 from models.profile import Profile
+from models.medical_history import MedicalHistory
+from models.medication import Medication
 
 
 class ProfileTestCase(unittest.TestCase):
@@ -112,6 +115,44 @@ class ProfileTestCase(unittest.TestCase):
             self.assertEqual(profile.full_name, "")
             self.assertIsNone(profile.age)
 
+    def add_history_with_medications(self):
+        today = date.today()
+        with self.app.app_context():
+            user = User.query.filter_by(email="profile@example.com").first()
+            profile = Profile(user_id=user.id, full_name="John Doe")
+            db.session.add(profile)
+            db.session.flush()
+            active = MedicalHistory(profile_id=profile.id, disease="Insomnia")
+            inactive = MedicalHistory(profile_id=profile.id, disease="Flu")
+            db.session.add_all([active, inactive])
+            db.session.flush()
+            db.session.add_all([
+                Medication(medical_history_id=active.id, name="Current", start_date=today - timedelta(days=1)),
+                Medication(medical_history_id=active.id, name="Ends today", start_date=today, end_date=today),
+                Medication(medical_history_id=active.id, name="Not started", start_date=today + timedelta(days=1)),
+                Medication(medical_history_id=inactive.id, name="Finished",
+                           start_date=today - timedelta(days=9), end_date=today - timedelta(days=2)),
+                Medication(medical_history_id=inactive.id, name="Undated"),
+            ])
+            db.session.commit()
+
+    def test_is_active_matches_in_sql_and_python(self):
+        self.add_history_with_medications()
+        with self.app.app_context():
+            in_python = sorted(med.name for med in Medication.query.all() if med.is_active)
+            in_sql = sorted(med.name for med in Medication.query.filter(Medication.is_active))
+            self.assertEqual(in_sql, ["Current", "Ends today"])
+            self.assertEqual(in_python, in_sql)
+            histories = MedicalHistory.query.filter(MedicalHistory.has_active_medications).all()
+            self.assertEqual([history.disease for history in histories], ["Insomnia"])
+
+    def test_profile_page_shows_active_counts(self):
+        self.add_history_with_medications()
+        response = self.client.get("/profile")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b"Yes (2)", response.data)
+        self.assertIn(b'<span class="badge bg-secondary">No</span>', response.data)
+
 
 if __name__ == "__main__":
     unittest.main()
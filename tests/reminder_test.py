@@ -0,0 +1,218 @@
+import time as clock
+import unittest
+from datetime import date, datetime, time, timedelta
+from types import SimpleNamespace
+
+from app import create_app
+from extensions import db, bcrypt
+from models.medical_history import MedicalHistory
+from models.medication import Medication
+from models.profile import Profile
+from models.user import User
+from routes.medication_schedule import parse_frequency
+from routes.reminder_scheduler import ReminderScheduler, next_fire_time, publish_reminders, reminder_scheduler
+
+
+class ReminderSchedulerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app({
+            "TESTING": True,
+            "SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:",
+            "WTF_CSRF_ENABLED": False,
+        })
+        self.client = self.app.test_client()
+        self.today = date.today()
+
+        with self.app.app_context():
+            db.create_all()
+            password_hash = bcrypt.generate_password_hash("password123").decode("utf-8")
+            user = User(username="reminded", email="reminded@example.com", password=password_hash)
+            db.session.add(user)
+            db.session.commit()
+            self.user_id = user.id
+
+            profile = Profile(user_id=user.id, full_name="Reminded User")
+            db.session.add(profile)
+            db.session.flush()
+            history = MedicalHistory(profile_id=profile.id, disease="Insomnia")
+            db.session.add(history)
+            db.session.commit()
+            self.history_id = history.id
+
+        self.client.post(
+            "/login",
+            data={"email": "reminded@example.com", "password": "password123"},
+            follow_redirects=True,
+        )
+
+    def tearDown(self):
+        reminder_scheduler.stop()
+        reminder_scheduler.clear()
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def add_medication(self, name, at, start=None, end=None, frequency=None):
+        with self.app.app_context():
+            med = Medication(
+                medical_history_id=self.history_id, name=name, reminder_time=at, frequency=frequency,
+                start_date=start or self.today - timedelta(days=1), end_date=end,
+            )
+            db.session.add(med)
+            db.session.commit()
+            return med.id
+
+    def at(self, hour, minute=0, days=0):
+        return datetime.combine(self.today + timedelta(days=days), time(hour, minute))
+
+    def test_next_fire_time(self):
+        start, daily = self.today, parse_frequency(None)
+        self.assertEqual(next_fire_time(daily, time(9), start, None, self.at(8)), self.at(9))
+        self.assertEqual(next_fire_time(daily, time(9), start, None, self.at(9)), self.at(9, days=1))
+        self.assertEqual(next_fire_time(daily, time(9), start + timedelta(days=3), None, self.at(10)), self.at(9, days=3))
+        self.assertIsNone(next_fire_time(daily, time(9), start, start, self.at(10)))
+        self.assertIsNone(next_fire_time(daily, None, start, None, self.at(8)))
+
+    def test_next_fire_time_follows_the_frequency(self):
+        start = self.today
+
+        def fire(frequency, after):
+            return next_fire_time(parse_frequency(frequency), time(9), start, None, after)
+
+        self.assertEqual(fire("twice daily", self.at(9)), self.at(21))
+        self.assertEqual(fire("twice daily", self.at(21)), self.at(9, days=1))
+        self.assertEqual(fire("every other day", self.at(9)), self.at(9, days=2))
+        self.assertEqual(fire("every other day", self.at(9, days=1)), self.at(9, days=2))
+        self.assertEqual(fire("weekly", self.at(9)), self.at(9, days=7))
+        self.assertIsNone(fire("as needed", self.at(8)))
+        self.assertIsNone(fire("monthly", self.at(8)))
+
+    def test_scheduler_follows_the_dose_calendar(self):
+        self.add_medication("Alternate", time(9), start=self.today, frequency="every other day")
+        self.add_medication("Weekly", time(10), start=self.today, frequency="once a week")
+        scheduler = ReminderScheduler()
+        with self.app.app_context():
+            scheduler.load(self.at(8))
+        fired = [
+            (reminder.name, fire_at)
+            for days in range(8)
+            for reminder, fire_at in scheduler.due(self.at(23, days=days))
+        ]
+        self.assertEqual(fired, [
+            ("Alternate", self.at(9)), ("Weekly", self.at(10)),
+            ("Alternate", self.at(9, days=2)), ("Alternate", self.at(9, days=4)),
+            ("Alternate", self.at(9, days=6)), ("Weekly", self.at(10, days=7)),
+        ])
+
+    def test_due_pops_in_order_and_reschedules(self):
+        self.add_medication("Evening", time(21))
+        self.add_medication("Morning", time(8))
+        self.add_medication("Last dose", time(9), end=self.today)
+        self.add_medication("No reminder", None)
+        self.add_medication("Finished", time(8), end=self.today - timedelta(days=1))
+
+        scheduler = ReminderScheduler()
+        with self.app.app_context():
+            self.assertEqual(scheduler.load(self.at(7)), 3)
+
+        self.assertEqual(scheduler.due(self.at(7, 59)), [])
+        batch = scheduler.due(self.at(10))
+        self.assertEqual([reminder.name for reminder, _ in batch], ["Morning", "Last dose"])
+        self.assertEqual([fire_at for _, fire_at in batch], [self.at(8), self.at(9)])
+        self.assertEqual(scheduler.pending(), 2)
+
+        # The morning dose comes back tomorrow; the finished course does not
+        self.assertEqual(
+            [reminder.name for reminder, _ in scheduler.due(self.at(8, days=1))],
+            ["Evening", "Morning"],
+        )
+
+    def test_due_respects_batch_size(self):
+        for index in range(5):
+            self.add_medication(f"Dose {index}", time(8))
+        scheduler = ReminderScheduler()
+        scheduler.batch_size = 2
+        with self.app.app_context():
+            scheduler.load(self.at(7))
+        sizes = [len(scheduler.due(self.at(8))) for _ in range(4)]
+        self.assertEqual(sizes, [2, 2, 1, 0])
+
+    def test_routes_update_the_heap_incrementally(self):
+        with self.app.app_context():
+            reminder_scheduler.load()
+        self.assertEqual(reminder_scheduler.pending(), 0)
+
+        self.client.post("/medications/add", data={
+            "medical_history_id": self.history_id,
+            "name": "Melatonin",
+            "start_date": self.today.isoformat(),
+            "reminder_time": "22:00",
+        })
+        self.assertEqual(reminder_scheduler.pending(), 1)
+        with self.app.app_context():
+            med_id = Medication.query.filter_by(name="Melatonin").first().id
+
+        self.client.post(f"/profile/medication/{med_id}/edit", data={
+            "name": "Melatonin",
+            "start_date": (self.today + timedelta(days=2)).isoformat(),
+            "reminder_time": "21:30",
+        })
+        self.assertEqual(reminder_scheduler.pending(), 1)
+        self.assertEqual(reminder_scheduler.due(self.at(22, days=1)), [])
+        self.assertEqual(len(reminder_scheduler.due(self.at(21, 30, days=2))), 1)
+
+        self.client.post(f"/medications/{med_id}/delete")
+        self.assertEqual(reminder_scheduler.pending(), 0)
+        self.assertEqual(reminder_scheduler.due(self.at(21, 30, days=3)), [])
+
+    def test_deleting_a_record_cancels_its_reminders(self):
+        self.add_medication("One", time(8))
+        self.add_medication("Two", time(9))
+        with self.app.app_context():
+            reminder_scheduler.load()
+        self.assertEqual(reminder_scheduler.pending(), 2)
+        self.client.post(f"/profile/medical-history/{self.history_id}/delete")
+        self.assertEqual(reminder_scheduler.pending(), 0)
+
+    def test_publish_reminders_reaches_the_stream(self):
+        self.app.config["NOTIFICATION_STREAM"] = True
+        self.assertIn(b"addEventListener('reminder'", self.client.get("/dashboard/home").data)
+
+        response = self.client.get("/notifications/stream", buffered=False)
+        try:
+            frames = response.response
+            self.assertEqual(next(frames), b"retry: 5000\n\n")
+            reminder = SimpleNamespace(medication_id=7, user_id=self.user_id, name="Lithium", dosage="300mg")
+            with self.app.app_context():
+                publish_reminders([(reminder, self.at(8))])
+            frame = next(frames).decode()
+        finally:
+            response.close()
+        self.assertIn("event: reminder\n", frame)
+        self.assertIn('"name": "Lithium"', frame)
+        self.assertIn(f'"due_at": "{self.at(8).isoformat()}"', frame)
+
+    def test_scheduler_is_opt_in(self):
+        app = create_app({"SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:"})
+        self.assertFalse(app.config["REMINDER_SCHEDULER"])
+        self.assertFalse(reminder_scheduler.running)
+
+    def test_thread_dispatches_due_reminders(self):
+        now = datetime.now()
+        self.add_medication("Soon", (now + timedelta(seconds=1)).time())
+        sent = []
+        scheduler = ReminderScheduler()
+        scheduler.dispatch = sent.extend
+        scheduler.start(self.app)
+        try:
+            deadline = clock.monotonic() + 5
+            while not sent and clock.monotonic() < deadline:
+                clock.sleep(0.05)
+        finally:
+            scheduler.stop()
+        self.assertEqual([reminder.name for reminder, _ in sent], ["Soon"])
+        self.assertFalse(scheduler.running)
+
+
+if __name__ == "__main__":
+    unittest.main()